@@ -1,13 +1,13 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message
-from database import Database
+from database import AsyncDatabase
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 class AdminHandler:
-    def __init__(self, bot: Client, db: Database, user_manager, owner_id: int):
+    def __init__(self, bot: Client, db: AsyncDatabase, user_manager, owner_id: int):
         self.bot = bot
         self.db = db
         self.user_manager = user_manager
@@ -19,7 +19,7 @@ class AdminHandler:
         if message.from_user.id != self.owner_id:
             return
         
-        pending = self.db.get_pending_payments()
+        pending = await self.db.get_pending_payments()
         
         if not pending:
             await message.reply_text("✅ No pending payments!")
@@ -64,7 +64,7 @@ class AdminHandler:
             return
         
         # Get payment details
-        pending = self.db.get_pending_payments()
+        pending = await self.db.get_pending_payments()
         payment = next((p for p in pending if p['id'] == payment_id), None)
         
         if not payment:
@@ -72,12 +72,12 @@ class AdminHandler:
             return
         
         # Approve payment
-        self.db.approve_payment(payment_id)
+        await self.db.approve_payment(payment_id)
         
         # Update user to premium
         from config import PRICING
         plan_info = PRICING.get(payment['plan_type'], PRICING['basic'])
-        self.db.update_user_premium(payment['user_id'], True, plan_info['duration_days'])
+        await self.db.update_user_premium(payment['user_id'], True, plan_info['duration_days'])
         
         # Notify user
         await self.bot.send_message(
@@ -116,7 +116,7 @@ class AdminHandler:
             return
         
         # Get payment details
-        pending = self.db.get_pending_payments()
+        pending = await self.db.get_pending_payments()
         payment = next((p for p in pending if p['id'] == payment_id), None)
         
         if not payment:
@@ -124,15 +124,7 @@ class AdminHandler:
             return
         
         # Update payment status
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE payments 
-            SET status = 'rejected'
-            WHERE id = ?
-        """, (payment_id,))
-        conn.commit()
-        conn.close()
+        await self.db.reject_payment(payment_id)
         
         # Notify user
         await self.bot.send_message(
@@ -188,7 +180,7 @@ class AdminHandler:
                 return
             
             # Save owner ad
-            ad_id = self.db.save_owner_ad(ad_text, media_type, media_file_id)
+            ad_id = await self.db.save_owner_ad(ad_text, media_type, media_file_id)
             
             # Remove state
             del self.owner_ad_state[self.owner_id]
@@ -208,23 +200,33 @@ class AdminHandler:
         if message.from_user.id != self.owner_id:
             return
         
-        active_users = self.db.get_active_users()
-        free_users = self.db.get_free_users()
+        active_users = await self.db.get_active_users()
+        free_users = await self.db.get_free_users()
         premium_users = len(active_users) - len(free_users)
         
-        # Get total groups
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM user_groups")
-        total_groups = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM forwarding_logs WHERE status = 'success' AND date(timestamp) = date('now')")
-        today_forwards = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_registered = cursor.fetchone()[0]
-        
-        conn.close()
+        # Get totals
+        bot_stats = await self.db.get_bot_stats()
+        total_groups = bot_stats['total_groups']
+        today_forwards = bot_stats['today_forwards']
+        total_registered = bot_stats['total_registered']
+        log_stats = self.user_manager.log_writer.get_stats()
+        cache_stats = self.db.user_cache.get_stats()
+        campaign_stats = self.user_manager.campaigns.get_stats()
+        media_stats = self.user_manager.media_cache.get_stats()
+        mention_stats = self.user_manager.mentions.get_stats()
+        sched_stats = self.user_manager.scheduler.get_stats()
+        session_stats = self.user_manager.sessions.get_stats()
+        rss_text = f"{session_stats['rss_mb']:.0f} MB" if session_stats['rss_mb'] is not None else "n/a"
+        startup = self.user_manager.startup_progress
+        if startup['done']:
+            startup_text = f" (started in {startup['elapsed']:.0f}s, {startup['failed']} failed)"
+        else:
+            startup_text = f" (warming up: {startup['started']}/{startup['total']})"
+        rate_stats = self.user_manager.rate_limiter.get_stats()
+        flood_text = "".join(
+            f"\n  - {account}: {costs['flood_waits']} waits, {costs['flood_wait_seconds']:.0f}s, {costs['skipped']} sends skipped"
+            for account, costs in self.user_manager.rate_limiter.top_costs(3)
+        )
         
         stats_text = f"""
 📊 **Bot Statistics**
@@ -242,14 +244,40 @@ class AdminHandler:
 • Successful Forwards: {today_forwards}
 
 ⚙️ **System:**
-• Active Sessions: {len(self.user_manager.active_sessions)}
-• Running Automations: {len(self.user_manager.automation_tasks)}
+• Sessions: {session_stats['connected']} connected of {session_stats['registered']} logged in, {session_stats['pinned']} listening for mentions{startup_text}
+• Session Lifecycle: {session_stats['reconnects']} reconnects (avg {session_stats['avg_reconnect_ms']:.0f}ms), {session_stats['evictions']} idle disconnects, RSS {rss_text}
+• Running Automations: {len(self.user_manager.scheduler)} ({sched_stats['running']} sending now)
+• Scheduler: {sched_stats['cycles']} cycles, {sched_stats['overruns']} overruns ({sched_stats['skipped_slots']} slots skipped, max {sched_stats['max_overrun_s']:.0f}s), lag avg {sched_stats['avg_lag_ms']:.0f}ms
+• Rate Limiter: {rate_stats['throttled']} of {rate_stats['acquired']} sends delayed ({rate_stats['throttled_seconds']:.0f}s), {rate_stats['skipped']} skipped
+• FloodWait: {rate_stats['flood_waits']} waits ({rate_stats['flood_wait_seconds']:.0f}s), {sched_stats['deferrals']} cycles deferred{flood_text}
+• Log Queue: {log_stats['queue_depth']} rows (flush avg {log_stats['avg_flush_ms']:.1f}ms, max {log_stats['max_flush_ms']:.1f}ms), {log_stats['rows_dropped']} dropped, {log_stats['rows_quarantined']} bad rows
+• User Cache: {cache_stats['hit_rate']:.1f}% hits ({cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['size']} cached)
+• Campaign Snapshots: {campaign_stats['hit_rate']:.1f}% hits ({campaign_stats['size']} cached, {campaign_stats['invalidations']} rebuilt on change)
+• Ad Media: {media_stats['uploads']} uploads, {media_stats['hits']} reuses, {media_stats['downloads']} downloads ({media_stats['bytes'] / 1048576:.1f} MB held)
+• Mention Alerts: {mention_stats['received']} mentions in {mention_stats['sent']} messages ({mention_stats['dropped']} not listed)
 
 🕐 **Last Updated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         """
         
         await message.reply_text(stats_text)
     
+    async def dbstats_command(self, message: Message):
+        """Show database instrumentation report"""
+        if message.from_user.id != self.owner_id:
+            return
+        
+        metrics = self.db.metrics
+        args = message.text.split()
+        if len(args) > 1 and args[1] == "reset":
+            metrics.reset()
+            await message.reply_text("✅ DB stats reset")
+            return
+        
+        report = metrics.report()
+        if len(report) > 3900:
+            report = report[:3900] + "\n..."
+        await message.reply_text(f"🗄️ **Database Stats**\n\n```\n{report}\n```")
+    
     async def broadcast_text_command(self, message: Message):
         """Broadcast message to all users"""
         if message.from_user.id != self.owner_id:
@@ -262,17 +290,12 @@ class AdminHandler:
         
         broadcast_text = args[1]
         
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT user_id FROM users")
-        users = cursor.fetchall()
-        conn.close()
+        user_ids = await self.db.get_all_user_ids()
         
         sent = 0
         failed = 0
         
-        for user_row in users:
-            user_id = user_row[0]
+        for user_id in user_ids:
             try:
                 await self.bot.send_message(user_id, broadcast_text)
                 sent += 1
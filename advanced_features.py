@@ -4,13 +4,15 @@ Includes analytics, scheduling, ad rotation, and more
 """
 
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 from pyrogram import Client
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 import logging
 import json
 
+import rollups
+
 logger = logging.getLogger(__name__)
 
 class AnalyticsManager:
@@ -20,84 +22,117 @@ class AnalyticsManager:
         self.db = db
     
     def get_user_analytics(self, user_id: int, days: int = 7) -> Dict:
-        """Get user analytics for last N days"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Get total forwards
-        cursor.execute("""
-            SELECT COUNT(*) as total,
-                   SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as successful,
-                   SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed
-            FROM forwarding_logs
-            WHERE user_id = ? AND timestamp >= datetime('now', '-' || ? || ' days')
-        """, (user_id, days))
-        
-        stats = cursor.fetchone()
-        
-        # Get best performing groups
-        cursor.execute("""
-            SELECT group_name, COUNT(*) as forwards,
-                   SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as successful
-            FROM forwarding_logs
-            WHERE user_id = ? AND timestamp >= datetime('now', '-' || ? || ' days')
-            GROUP BY group_id
-            ORDER BY successful DESC
-            LIMIT 5
-        """, (user_id, days))
-        
-        top_groups = cursor.fetchall()
-        
-        # Get daily breakdown
-        cursor.execute("""
-            SELECT DATE(timestamp) as date,
-                   COUNT(*) as total,
-                   SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as successful
-            FROM forwarding_logs
-            WHERE user_id = ? AND timestamp >= datetime('now', '-' || ? || ' days')
-            GROUP BY DATE(timestamp)
-            ORDER BY date DESC
-        """, (user_id, days))
-        
-        daily_stats = cursor.fetchall()
-        
-        conn.close()
+        """Get user analytics for last N days (hour granularity, from the rollups)"""
+        since = rollups.hours_ago(days * 24)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Get total forwards
+            cursor.execute("""
+                SELECT COALESCE(SUM(successful), 0) as successful,
+                       COALESCE(SUM(failed), 0) as failed
+                FROM user_hourly_stats
+                WHERE user_id = ? AND hour >= ?
+            """, (user_id, since))
+            
+            successful, failed = cursor.fetchone()
+            total = successful + failed
+            
+            # Get best performing groups
+            cursor.execute("""
+                SELECT MAX(group_name) as group_name,
+                       SUM(successful + failed) as forwards,
+                       SUM(successful) as successful
+                FROM group_hourly_stats
+                WHERE user_id = ? AND hour >= ?
+                GROUP BY group_id
+                ORDER BY successful DESC
+                LIMIT 5
+            """, (user_id, since))
+            
+            top_groups = cursor.fetchall()
+            
+            # Get daily breakdown
+            cursor.execute("""
+                SELECT SUBSTR(hour, 1, 10) as date,
+                       SUM(successful + failed) as total,
+                       SUM(successful) as successful
+                FROM user_hourly_stats
+                WHERE user_id = ? AND hour >= ?
+                GROUP BY SUBSTR(hour, 1, 10)
+                ORDER BY date DESC
+            """, (user_id, since))
+            
+            daily_stats = cursor.fetchall()
         
         return {
-            'total_forwards': stats[0] or 0,
-            'successful': stats[1] or 0,
-            'failed': stats[2] or 0,
-            'success_rate': (stats[1] / stats[0] * 100) if stats[0] > 0 else 0,
+            'total_forwards': total,
+            'successful': successful,
+            'failed': failed,
+            'success_rate': (successful / total * 100) if total > 0 else 0,
             'top_groups': [{'name': g[0], 'forwards': g[1], 'successful': g[2]} for g in top_groups],
             'daily_stats': [{'date': d[0], 'total': d[1], 'successful': d[2]} for d in daily_stats]
         }
     
     def get_group_performance(self, user_id: int, group_id: int) -> Dict:
         """Get detailed performance for a specific group"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT 
+                    SUM(successful + failed) as total_forwards,
+                    SUM(successful) as successful,
+                    SUM(failed) as failed,
+                    MIN(first_at) as first_forward,
+                    MAX(last_at) as last_forward
+                FROM group_hourly_stats
+                WHERE user_id = ? AND group_id = ?
+            """, (user_id, group_id))
+            
+            stats = cursor.fetchone()
         
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_forwards,
-                SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as successful,
-                SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed,
-                MIN(timestamp) as first_forward,
-                MAX(timestamp) as last_forward
-            FROM forwarding_logs
-            WHERE user_id = ? AND group_id = ?
-        """, (user_id, group_id))
+        return self._performance(stats)
+    
+    def get_group_performance_many(self, user_id: int, group_ids: List[int]) -> Dict[int, Dict]:
+        """get_group_performance for several groups with one query"""
+        if not group_ids:
+            return {}
         
-        stats = cursor.fetchone()
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            
+            placeholders = ", ".join("?" for _ in group_ids)
+            cursor.execute(f"""
+                SELECT 
+                    group_id,
+                    SUM(successful + failed) as total_forwards,
+                    SUM(successful) as successful,
+                    SUM(failed) as failed,
+                    MIN(first_at) as first_forward,
+                    MAX(last_at) as last_forward
+                FROM group_hourly_stats
+                WHERE user_id = ? AND group_id IN ({placeholders})
+                GROUP BY group_id
+            """, (user_id, *group_ids))
+            
+            rows = {row[0]: row[1:] for row in cursor.fetchall()}
         
         return {
-            'total_forwards': stats[0] or 0,
+            group_id: self._performance(rows.get(group_id, (0, 0, 0, None, None)))
+            for group_id in group_ids
+        }
+    
+    @staticmethod
+    def _performance(stats) -> Dict:
+        total = stats[0] or 0
+        return {
+            'total_forwards': total,
             'successful': stats[1] or 0,
             'failed': stats[2] or 0,
             'first_forward': stats[3],
             'last_forward': stats[4],
-            'success_rate': (stats[1] / stats[0] * 100) if stats[0] > 0 else 0
+            'success_rate': ((stats[1] or 0) / total * 100) if total > 0 else 0
         }
 
 
@@ -106,61 +141,40 @@ class ScheduledCampaignManager:
     
     def __init__(self, db):
         self.db = db
-        self._init_table()
-    
-    def _init_table(self):
-        """Initialize scheduled campaigns table"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS scheduled_campaigns (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                ad_id INTEGER,
-                scheduled_time TIMESTAMP,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(user_id),
-                FOREIGN KEY (ad_id) REFERENCES ads(id)
-            )
-        """)
-        conn.commit()
-        conn.close()
     
     def schedule_campaign(self, user_id: int, ad_id: int, scheduled_time: datetime) -> int:
         """Schedule a campaign"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO scheduled_campaigns (user_id, ad_id, scheduled_time)
-            VALUES (?, ?, ?)
-        """, (user_id, ad_id, scheduled_time))
-        conn.commit()
-        campaign_id = cursor.lastrowid
-        conn.close()
+        with self.db.lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO scheduled_campaigns (user_id, ad_id, scheduled_time)
+                VALUES (?, ?, ?)
+                RETURNING id
+            """, (user_id, ad_id, scheduled_time))
+            campaign_id = cursor.fetchone()[0]
+            conn.commit()
         return campaign_id
     
     def get_pending_campaigns(self) -> List[Dict]:
         """Get campaigns ready to run"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM scheduled_campaigns
-            WHERE status = 'pending' AND scheduled_time <= datetime('now')
-        """)
-        campaigns = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM scheduled_campaigns
+                WHERE status = 'pending' AND scheduled_time <= ?
+            """, (now,))
+            campaigns = [dict(row) for row in cursor.fetchall()]
         return campaigns
     
     def mark_completed(self, campaign_id: int):
         """Mark campaign as completed"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE scheduled_campaigns SET status = 'completed' WHERE id = ?
-        """, (campaign_id,))
-        conn.commit()
-        conn.close()
+        with self.db.lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE scheduled_campaigns SET status = 'completed' WHERE id = ?
+            """, (campaign_id,))
+            conn.commit()
 
 
 class AdRotationManager:
@@ -171,14 +185,13 @@ class AdRotationManager:
     
     def get_user_ads(self, user_id: int) -> List[Dict]:
         """Get all active ads for a user"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM ads WHERE user_id = ? AND is_active = 1
-            ORDER BY created_at DESC
-        """, (user_id,))
-        ads = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM ads WHERE user_id = ? AND is_active = 1
+                ORDER BY created_at DESC
+            """, (user_id,))
+            ads = [dict(row) for row in cursor.fetchall()]
         return ads
     
     def get_next_ad_to_forward(self, user_id: int) -> Optional[Dict]:
@@ -189,16 +202,15 @@ class AdRotationManager:
         
         # Simple round-robin rotation
         # Track which ad was last used
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT ad_text FROM forwarding_logs
-            WHERE user_id = ? AND status = 'success'
-            ORDER BY timestamp DESC LIMIT 1
-        """, (user_id,))
-        
-        last_ad = cursor.fetchone()
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT ad_text FROM forwarding_logs
+                WHERE user_id = ? AND status = 'success'
+                ORDER BY timestamp DESC LIMIT 1
+            """, (user_id,))
+            
+            last_ad = cursor.fetchone()
         
         if not last_ad:
             return ads[0]
@@ -212,13 +224,15 @@ class AdRotationManager:
     
     def toggle_ad_status(self, ad_id: int, is_active: bool):
         """Enable/disable an ad"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE ads SET is_active = ? WHERE id = ?
-        """, (is_active, ad_id))
-        conn.commit()
-        conn.close()
+        with self.db.lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE ads SET is_active = ? WHERE id = ? RETURNING user_id
+            """, (is_active, ad_id))
+            row = cursor.fetchone()
+            conn.commit()
+        if row:
+            self.db.notify_change(row[0])
 
 
 class GroupManagementFeatures:
@@ -226,95 +240,74 @@ class GroupManagementFeatures:
     
     def __init__(self, db):
         self.db = db
-        self._init_tables()
-    
-    def _init_tables(self):
-        """Initialize group management tables"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Paused groups table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS paused_groups (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                group_id INTEGER,
-                paused_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )
-        """)
-        
-        # Group priority table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS group_priority (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                group_id INTEGER,
-                priority INTEGER DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
     
     def pause_group(self, user_id: int, group_id: int):
         """Pause forwarding to a group"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT OR IGNORE INTO paused_groups (user_id, group_id)
-            VALUES (?, ?)
-        """, (user_id, group_id))
-        conn.commit()
-        conn.close()
+        with self.db.lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO paused_groups (user_id, group_id)
+                VALUES (?, ?)
+                ON CONFLICT DO NOTHING
+            """, (user_id, group_id))
+            conn.commit()
+        self.db.notify_change(user_id)
     
     def resume_group(self, user_id: int, group_id: int):
         """Resume forwarding to a group"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            DELETE FROM paused_groups WHERE user_id = ? AND group_id = ?
-        """, (user_id, group_id))
-        conn.commit()
-        conn.close()
+        with self.db.lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM paused_groups WHERE user_id = ? AND group_id = ?
+            """, (user_id, group_id))
+            conn.commit()
+        self.db.notify_change(user_id)
     
     def is_group_paused(self, user_id: int, group_id: int) -> bool:
         """Check if group is paused"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM paused_groups WHERE user_id = ? AND group_id = ?
-        """, (user_id, group_id))
-        count = cursor.fetchone()[0]
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) FROM paused_groups WHERE user_id = ? AND group_id = ?
+            """, (user_id, group_id))
+            count = cursor.fetchone()[0]
         return count > 0
     
+    def get_paused_group_ids(self, user_id: int) -> set:
+        """All paused group ids of a user, for list views"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT group_id FROM paused_groups WHERE user_id = ?
+            """, (user_id,))
+            paused = {row[0] for row in cursor.fetchall()}
+        return paused
+    
     def set_group_priority(self, user_id: int, group_id: int, priority: int):
         """Set group priority (higher = sent first)"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO group_priority (user_id, group_id, priority)
-            VALUES (?, ?, ?)
-        """, (user_id, group_id, priority))
-        conn.commit()
-        conn.close()
+        with self.db.lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO group_priority (user_id, group_id, priority)
+                VALUES (?, ?, ?)
+                ON CONFLICT (user_id, group_id) DO UPDATE SET priority = excluded.priority
+            """, (user_id, group_id, priority))
+            conn.commit()
+        self.db.notify_change(user_id)
     
     def get_active_groups_sorted(self, user_id: int) -> List[Dict]:
         """Get active groups sorted by priority"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT ug.*, COALESCE(gp.priority, 0) as priority
-            FROM user_groups ug
-            LEFT JOIN group_priority gp ON ug.user_id = gp.user_id AND ug.group_id = gp.group_id
-            LEFT JOIN paused_groups pg ON ug.user_id = pg.user_id AND ug.group_id = pg.group_id
-            WHERE ug.user_id = ? AND pg.id IS NULL
-            ORDER BY priority DESC, ug.group_name ASC
-        """, (user_id,))
-        groups = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT ug.*, COALESCE(gp.priority, 0) as priority
+                FROM user_groups ug
+                LEFT JOIN group_priority gp ON ug.user_id = gp.user_id AND ug.group_id = gp.group_id
+                LEFT JOIN paused_groups pg ON ug.user_id = pg.user_id AND ug.group_id = pg.group_id
+                WHERE ug.user_id = ? AND pg.id IS NULL
+                ORDER BY priority DESC, ug.group_name ASC
+            """, (user_id,))
+            groups = [dict(row) for row in cursor.fetchall()]
         return groups
 
 
@@ -323,69 +316,46 @@ class ReferralSystem:
     
     def __init__(self, db):
         self.db = db
-        self._init_table()
-    
-    def _init_table(self):
-        """Initialize referral table"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS referrals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                referrer_id INTEGER,
-                referred_id INTEGER,
-                reward_granted BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (referrer_id) REFERENCES users(user_id),
-                FOREIGN KEY (referred_id) REFERENCES users(user_id)
-            )
-        """)
-        conn.commit()
-        conn.close()
     
     def create_referral(self, referrer_id: int, referred_id: int):
         """Record a referral"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO referrals (referrer_id, referred_id)
-            VALUES (?, ?)
-        """, (referrer_id, referred_id))
-        conn.commit()
-        conn.close()
+        with self.db.lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO referrals (referrer_id, referred_id)
+                VALUES (?, ?)
+            """, (referrer_id, referred_id))
+            conn.commit()
     
     def get_referral_count(self, user_id: int) -> int:
         """Get number of referrals"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM referrals WHERE referrer_id = ?
-        """, (user_id,))
-        count = cursor.fetchone()[0]
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) FROM referrals WHERE referrer_id = ?
+            """, (user_id,))
+            count = cursor.fetchone()[0]
         return count
     
     def get_pending_rewards(self, user_id: int) -> int:
         """Get pending rewards for referrals"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM referrals 
-            WHERE referrer_id = ? AND reward_granted = 0
-        """, (user_id,))
-        count = cursor.fetchone()[0]
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) FROM referrals 
+                WHERE referrer_id = ? AND reward_granted = 0
+            """, (user_id,))
+            count = cursor.fetchone()[0]
         return count
     
     def grant_reward(self, referral_id: int):
         """Mark reward as granted"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE referrals SET reward_granted = 1 WHERE id = ?
-        """, (referral_id,))
-        conn.commit()
-        conn.close()
+        with self.db.lock, self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE referrals SET reward_granted = 1 WHERE id = ?
+            """, (referral_id,))
+            conn.commit()
 
 
 class TemplateManager:
@@ -393,89 +363,40 @@ class TemplateManager:
     
     def __init__(self, db):
         self.db = db
-        self._init_table()
-    
-    def _init_table(self):
-        """Initialize templates table"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ad_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                category TEXT,
-                template_text TEXT,
-                is_public BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
-        
-        # Add default templates
-        self._add_default_templates()
-        conn.close()
-    
-    def _add_default_templates(self):
-        """Add default ad templates"""
-        default_templates = [
-            {
-                'name': 'Product Sale',
-                'category': 'ecommerce',
-                'text': '🔥 SPECIAL OFFER! 🔥\n\n💰 {product_name}\n✅ {discount}% OFF\n⏰ Limited Time!\n\n📱 Order Now: {link}'
-            },
-            {
-                'name': 'Service Promotion',
-                'category': 'service',
-                'text': '⭐ {service_name} ⭐\n\n✨ Professional Service\n💯 100% Satisfaction\n📞 Contact: {contact}\n\n🎁 First-time discount available!'
-            },
-            {
-                'name': 'Event Announcement',
-                'category': 'event',
-                'text': '📢 UPCOMING EVENT!\n\n🎉 {event_name}\n📅 Date: {date}\n📍 Venue: {venue}\n\n🎟️ Register: {link}'
-            },
-            {
-                'name': 'Job Opening',
-                'category': 'job',
-                'text': '💼 JOB OPENING\n\n🏢 Position: {position}\n📍 Location: {location}\n💰 Salary: {salary}\n\n📩 Apply: {contact}'
-            }
-        ]
-        
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        for template in default_templates:
-            cursor.execute("""
-                INSERT OR IGNORE INTO ad_templates (name, category, template_text)
-                VALUES (?, ?, ?)
-            """, (template['name'], template['category'], template['text']))
-        
-        conn.commit()
-        conn.close()
     
     def get_templates(self, category: str = None) -> List[Dict]:
         """Get ad templates"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        if category:
-            cursor.execute("""
-                SELECT * FROM ad_templates WHERE category = ? AND is_public = 1
-            """, (category,))
-        else:
-            cursor.execute("""
-                SELECT * FROM ad_templates WHERE is_public = 1
-            """)
-        
-        templates = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            
+            if category:
+                cursor.execute("""
+                    SELECT * FROM ad_templates WHERE category = ? AND is_public = 1
+                """, (category,))
+            else:
+                cursor.execute("""
+                    SELECT * FROM ad_templates WHERE is_public = 1
+                """)
+            
+            templates = [dict(row) for row in cursor.fetchall()]
         return templates
+    
+    def get_template(self, template_id: int) -> Optional[Dict]:
+        """Get a single template by id"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM ad_templates WHERE id = ?", (template_id,))
+            row = cursor.fetchone()
+        return dict(row) if row else None
 
 
 class SessionHealthMonitor:
     """Monitor session health and detect issues"""
     
     def __init__(self, db):
+        # db is the AsyncDatabase facade; analytics run on its executor
         self.db = db
+        self.analytics = AnalyticsManager(db.sync)
     
     async def check_session_health(self, user_id: int, user_client: Client) -> Dict:
         """Check if session is healthy"""
@@ -497,8 +418,7 @@ class SessionHealthMonitor:
                 health_status['issues'].append(f'User info error: {str(e)}')
             
             # Test 2: Check recent forwards success rate
-            analytics = AnalyticsManager(self.db)
-            stats = analytics.get_user_analytics(user_id, days=1)
+            stats = await self.db.run(self.analytics.get_user_analytics, user_id, days=1)
             
             if stats['total_forwards'] > 10 and stats['success_rate'] < 50:
                 health_status['warnings'].append(f"Low success rate: {stats['success_rate']:.1f}%")
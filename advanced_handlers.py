@@ -26,15 +26,15 @@ class AdvancedCommandHandlers:
         self.db = db
         self.user_manager = user_manager
         
-        # Initialize feature managers
-        self.analytics = AnalyticsManager(db)
-        self.scheduler = ScheduledCampaignManager(db)
-        self.ad_rotation = AdRotationManager(db)
-        self.group_mgmt = GroupManagementFeatures(db)
-        self.referral = ReferralSystem(db)
-        self.templates = TemplateManager(db)
+        # Initialize feature managers (blocking; always call them through db.run)
+        self.analytics = AnalyticsManager(db.sync)
+        self.scheduler = ScheduledCampaignManager(db.sync)
+        self.ad_rotation = AdRotationManager(db.sync)
+        self.group_mgmt = GroupManagementFeatures(db.sync)
+        self.referral = ReferralSystem(db.sync)
+        self.templates = TemplateManager(db.sync)
         self.health_monitor = SessionHealthMonitor(db)
-        self.reporter = ReportGenerator(db)
+        self.reporter = ReportGenerator(db.sync)
     
     # Analytics Commands
     async def analytics_command(self, message: Message):
@@ -61,7 +61,7 @@ class AdvancedCommandHandlers:
     
     async def show_analytics(self, user_id: int, days: int):
         """Display analytics for period"""
-        stats = self.analytics.get_user_analytics(user_id, days)
+        stats = await self.db.run(self.analytics.get_user_analytics, user_id, days)
         
         period_name = {1: "Today", 7: "This Week", 30: "This Month"}.get(days, f"Last {days} Days")
         
@@ -93,7 +93,7 @@ class AdvancedCommandHandlers:
         user_id = message.from_user.id
         
         # Get user ads
-        ads = self.ad_rotation.get_user_ads(user_id)
+        ads = await self.db.run(self.ad_rotation.get_user_ads, user_id)
         
         if not ads:
             await message.reply_text("❌ No ads available. Create an ad first with /setad")
@@ -111,7 +111,7 @@ class AdvancedCommandHandlers:
     async def myads_command(self, message: Message):
         """List all user ads with rotation status"""
         user_id = message.from_user.id
-        ads = self.ad_rotation.get_user_ads(user_id)
+        ads = await self.db.run(self.ad_rotation.get_user_ads, user_id)
         
         if not ads:
             await message.reply_text(
@@ -150,12 +150,7 @@ class AdvancedCommandHandlers:
             return
         
         # Get ad
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM ads WHERE id = ? AND user_id = ?", 
-                      (ad_id, message.from_user.id))
-        ad = cursor.fetchone()
-        conn.close()
+        ad = await self.db.get_ad(ad_id, message.from_user.id)
         
         if not ad:
             await message.reply_text("❌ Ad not found")
@@ -163,7 +158,7 @@ class AdvancedCommandHandlers:
         
         # Toggle status
         new_status = not ad['is_active']
-        self.ad_rotation.toggle_ad_status(ad_id, new_status)
+        await self.db.run(self.ad_rotation.toggle_ad_status, ad_id, new_status)
         
         await message.reply_text(
             f"✅ Ad #{ad_id} is now {'🟢 Active' if new_status else '🔴 Inactive'}"
@@ -173,7 +168,7 @@ class AdvancedCommandHandlers:
     async def pausegroup_command(self, message: Message):
         """Pause a specific group"""
         user_id = message.from_user.id
-        groups = self.db.get_user_groups(user_id)
+        groups = await self.db.get_user_groups(user_id)
         
         if not groups:
             await message.reply_text("❌ No groups found")
@@ -181,8 +176,9 @@ class AdvancedCommandHandlers:
         
         # Show groups with numbers
         text = "⏸️ **Pause Group**\n\nSelect group to pause:\n\n"
+        paused_ids = await self.db.run(self.group_mgmt.get_paused_group_ids, user_id)
         for i, group in enumerate(groups[:20], 1):
-            paused = self.group_mgmt.is_group_paused(user_id, group['group_id'])
+            paused = group['group_id'] in paused_ids
             status = "⏸️ Paused" if paused else "▶️ Active"
             text += f"{i}. {group['group_name']} - {status}\n"
         
@@ -193,13 +189,14 @@ class AdvancedCommandHandlers:
     async def resumegroup_command(self, message: Message):
         """Resume a paused group"""
         user_id = message.from_user.id
-        groups = self.db.get_user_groups(user_id)
+        groups = await self.db.get_user_groups(user_id)
         
         text = "▶️ **Resume Group**\n\nPaused groups:\n\n"
         
         paused_groups = []
+        paused_ids = await self.db.run(self.group_mgmt.get_paused_group_ids, user_id)
         for i, group in enumerate(groups, 1):
-            if self.group_mgmt.is_group_paused(user_id, group['group_id']):
+            if group['group_id'] in paused_ids:
                 paused_groups.append((i, group))
                 text += f"{i}. {group['group_name']}\n"
         
@@ -227,8 +224,8 @@ class AdvancedCommandHandlers:
         user_id = message.from_user.id
         username = (await self.bot.get_me()).username
         
-        referral_count = self.referral.get_referral_count(user_id)
-        pending_rewards = self.referral.get_pending_rewards(user_id)
+        referral_count = await self.db.run(self.referral.get_referral_count, user_id)
+        pending_rewards = await self.db.run(self.referral.get_pending_rewards, user_id)
         
         referral_link = f"https://t.me/{username}?start=ref_{user_id}"
         
@@ -264,7 +261,7 @@ Share now and earn Premium! 🚀
     # Templates
     async def templates_command(self, message: Message):
         """Show ad templates"""
-        templates = self.templates.get_templates()
+        templates = await self.db.run(self.templates.get_templates)
         
         if not templates:
             await message.reply_text("❌ No templates available")
@@ -303,11 +300,7 @@ Share now and earn Premium! 🚀
             return
         
         # Get template
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM ad_templates WHERE id = ?", (template_id,))
-        template = cursor.fetchone()
-        conn.close()
+        template = await self.db.run(self.templates.get_template, template_id)
         
         if not template:
             await message.reply_text("❌ Template not found")
@@ -332,20 +325,20 @@ Share now and earn Premium! 🚀
     async def report_command(self, message: Message):
         """Generate daily report"""
         user_id = message.from_user.id
-        report = self.reporter.generate_daily_report(user_id)
+        report = await self.db.run(self.reporter.generate_daily_report, user_id)
         await message.reply_text(report)
     
     async def weeklyreport_command(self, message: Message):
         """Generate weekly report"""
         user_id = message.from_user.id
-        report = self.reporter.generate_weekly_report(user_id)
+        report = await self.db.run(self.reporter.generate_weekly_report, user_id)
         await message.reply_text(report)
     
     # Session Health
     async def checkhealth_command(self, message: Message):
         """Check session health"""
         user_id = message.from_user.id
-        user_client = self.user_manager.active_sessions.get(user_id)
+        user_client = await self.user_manager.get_client(user_id)
         
         if not user_client:
             await message.reply_text(
@@ -383,7 +376,7 @@ Share now and earn Premium! 🚀
     async def groupstats_command(self, message: Message):
         """Show stats for a specific group"""
         user_id = message.from_user.id
-        groups = self.db.get_user_groups(user_id)
+        groups = await self.db.get_user_groups(user_id)
         
         if not groups:
             await message.reply_text("❌ No groups found")
@@ -392,8 +385,11 @@ Share now and earn Premium! 🚀
         text = "📊 **Group Statistics**\n\n"
         text += "Select a group to view detailed stats:\n\n"
         
+        performance = await self.db.run(
+            self.analytics.get_group_performance_many, user_id, [g['group_id'] for g in groups[:20]]
+        )
         for i, group in enumerate(groups[:20], 1):
-            perf = self.analytics.get_group_performance(user_id, group['group_id'])
+            perf = performance[group['group_id']]
             text += f"{i}. {group['group_name']}\n"
             text += f"   Success: {perf['success_rate']:.1f}% ({perf['successful']}/{perf['total_forwards']})\n\n"
         
@@ -405,7 +401,7 @@ Share now and earn Premium! 🚀
     async def autorotate_command(self, message: Message):
         """Enable/disable ad rotation"""
         user_id = message.from_user.id
-        ads = self.ad_rotation.get_user_ads(user_id)
+        ads = await self.db.run(self.ad_rotation.get_user_ads, user_id)
         
         if len(ads) < 2:
             await message.reply_text(
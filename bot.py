@@ -7,7 +7,8 @@ from datetime import datetime, timedelta
 import logging
 
 from config import *
-from database import Database
+from database import Database, AsyncDatabase
+from db_backends import create_backend
 from user_client import UserClientManager
 from utils import check_channel_membership, format_time
 
@@ -27,7 +28,7 @@ bot = Client(
 )
 
 # Initialize database
-db = Database()
+db = AsyncDatabase(Database(backend=create_backend(DATABASE_URL)))
 
 # Initialize user client manager
 user_manager = UserClientManager(bot, db)
@@ -39,7 +40,7 @@ async def start_command(client: Client, message: Message):
     username = message.from_user.username
     
     # Add user to database
-    db.add_user(user_id, username)
+    await db.add_user(user_id, username)
     
     # Check if user is member of force join channel
     if not await check_channel_membership(client, user_id, FORCE_JOIN_CHANNEL):
@@ -53,7 +54,7 @@ async def start_command(client: Client, message: Message):
         )
         return
     
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
     
     welcome_text = f"""
 🤖 **Welcome to Telegram Ads Forwarding BOT!**
@@ -183,14 +184,14 @@ To use this bot, you need to login with your Telegram account session.
 @bot.on_message(filters.command("status") & filters.private)
 async def status_command(client: Client, message: Message):
     user_id = message.from_user.id
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
     
     if not user or not user['session_string']:
         await message.reply_text("❌ You haven't logged in yet. Use /login to get started.")
         return
     
-    groups = db.get_user_groups(user_id)
-    ad = db.get_active_ad(user_id)
+    groups = await db.get_user_groups(user_id)
+    ad = await db.get_active_ad(user_id)
     
     is_premium = user['is_premium'] and user['subscription_expires'] and \
                  datetime.fromisoformat(user['subscription_expires']) > datetime.now()
@@ -240,7 +241,7 @@ async def status_command(client: Client, message: Message):
 @bot.on_message(filters.command("setad") & filters.private)
 async def setad_command(client: Client, message: Message):
     user_id = message.from_user.id
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
     
     if not user or not user['session_string']:
         await message.reply_text("❌ You haven't logged in yet. Use /login first.")
@@ -333,8 +334,8 @@ async def broadcast_command(client: Client, message: Message):
 # Admin: View stats
 @bot.on_message(filters.command("stats") & filters.private & filters.user(OWNER_ID))
 async def stats_command(client: Client, message: Message):
-    active_users = db.get_active_users()
-    free_users = db.get_free_users()
+    active_users = await db.get_active_users()
+    free_users = await db.get_free_users()
     
     stats_text = f"""
 📊 **Bot Statistics**
@@ -415,8 +416,8 @@ async def main():
     await bot.start()
     logger.info("✅ Bot started successfully!")
     
-    # Start user client manager
-    await user_manager.start()
+    # Start user sessions in the background
+    asyncio.create_task(user_manager.start())
     
     # Keep the bot running
     await asyncio.Event().wait()
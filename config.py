@@ -10,6 +10,82 @@ API_HASH = os.getenv("API_HASH", "")
 
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///bot_database.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", os.getenv("DB_POOL_SIZE", "8")))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", str(64 * 1024)))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+# Campaign snapshots are rebuilt on every change; the TTL only covers edits from outside the bot
+CAMPAIGN_CACHE_TTL = float(os.getenv("CAMPAIGN_CACHE_TTL", "3600"))
+
+# Query instrumentation (owner /dbstats); flags updates/cycles over the query budget
+DB_INSTRUMENT = os.getenv("DB_INSTRUMENT", "0") == "1"
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "20"))
+
+# Forwarding log group commit
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))
+
+# Forwarding log retention (monthly partitions older than this are archived)
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "90"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "log_archive")
+LOG_ARCHIVE_INTERVAL = float(os.getenv("LOG_ARCHIVE_INTERVAL", "3600"))
+DB_VACUUM_PAGES = int(os.getenv("DB_VACUUM_PAGES", "2000"))
+
+# Sending: concurrent sends per account within a cycle, and the pause
+# each of those workers takes between sends (seconds)
+SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "4"))
+GROUP_SEND_INTERVAL = float(os.getenv("GROUP_SEND_INTERVAL", "2"))
+
+# Ad media downloaded through the bot is kept in memory up to this size for per-account uploads
+MEDIA_CACHE_MB = int(os.getenv("MEDIA_CACHE_MB", "200"))
+
+# "send" posts the ad to every group; "copy" posts it once to the account's
+# Saved Messages ("me") or its log channel ("log_channel") and copies it from there
+AD_SEND_MODE = os.getenv("AD_SEND_MODE", "send")
+AD_STAGING_CHAT = os.getenv("AD_STAGING_CHAT", "me")
+
+# What goes to the user's log channel: off, failures (digest only when a send failed),
+# digest (one summary per cycle) or per_send (a message for every successful send)
+LOG_CHANNEL_VERBOSITY = os.getenv("LOG_CHANNEL_VERBOSITY", "digest")
+
+# A send that would wait longer than this (FloodWait) is skipped until the next cycle
+SEND_MAX_WAIT = float(os.getenv("SEND_MAX_WAIT", "30"))
+
+# User-client rate limits as (calls per second, burst); see rate_limiter.py
+ACCOUNT_RATE_LIMIT = (float(os.getenv("ACCOUNT_SEND_RATE", "1")), int(os.getenv("ACCOUNT_SEND_BURST", "10")))
+CHAT_RATE_LIMIT = (float(os.getenv("CHAT_SEND_RATE", "1")), int(os.getenv("CHAT_SEND_BURST", "3")))
+METHOD_RATE_LIMITS = {
+    "send_photo": (0.5, 5),
+    "send_video": (0.5, 5),
+    "create_channel": (1 / 300, 1),
+    "update_profile": (1 / 60, 2),
+}
+
+# Session startup: pinned sessions (mention alerts) connecting at once and admitted per second,
+# and seconds between progress log lines; other sessions are scheduled without connecting
+STARTUP_CONCURRENCY = int(os.getenv("STARTUP_CONCURRENCY", "20"))
+STARTUP_RATE = float(os.getenv("STARTUP_RATE", "5"))
+STARTUP_PROGRESS_INTERVAL = float(os.getenv("STARTUP_PROGRESS_INTERVAL", "10"))
+# First cycles after a restart: "last_run" continues from last_ad_run, "hash" spreads
+# users over their delay by id, "off" starts everyone at once
+STARTUP_PACING = os.getenv("STARTUP_PACING", "last_run")
+
+# User clients connect SESSION_PREWARM seconds before they are needed, disconnect after
+# SESSION_IDLE_TIMEOUT idle seconds, and at most MAX_CONNECTED_SESSIONS stay connected (0 = no cap).
+# Accounts with mention alerts stay connected to receive them, up to half the cap.
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "900"))
+SESSION_PREWARM = float(os.getenv("SESSION_PREWARM", "30"))
+MAX_CONNECTED_SESSIONS = int(os.getenv("MAX_CONNECTED_SESSIONS", "0"))
+
+# Mention alerts for a user are collected for MENTION_ALERT_WINDOW seconds and sent as
+# one bot message listing at most MENTION_ALERT_MAX of them
+MENTION_ALERT_WINDOW = float(os.getenv("MENTION_ALERT_WINDOW", "10"))
+MENTION_ALERT_MAX = int(os.getenv("MENTION_ALERT_MAX", "10"))
+
+# Owner ad broadcasts: accounts sending at once, and seconds between progress updates to the owner
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "15"))
 
 # Admin Configuration
 OWNER_ID = int(os.getenv("OWNER_ID", "0"))
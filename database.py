@@ -1,137 +1,171 @@
-import sqlite3
-from datetime import datetime, timedelta
+import contextvars
+import functools
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict
 import json
 import asyncio
+import time
 from threading import Lock
 
+import log_partitions
+import rollups
+from db_backends import SQLiteBackend
+from db_metrics import DBMetrics, InstrumentedConnection
+from migrations import MigrationRunner
+
+
+class UserCache:
+    """In-memory cache of users rows with a TTL and explicit invalidation
+    
+    Database invalidates an entry whenever it writes that user. The TTL only
+    bounds staleness for time-based fields such as subscription_expires, and
+    for edits made outside this process.
+    """
+    
+    def __init__(self, ttl: float = 60.0, max_size: int = 50000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Dict[int, tuple] = {}
+        self._versions: Dict[int, int] = {}
+        self._lock = Lock()
+        
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def get(self, user_id: int) -> Optional[Dict]:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return dict(entry[1])
+        self.misses += 1
+        return None
+    
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+    
+    def put(self, user_id: int, user: Dict, version: int):
+        """Store a row read at `version`; dropped if the user was written since"""
+        with self._lock:
+            if self._versions.get(user_id, 0) != version:
+                return
+            if len(self._entries) >= self.max_size and user_id not in self._entries:
+                self._entries.clear()
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(user))
+    
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self.invalidations += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups * 100) if lookups else 0.0,
+            'invalidations': self.invalidations,
+        }
+
+
 class Database:
-    def __init__(self, db_path="bot_database.db"):
-        self.db_path = db_path
-        self.lock = Lock()
+    def __init__(self, db_path="bot_database.db", pool_size: int = 8, pragmas: Dict = None,
+                 backend=None, user_cache_ttl: float = 60.0, metrics: DBMetrics = None):
+        # backend: a db_backends backend (see create_backend); defaults to SQLite at db_path
+        self.backend = backend or SQLiteBackend(db_path, pool_size, pragmas)
+        self.db_path = getattr(self.backend, "db_path", db_path)
+        self.dialect = self.backend.dialect
+        # Serializes writers on SQLite (readers share the pool under WAL); no-op on PostgreSQL
+        self.lock = self.backend.write_lock()
+        self._log_partitions = set()  # partitions known to exist (see log_partitions.py)
+        self.user_cache = UserCache(user_cache_ttl)
+        self.metrics = metrics or DBMetrics(enabled=False)
+        self._change_listeners = []
         self.init_db()
     
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
+        """Borrow a pooled connection; conn.close() returns it to the pool"""
+        conn = self.backend.acquire()
+        if self.metrics.enabled:
+            return InstrumentedConnection(conn, self.metrics)
         return conn
     
+    @contextmanager
+    def connection(self):
+        conn = self.backend.acquire()
+        try:
+            if self.metrics.enabled:
+                yield InstrumentedConnection(conn, self.metrics)
+            else:
+                yield conn
+        finally:
+            self.backend.release(conn)
+    
+    def close(self):
+        self.backend.close()
+    
+    def add_change_listener(self, listener):
+        """Call listener(user_id) after writes to a user's settings, groups or ads"""
+        self._change_listeners.append(listener)
+    
+    def notify_change(self, user_id: int):
+        for listener in self._change_listeners:
+            listener(user_id)
+    
     def init_db(self):
-        with self.lock:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Users table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    phone_number TEXT,
-                    session_string TEXT,
-                    is_premium BOOLEAN DEFAULT 0,
-                    subscription_expires TIMESTAMP,
-                    delay_seconds INTEGER DEFAULT 300,
-                    is_active BOOLEAN DEFAULT 0,
-                    log_channel_id INTEGER,
-                    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_ad_run TIMESTAMP
-                )
-            """)
-            
-            # Groups table (for forwarding)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS user_groups (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    group_id INTEGER,
-                    group_name TEXT,
-                    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id)
-                )
-            """)
-            
-            # Ads table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS ads (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    ad_text TEXT,
-                    media_type TEXT,
-                    media_file_id TEXT,
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id)
-                )
-            """)
-            
-            # Owner ads table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS owner_ads (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ad_text TEXT,
-                    media_type TEXT,
-                    media_file_id TEXT,
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Forwarding logs
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS forwarding_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    group_id INTEGER,
-                    group_name TEXT,
-                    status TEXT,
-                    error_message TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id)
-                )
-            """)
-            
-            # Payments table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS payments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    plan_type TEXT,
-                    amount INTEGER,
-                    payment_proof TEXT,
-                    status TEXT DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    approved_at TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id)
-                )
-            """)
-            
-            conn.commit()
-            conn.close()
+        """Apply pending schema migrations (see migrations.py)"""
+        self.migrations = MigrationRunner(self)
+        self.migrations.run()
+    
+    def explain(self, query: str, params: tuple = ()) -> List[str]:
+        """Return the query plan lines for a query"""
+        with self.connection() as conn:
+            return self.backend.explain(conn, query, params)
     
     # User operations
     def add_user(self, user_id: int, username: str = None):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT OR IGNORE INTO users (user_id, username)
+                INSERT INTO users (user_id, username)
                 VALUES (?, ?)
+                ON CONFLICT DO NOTHING
             """, (user_id, username))
             conn.commit()
-            conn.close()
+            self.user_cache.invalidate(user_id)
     
     def get_user(self, user_id: int) -> Optional[Dict]:
-        with self.lock:
-            conn = self.get_connection()
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
+        return self.load_user(user_id)
+    
+    def load_user(self, user_id: int) -> Optional[Dict]:
+        """Read a user from the database and refresh the cache"""
+        version = self.user_cache.version(user_id)
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
             row = cursor.fetchone()
-            conn.close()
-            return dict(row) if row else None
+            if not row:
+                return None
+            user = dict(row)
+        self.user_cache.put(user_id, user, version)
+        return user
     
     def update_user_session(self, user_id: int, session_string: str, phone_number: str):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE users 
@@ -139,11 +173,10 @@ class Database:
                 WHERE user_id = ?
             """, (session_string, phone_number, user_id))
             conn.commit()
-            conn.close()
+            self.user_cache.invalidate(user_id)
     
     def update_user_premium(self, user_id: int, is_premium: bool, days: int = 30):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             expires = datetime.now() + timedelta(days=days) if is_premium else None
             cursor.execute("""
@@ -152,11 +185,11 @@ class Database:
                 WHERE user_id = ?
             """, (is_premium, expires, user_id))
             conn.commit()
-            conn.close()
+            self.user_cache.invalidate(user_id)
+            self.notify_change(user_id)
     
     def update_user_delay(self, user_id: int, delay_seconds: int):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE users 
@@ -164,11 +197,11 @@ class Database:
                 WHERE user_id = ?
             """, (delay_seconds, user_id))
             conn.commit()
-            conn.close()
+            self.user_cache.invalidate(user_id)
+            self.notify_change(user_id)
     
     def set_user_active(self, user_id: int, is_active: bool):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE users 
@@ -176,11 +209,23 @@ class Database:
                 WHERE user_id = ?
             """, (is_active, user_id))
             conn.commit()
-            conn.close()
+            self.user_cache.invalidate(user_id)
+            self.notify_change(user_id)
+    
+    def set_mention_alerts(self, user_id: int, enabled: bool):
+        with self.lock, self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE users 
+                SET mention_alerts = ?
+                WHERE user_id = ?
+            """, (enabled, user_id))
+            conn.commit()
+            self.user_cache.invalidate(user_id)
+            self.notify_change(user_id)
     
     def set_log_channel(self, user_id: int, channel_id: int):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE users 
@@ -188,11 +233,23 @@ class Database:
                 WHERE user_id = ?
             """, (channel_id, user_id))
             conn.commit()
-            conn.close()
+            self.user_cache.invalidate(user_id)
+            self.notify_change(user_id)
+    
+    def clear_user_session(self, user_id: int):
+        with self.lock, self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE users 
+                SET session_string = NULL, is_active = 0
+                WHERE user_id = ?
+            """, (user_id,))
+            conn.commit()
+            self.user_cache.invalidate(user_id)
+            self.notify_change(user_id)
     
     def update_last_ad_run(self, user_id: int):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE users 
@@ -200,46 +257,42 @@ class Database:
                 WHERE user_id = ?
             """, (user_id,))
             conn.commit()
-            conn.close()
+            self.user_cache.invalidate(user_id)
     
     # Group operations
     def add_group(self, user_id: int, group_id: int, group_name: str):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT OR IGNORE INTO user_groups (user_id, group_id, group_name)
+                INSERT INTO user_groups (user_id, group_id, group_name)
                 VALUES (?, ?, ?)
+                ON CONFLICT DO NOTHING
             """, (user_id, group_id, group_name))
             conn.commit()
-            conn.close()
+            self.notify_change(user_id)
     
     def get_user_groups(self, user_id: int) -> List[Dict]:
-        with self.lock:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM user_groups WHERE user_id = ?
             """, (user_id,))
             rows = cursor.fetchall()
-            conn.close()
             return [dict(row) for row in rows]
     
     def remove_group(self, user_id: int, group_id: int):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM user_groups 
                 WHERE user_id = ? AND group_id = ?
             """, (user_id, group_id))
             conn.commit()
-            conn.close()
+            self.notify_change(user_id)
     
     # Ad operations
     def save_ad(self, user_id: int, ad_text: str, media_type: str = None, media_file_id: str = None):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE ads SET is_active = 0 WHERE user_id = ?
@@ -249,11 +302,10 @@ class Database:
                 VALUES (?, ?, ?, ?)
             """, (user_id, ad_text, media_type, media_file_id))
             conn.commit()
-            conn.close()
+            self.notify_change(user_id)
     
     def get_active_ad(self, user_id: int) -> Optional[Dict]:
-        with self.lock:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM ads 
@@ -262,62 +314,168 @@ class Database:
                 LIMIT 1
             """, (user_id,))
             row = cursor.fetchone()
-            conn.close()
+            return dict(row) if row else None
+    
+    def get_ad(self, ad_id: int, user_id: int) -> Optional[Dict]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM ads WHERE id = ? AND user_id = ?
+            """, (ad_id, user_id))
+            row = cursor.fetchone()
             return dict(row) if row else None
     
     # Owner ads
     def save_owner_ad(self, ad_text: str, media_type: str = None, media_file_id: str = None):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO owner_ads (ad_text, media_type, media_file_id)
                 VALUES (?, ?, ?)
+                RETURNING id
             """, (ad_text, media_type, media_file_id))
+            ad_id = cursor.fetchone()[0]
             conn.commit()
-            ad_id = cursor.lastrowid
-            conn.close()
             return ad_id
     
     def get_active_owner_ads(self) -> List[Dict]:
-        with self.lock:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM owner_ads WHERE is_active = 1
             """)
             rows = cursor.fetchall()
-            conn.close()
             return [dict(row) for row in rows]
     
     # Logs
     def add_forwarding_log(self, user_id: int, group_id: int, group_name: str, status: str, error: str = None):
-        with self.lock:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO forwarding_logs (user_id, group_id, group_name, status, error_message)
-                VALUES (?, ?, ?, ?, ?)
-            """, (user_id, group_id, group_name, status, error))
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self.add_forwarding_logs([(user_id, group_id, group_name, status, error, timestamp)])
+    
+    def add_forwarding_logs(self, rows: List[tuple]):
+        """Insert many (user_id, group_id, group_name, status, error, timestamp) rows in one transaction
+        
+        Rows go to their monthly partition (see log_partitions.py) and the
+        hourly rollups (see rollups.py) are updated in the same transaction.
+        """
+        with self.lock, self.connection() as conn:
+            try:
+                log_partitions.insert(conn, rows, self._log_partitions)
+                rollups.apply(conn, [(r[0], r[1], r[2], r[3], r[5]) for r in rows])
+                conn.commit()
+            except Exception:
+                # A rolled-back CREATE TABLE must not stay in the cache
+                self._log_partitions.clear()
+                raise
+    
+    def get_forwarding_logs(self, user_id: int, since: str, until: str = None, limit: int = 100) -> List[Dict]:
+        """Newest log rows of a user in [since, until), reading only the partitions in range"""
+        first, last = log_partitions.months_between(since, until)
+        logs = []
+        with self.connection() as conn:
+            partitions = conn.execute("""
+                SELECT name FROM log_partitions
+                WHERE status = 'active' AND month >= ? AND month <= ?
+                ORDER BY month DESC
+            """, (first, last)).fetchall()
+            
+            for partition in partitions:
+                rows = conn.execute(f"""
+                    SELECT * FROM {partition[0]}
+                    WHERE user_id = ? AND timestamp >= ? AND timestamp < ?
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                """, (user_id, since, until or "9999-12-31", limit - len(logs))).fetchall()
+                logs.extend(dict(row) for row in rows)
+                if len(logs) >= limit:
+                    break
+        return logs
+    
+    # Log retention
+    def get_log_partitions(self) -> List[Dict]:
+        with self.connection() as conn:
+            rows = conn.execute("SELECT * FROM log_partitions ORDER BY month").fetchall()
+            return [dict(row) for row in rows]
+    
+    def get_expired_log_partitions(self, before_month: str) -> List[str]:
+        """Active partitions for months strictly before before_month ('YYYY-MM')"""
+        with self.connection() as conn:
+            rows = conn.execute("""
+                SELECT name FROM log_partitions
+                WHERE status = 'active' AND month < ?
+                ORDER BY month
+            """, (before_month,)).fetchall()
+            return [row[0] for row in rows]
+    
+    def archive_log_partition(self, name: str, archive_dir: str) -> Dict:
+        """Copy a partition to <archive_dir>/<name>.jsonl.gz, then drop it
+        
+        The whole copy runs under the write lock, so no row can land in the
+        table between reading it and dropping it. The file is written and
+        renamed into place before the table is dropped, so a crash leaves
+        either the table or a complete archive (or both). A month archived
+        before (late rows re-created its table) gets a numbered file next to
+        the earlier one instead of replacing it.
+        """
+        if not name.startswith(log_partitions.PREFIX) or not name[len(log_partitions.PREFIX):].isdigit():
+            raise ValueError(f"Not a log partition: {name}")
+        
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"{name}.jsonl.gz")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(archive_dir, f"{name}.{suffix}.jsonl.gz")
+            suffix += 1
+        tmp_path = f"{path}.tmp"
+        
+        row_count = 0
+        with self.lock, self.connection() as conn:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as archive:
+                cursor = conn.execute(f"SELECT * FROM {name} ORDER BY id")
+                for row in cursor:
+                    archive.write(json.dumps(dict(row), default=str) + "\n")
+                    row_count += 1
+            
+            with open(tmp_path, "rb") as archive:
+                os.fsync(archive.fileno())
+            os.replace(tmp_path, path)
+            
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
+            conn.execute("""
+                UPDATE log_partitions
+                SET status = 'archived', row_count = row_count + ?, archive_path = ?,
+                    archived_at = CURRENT_TIMESTAMP
+                WHERE name = ?
+            """, (row_count, path, name))
             conn.commit()
-            conn.close()
+        self._log_partitions.discard(name)
+        
+        return {'name': name, 'rows': row_count, 'path': path, 'bytes': os.path.getsize(path)}
+    
+    def reclaim_space(self, max_pages: int) -> Optional[Dict]:
+        """Return up to max_pages free pages to the filesystem (see backend.reclaim_space)"""
+        with self.lock, self.connection() as conn:
+            return self.backend.reclaim_space(conn, max_pages)
     
     # Get all active users
     def get_active_users(self) -> List[Dict]:
-        with self.lock:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM users WHERE is_active = 1 AND session_string IS NOT NULL
             """)
             rows = cursor.fetchall()
-            conn.close()
             return [dict(row) for row in rows]
     
+    def get_all_user_ids(self) -> List[int]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT user_id FROM users")
+            return [row[0] for row in cursor.fetchall()]
+    
     # Get all free users
     def get_free_users(self) -> List[Dict]:
-        with self.lock:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM users 
@@ -326,26 +484,23 @@ class Database:
                 AND (is_premium = 0 OR subscription_expires < CURRENT_TIMESTAMP)
             """)
             rows = cursor.fetchall()
-            conn.close()
             return [dict(row) for row in rows]
     
     # Payment operations
     def create_payment_request(self, user_id: int, plan_type: str, amount: int, payment_proof: str):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO payments (user_id, plan_type, amount, payment_proof)
                 VALUES (?, ?, ?, ?)
+                RETURNING id
             """, (user_id, plan_type, amount, payment_proof))
+            payment_id = cursor.fetchone()[0]
             conn.commit()
-            payment_id = cursor.lastrowid
-            conn.close()
             return payment_id
     
     def get_pending_payments(self) -> List[Dict]:
-        with self.lock:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT p.*, u.username 
@@ -355,12 +510,10 @@ class Database:
                 ORDER BY p.created_at DESC
             """)
             rows = cursor.fetchall()
-            conn.close()
             return [dict(row) for row in rows]
     
     def approve_payment(self, payment_id: int):
-        with self.lock:
-            conn = self.get_connection()
+        with self.lock, self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE payments 
@@ -368,4 +521,92 @@ class Database:
                 WHERE id = ?
             """, (payment_id,))
             conn.commit()
-            conn.close()
+    
+    def reject_payment(self, payment_id: int):
+        with self.lock, self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE payments 
+                SET status = 'rejected'
+                WHERE id = ?
+            """, (payment_id,))
+            conn.commit()
+    
+    # Admin statistics
+    def get_bot_stats(self) -> Dict:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM user_groups")
+            total_groups = cursor.fetchone()[0]
+            
+            today = datetime.now(timezone.utc).strftime("%Y-%m-%d 00:00:00")
+            cursor.execute(
+                "SELECT COALESCE(SUM(successful), 0) FROM user_hourly_stats WHERE hour >= ?",
+                (today,)
+            )
+            today_forwards = cursor.fetchone()[0]
+            
+            cursor.execute("SELECT COUNT(*) FROM users")
+            total_registered = cursor.fetchone()[0]
+            
+            return {
+                'total_groups': total_groups,
+                'today_forwards': today_forwards,
+                'total_registered': total_registered
+            }
+
+
+class AsyncDatabase:
+    """Awaitable facade over Database
+    
+    Every Database method is exposed as a coroutine that runs on a dedicated
+    thread pool, so database I/O never blocks the event loop. Reads run in
+    parallel on the connection pool (WAL); writes are serialized by
+    Database.lock inside the worker threads.
+    """
+    
+    def __init__(self, db: Database, max_workers: int = 8):
+        self.sync = db
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+    
+    async def run(self, func, *args, **kwargs):
+        """Run any blocking DB callable (e.g. a feature manager method) off the loop"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        metrics = self.sync.metrics
+        if not metrics.enabled:
+            return await loop.run_in_executor(self.executor, call)
+        
+        # Carry the caller's query scope into the worker thread
+        context = contextvars.copy_context()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, context.run, call)
+        finally:
+            metrics.record_method(getattr(func, "__qualname__", repr(func)), (time.perf_counter() - started) * 1000)
+    
+    async def get_user(self, user_id: int) -> Optional[Dict]:
+        # Cache hits are answered on the loop without an executor round trip
+        user = self.sync.user_cache.get(user_id)
+        if user is not None:
+            return user
+        return await self.run(self.sync.load_user, user_id)
+    
+    def __getattr__(self, name):
+        if name in ("get_connection", "connection"):
+            raise AttributeError(f"{name}() is blocking; add a Database method and await it instead")
+        
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+        
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        
+        method.__name__ = name
+        setattr(self, name, method)
+        return method
+    
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.sync.close()
@@ -0,0 +1,282 @@
+"""
+Opt-in database instrumentation
+
+When enabled, every Database method called through AsyncDatabase and every
+raw query on a pooled connection is timed: call counts, a latency histogram
+and rows returned per method and per query. Queries are also attributed to
+the current scope (one bot update, or one automation cycle), and a scope
+that issues more than `query_budget` queries is flagged as a likely N+1.
+"""
+
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_current_scope: ContextVar = ContextVar("db_scope", default=None)
+
+
+def _bucket(ms: float) -> int:
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms <= bound:
+            return i
+    return len(BUCKETS_MS)
+
+
+def normalize(sql: str, width: int = 90) -> str:
+    """Collapse whitespace so the same query always maps to one key"""
+    text = " ".join(sql.split())
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+class Stat:
+    """Counters for one method or query"""
+
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[_bucket(ms)] += 1
+
+    def reobserve(self, old_ms: float, new_ms: float):
+        """Move a sample to a later latency (fetching finished after execute)"""
+        self.buckets[_bucket(old_ms)] -= 1
+        self.buckets[_bucket(new_ms)] += 1
+        self.total_ms += new_ms - old_ms
+        self.max_ms = max(self.max_ms, new_ms)
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile"""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+class Scope:
+    """Queries issued while handling one update or running one cycle"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.queries = 0
+        self.by_query = Counter()
+        self.started = time.perf_counter()
+
+
+class DBMetrics:
+    """Registry of per-method and per-query stats plus N+1 scopes"""
+
+    def __init__(self, enabled: bool = False, query_budget: int = 20, max_flagged: int = 50):
+        self.enabled = enabled
+        self.query_budget = query_budget
+        self.methods: Dict[str, Stat] = {}
+        self.queries: Dict[str, Stat] = {}
+        self.flagged = deque(maxlen=max_flagged)
+        self.scopes_closed = 0
+        self._lock = Lock()
+
+    def _stat(self, table: Dict[str, Stat], name: str) -> Stat:
+        # Callers hold self._lock
+        stat = table.get(name)
+        if stat is None:
+            stat = table[name] = Stat()
+        return stat
+
+    def record_method(self, name: str, ms: float):
+        with self._lock:
+            self._stat(self.methods, name).observe(ms)
+
+    def record_query(self, key: str, ms: float) -> Stat:
+        scope = _current_scope.get()
+        with self._lock:
+            stat = self._stat(self.queries, key)
+            stat.observe(ms)
+            if scope is not None:
+                scope.queries += 1
+                scope.by_query[key] += 1
+        return stat
+
+    def record_fetch(self, stat: Stat, old_ms: float, new_ms: float, rows: int):
+        with self._lock:
+            stat.reobserve(old_ms, new_ms)
+            stat.rows += rows
+
+    # Scopes
+    def begin_scope(self, name: str):
+        """Start attributing queries in this context to `name`; returns a token for end_scope"""
+        if not self.enabled:
+            return None
+        return _current_scope.set(Scope(name))
+
+    def end_scope(self, token):
+        if token is None:
+            return
+        scope = _current_scope.get()
+        _current_scope.reset(token)
+        if scope is not None:
+            self._close(scope)
+
+    def end_current_scope(self):
+        """End whatever scope is open in this context (for begin/end split across handlers)"""
+        scope = _current_scope.get()
+        if scope is not None:
+            _current_scope.set(None)
+            self._close(scope)
+
+    def _close(self, scope: Scope):
+        self.scopes_closed += 1
+        if scope.queries > self.query_budget:
+            top_query, repeats = scope.by_query.most_common(1)[0]
+            self.flagged.append({
+                'scope': scope.name,
+                'queries': scope.queries,
+                'top_query': top_query,
+                'repeats': repeats,
+                'duration_ms': (time.perf_counter() - scope.started) * 1000,
+                'at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+            logger.warning(
+                f"⚠️ {scope.name} issued {scope.queries} queries "
+                f"(budget {self.query_budget}); {repeats}x {top_query}"
+            )
+
+    @contextmanager
+    def scope(self, name: str):
+        token = self.begin_scope(name)
+        try:
+            yield
+        finally:
+            self.end_scope(token)
+
+    def reset(self):
+        with self._lock:
+            self.methods.clear()
+            self.queries.clear()
+            self.flagged.clear()
+            self.scopes_closed = 0
+
+    def top(self, table: Dict[str, Stat], limit: int = 10) -> List[tuple]:
+        with self._lock:
+            items = list(table.items())
+        return sorted(items, key=lambda item: item[1].total_ms, reverse=True)[:limit]
+
+    def report(self, limit: int = 8) -> str:
+        """Plain-text summary for the owner /dbstats command"""
+        if not self.enabled:
+            return "DB instrumentation is off (set DB_INSTRUMENT=1)."
+
+        lines = ["Methods by total time:"]
+        for name, stat in self.top(self.methods, limit):
+            lines.append(
+                f"  {name}: {stat.count}x, {stat.total_ms:.0f}ms total, "
+                f"p50<={stat.percentile(50):g}ms p95<={stat.percentile(95):g}ms max {stat.max_ms:.1f}ms"
+            )
+
+        lines.append("")
+        lines.append("Queries by total time:")
+        for key, stat in self.top(self.queries, limit):
+            avg_rows = stat.rows / stat.count if stat.count else 0
+            lines.append(
+                f"  {stat.count}x {stat.total_ms:.0f}ms p95<={stat.percentile(95):g}ms "
+                f"{avg_rows:.1f} rows/call: {key}"
+            )
+
+        lines.append("")
+        lines.append(f"Scopes over {self.query_budget} queries: {len(self.flagged)} of {self.scopes_closed}")
+        for entry in list(self.flagged)[-limit:]:
+            lines.append(
+                f"  {entry['at']} {entry['scope']}: {entry['queries']} queries, "
+                f"{entry['repeats']}x {entry['top_query']}"
+            )
+
+        return "\n".join(lines)
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute() through the last fetch and counts rows"""
+
+    def __init__(self, cursor, metrics: DBMetrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._stat: Optional[Stat] = None
+        self._started = 0.0
+        self._ms = 0.0
+
+    def execute(self, sql: str, params=()):
+        self._started = time.perf_counter()
+        self._cursor.execute(sql, params)
+        self._ms = (time.perf_counter() - self._started) * 1000
+        self._stat = self._metrics.record_query(normalize(sql), self._ms)
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        started = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_params)
+        self._metrics.record_query(normalize(sql), (time.perf_counter() - started) * 1000)
+        self._stat = None
+        return self
+
+    def _fetched(self, rows: int):
+        if self._stat is None:
+            return
+        ms = (time.perf_counter() - self._started) * 1000
+        self._metrics.record_fetch(self._stat, self._ms, ms, rows)
+        self._ms = ms
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._fetched(0 if row is None else 1)
+        return row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._fetched(len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are instrumented; close() still returns it to the pool"""
+
+    def __init__(self, conn, metrics: DBMetrics):
+        self._conn = conn
+        self._metrics = metrics
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor(), self._metrics)
+
+    def execute(self, sql: str, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
@@ -0,0 +1,48 @@
+"""
+Bounded-concurrency fan-out for one account's sends
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, List, Optional, Sequence
+
+
+async def fan_out(
+    items: Sequence,
+    send: Callable[[Any], Awaitable],
+    concurrency: int = 1,
+    spacing: float = 0.0,
+    key: Optional[Callable[[Any], Hashable]] = None,
+) -> List:
+    """Run send(item) for every item with at most `concurrency` sends in flight
+
+    Items with the same key(item) (the destination chat) form one lane and
+    are sent in order by a single worker, so a chat never sees two sends at
+    once or out of order. Each worker waits `spacing` seconds between its
+    sends, which caps the account at concurrency / spacing sends a second.
+
+    Returns one entry per item, in order: send()'s result, or the exception
+    it raised. Cancelling the caller cancels all in-flight sends.
+    """
+    results: List = [None] * len(items)
+    lanes: "OrderedDict[Hashable, List[int]]" = OrderedDict()
+    for index, item in enumerate(items):
+        lanes.setdefault(key(item) if key else index, []).append(index)
+
+    pending = iter(lanes.values())
+
+    async def worker():
+        first = True
+        for lane in pending:
+            for index in lane:
+                if not first and spacing > 0:
+                    await asyncio.sleep(spacing)
+                first = False
+                try:
+                    results[index] = await send(items[index])
+                except Exception as e:
+                    results[index] = e
+
+    workers = max(1, min(concurrency, len(lanes)))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return results
@@ -1,13 +1,13 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from database import Database
+from database import AsyncDatabase
 from utils import get_user_groups_from_account
 import logging
 
 logger = logging.getLogger(__name__)
 
 class AdHandler:
-    def __init__(self, bot: Client, db: Database, user_manager):
+    def __init__(self, bot: Client, db: AsyncDatabase, user_manager):
         self.bot = bot
         self.db = db
         self.user_manager = user_manager
@@ -50,7 +50,7 @@ class AdHandler:
                 return
             
             # Save ad
-            self.db.save_ad(user_id, ad_text, media_type, media_file_id)
+            await self.db.save_ad(user_id, ad_text, media_type, media_file_id)
             
             # Remove state
             del self.ad_setup_state[user_id]
@@ -68,7 +68,7 @@ class AdHandler:
             await message.reply_text(f"❌ Error saving ad: {str(e)}")
 
 class GroupHandler:
-    def __init__(self, bot: Client, db: Database, user_manager):
+    def __init__(self, bot: Client, db: AsyncDatabase, user_manager):
         self.bot = bot
         self.db = db
         self.user_manager = user_manager
@@ -76,13 +76,13 @@ class GroupHandler:
     async def add_groups_command(self, message: Message):
         """Handle add groups command"""
         user_id = message.from_user.id
-        user = self.db.get_user(user_id)
+        user = await self.db.get_user(user_id)
         
         if not user or not user['session_string']:
             await message.reply_text("❌ Please login first with /login")
             return
         
-        user_client = self.user_manager.active_sessions.get(user_id)
+        user_client = await self.user_manager.get_client(user_id)
         if not user_client:
             await message.reply_text("❌ Session not active. Please try /login again.")
             return
@@ -98,7 +98,7 @@ class GroupHandler:
             
             # Save all groups
             for group in groups:
-                self.db.add_group(user_id, group['id'], group['title'])
+                await self.db.add_group(user_id, group['id'], group['title'])
             
             groups_list = "\n".join([f"• {g['title']}" for g in groups[:20]])
             
@@ -118,7 +118,7 @@ class GroupHandler:
     async def list_groups_command(self, message: Message):
         """List all user groups"""
         user_id = message.from_user.id
-        groups = self.db.get_user_groups(user_id)
+        groups = await self.db.get_user_groups(user_id)
         
         if not groups:
             await message.reply_text("❌ No groups added yet. Use /addgroups to add groups.")
@@ -133,7 +133,7 @@ class GroupHandler:
         await message.reply_text(groups_text)
 
 class AutomationHandler:
-    def __init__(self, bot: Client, db: Database, user_manager):
+    def __init__(self, bot: Client, db: AsyncDatabase, user_manager):
         self.bot = bot
         self.db = db
         self.user_manager = user_manager
@@ -141,26 +141,26 @@ class AutomationHandler:
     async def start_ads_command(self, message: Message):
         """Start automation"""
         user_id = message.from_user.id
-        user = self.db.get_user(user_id)
+        user = await self.db.get_user(user_id)
         
         if not user or not user['session_string']:
             await message.reply_text("❌ Please login first with /login")
             return
         
         # Check if ad is set
-        ad = self.db.get_active_ad(user_id)
+        ad = await self.db.get_active_ad(user_id)
         if not ad:
             await message.reply_text("❌ Please set your ad first with /setad")
             return
         
         # Check if groups added
-        groups = self.db.get_user_groups(user_id)
+        groups = await self.db.get_user_groups(user_id)
         if not groups:
             await message.reply_text("❌ Please add groups first with /addgroups")
             return
         
         # Start automation
-        self.db.set_user_active(user_id, True)
+        await self.db.set_user_active(user_id, True)
         await self.user_manager.start_automation(user_id)
         
         delay_text = f"{user['delay_seconds']} seconds ({user['delay_seconds']//60} minutes)"
@@ -176,7 +176,7 @@ class AutomationHandler:
         """Stop automation"""
         user_id = message.from_user.id
         
-        self.db.set_user_active(user_id, False)
+        await self.db.set_user_active(user_id, False)
         await self.user_manager.stop_automation(user_id)
         
         await message.reply_text(
@@ -186,14 +186,14 @@ class AutomationHandler:
         )
 
 class DelayHandler:
-    def __init__(self, bot: Client, db: Database):
+    def __init__(self, bot: Client, db: AsyncDatabase):
         self.bot = bot
         self.db = db
     
     async def delay_command(self, message: Message):
         """Handle delay command"""
         user_id = message.from_user.id
-        user = self.db.get_user(user_id)
+        user = await self.db.get_user(user_id)
         
         if not user:
             await message.reply_text("❌ User not found. Use /start first.")
@@ -231,7 +231,7 @@ class DelayHandler:
                 )
                 return
             
-            self.db.update_user_delay(user_id, delay)
+            await self.db.update_user_delay(user_id, delay)
             
             await message.reply_text(
                 f"✅ **Delay Updated!**\n\n"
@@ -241,8 +241,50 @@ class DelayHandler:
         except ValueError:
             await message.reply_text("❌ Invalid delay. Please enter a number.")
 
+class MentionHandler:
+    def __init__(self, bot: Client, db: AsyncDatabase, user_manager):
+        self.bot = bot
+        self.db = db
+        self.user_manager = user_manager
+    
+    async def mentions_command(self, message: Message):
+        """Turn mention alerts on or off"""
+        user_id = message.from_user.id
+        user = await self.db.get_user(user_id)
+        
+        if not user:
+            await message.reply_text("❌ User not found. Use /start first.")
+            return
+        
+        args = message.text.split(maxsplit=1)
+        choice = args[1].strip().lower() if len(args) > 1 else ""
+        if choice not in ("on", "off"):
+            status = "ON" if user['mention_alerts'] else "OFF"
+            await message.reply_text(
+                f"🔔 **Mention Alerts:** {status}\n\n"
+                f"**Usage:** /mentions on|off\n\n"
+                f"With alerts off your account only sends ads and\n"
+                f"does not listen to your groups' messages."
+            )
+            return
+        
+        enabled = choice == "on"
+        await self.user_manager.set_mention_alerts(user_id, enabled)
+        
+        if enabled:
+            await message.reply_text(
+                "🔔 **Mention Alerts Enabled!**\n\n"
+                "You will be notified here when someone mentions you in a group."
+            )
+        else:
+            await message.reply_text(
+                "🔕 **Mention Alerts Disabled!**\n\n"
+                "Your account now only sends ads.\n\n"
+                "Use /mentions on to turn alerts back on."
+            )
+
 class UpgradeHandler:
-    def __init__(self, bot: Client, db: Database):
+    def __init__(self, bot: Client, db: AsyncDatabase):
         self.bot = bot
         self.db = db
         self.upgrade_state = {}
@@ -313,7 +355,7 @@ After sending screenshot, your payment will be reviewed by admin.
         upgrade_data = self.upgrade_state[user_id]
         
         # Save payment request
-        payment_id = self.db.create_payment_request(
+        payment_id = await self.db.create_payment_request(
             user_id,
             upgrade_data['plan'],
             upgrade_data['amount'],
@@ -0,0 +1,108 @@
+"""
+Retention job for the partitioned forwarding log
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import logging
+
+from database import AsyncDatabase
+from migrations import LEGACY_LOG_MOVE
+
+logger = logging.getLogger(__name__)
+
+
+class LogArchiver:
+    """Archive and drop log partitions older than the retention window
+
+    Every `interval` seconds: each monthly partition that ended more than
+    `retention_days` ago is written to a gzip'd JSON-lines file in
+    `archive_dir` and dropped, then at most `vacuum_pages` free pages are
+    returned to the filesystem so the write lock is only held briefly.
+    Nothing is archived until the legacy forwarding_logs rows have been
+    moved into their partitions.
+    """
+
+    def __init__(self, db: AsyncDatabase, archive_dir: str = "log_archive", retention_days: int = 90,
+                 interval: float = 3600, vacuum_pages: int = 2000):
+        self.db = db
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.interval = interval
+        self.vacuum_pages = vacuum_pages
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.runs = 0
+        self.partitions_archived = 0
+        self.rows_archived = 0
+        self.bytes_archived = 0
+        self.pages_freed = 0
+        self.free_pages = None
+        self.last_run_ms = 0.0
+
+    def start(self):
+        """Start the background retention task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def cutoff_month(self) -> str:
+        """Partitions for months before this one ('YYYY-MM') are past retention"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        return cutoff.strftime("%Y-%m")
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error archiving forwarding logs: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        """Archive expired partitions and spend one vacuum budget"""
+        started = time.perf_counter()
+
+        pending = await self.db.run(self.db.sync.migrations.pending_background)
+        if any(migration.name == LEGACY_LOG_MOVE for migration in pending):
+            logger.info("🗄️ Log archiving waits for the legacy log move to finish")
+            expired = []
+        else:
+            expired = await self.db.get_expired_log_partitions(self.cutoff_month())
+
+        for name in expired:
+            result = await self.db.archive_log_partition(name, self.archive_dir)
+            self.partitions_archived += 1
+            self.rows_archived += result['rows']
+            self.bytes_archived += result['bytes']
+            logger.info(f"🗄️ Archived {name}: {result['rows']} rows -> {result['path']}")
+
+        reclaimed = await self.db.reclaim_space(self.vacuum_pages)
+        if reclaimed:
+            self.pages_freed += reclaimed['freed_pages']
+            self.free_pages = reclaimed['free_pages']
+
+        self.runs += 1
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+
+    def get_stats(self) -> Dict:
+        return {
+            'runs': self.runs,
+            'partitions_archived': self.partitions_archived,
+            'rows_archived': self.rows_archived,
+            'bytes_archived': self.bytes_archived,
+            'pages_freed': self.pages_freed,
+            'free_pages': self.free_pages,
+            'last_run_ms': self.last_run_ms,
+        }
@@ -0,0 +1,82 @@
+"""
+Monthly partitions of the forwarding log
+
+Log rows live in one table per UTC month (forwarding_logs_YYYYMM), listed
+in the log_partitions table. Writers route each row by its timestamp and
+create the month's table on first use; whole months past the retention
+window are archived to compressed files and dropped (see log_archive.py),
+so the live database only holds recent logs. The old forwarding_logs table
+only keeps rows written before partitioning, until the background move in
+migrations.py drains it.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Set, Tuple
+
+PREFIX = "forwarding_logs_"
+
+COLUMNS = "user_id, group_id, group_name, status, error_message, timestamp"
+
+
+def month_of(timestamp) -> str:
+    """'2024-05-01 13:45:12' -> '2024-05'"""
+    if not timestamp:
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    month = str(timestamp)[:7]
+    if len(month) != 7 or not (month[:4].isdigit() and month[5:].isdigit()):
+        raise ValueError(f"Bad log timestamp: {timestamp!r}")
+    return month
+
+
+def table_for(month: str) -> str:
+    """'2024-05' -> 'forwarding_logs_202405'"""
+    return f"{PREFIX}{month[:4]}{month[5:7]}"
+
+
+def ensure(conn, month: str, known: Set[str] = None) -> str:
+    """Create the month's partition if needed; runs inside the caller's transaction"""
+    table = table_for(month)
+    if known is not None and table in known:
+        return table
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            group_id INTEGER,
+            group_name TEXT,
+            status TEXT,
+            error_message TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user_ts ON {table} (user_id, timestamp)")
+    conn.execute("""
+        INSERT INTO log_partitions (name, month, status)
+        VALUES (?, ?, 'active')
+        ON CONFLICT (name) DO UPDATE SET status = 'active'
+    """, (table, month))
+
+    if known is not None:
+        known.add(table)
+    return table
+
+
+def insert(conn, rows: Iterable[Tuple], known: Set[str] = None):
+    """Write (user_id, group_id, group_name, status, error, timestamp) rows to their partitions"""
+    by_month: Dict[str, List[Tuple]] = defaultdict(list)
+    for row in rows:
+        by_month[month_of(row[5])].append(row)
+
+    for month, month_rows in by_month.items():
+        table = ensure(conn, month, known)
+        conn.executemany(
+            f"INSERT INTO {table} ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+            month_rows
+        )
+
+
+def months_between(since: str, until: str = None) -> Tuple[str, str]:
+    """Month bounds used to prune partitions for a timestamp range"""
+    return month_of(since), month_of(until) if until else "9999-12"
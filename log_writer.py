@@ -0,0 +1,164 @@
+"""
+Buffered group-commit writer for forwarding_logs
+"""
+
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class ForwardingLogWriter:
+    """Queue forwarding log rows in memory and flush them in one transaction
+
+    A flush happens when `batch_size` rows are queued or `flush_interval`
+    seconds have passed, whichever comes first, and once more on stop().
+
+    If a batch fails, its rows are retried one at a time: rows that fail on
+    their own are quarantined (logged and kept in `quarantined`, not
+    retried), so one bad row cannot block every later flush. If none of the
+    first `probe_rows` rows gets through either, the database itself is
+    unavailable and the batch is queued again. At most `max_queue` rows are
+    held; the oldest are dropped first.
+    """
+
+    def __init__(self, db: AsyncDatabase, batch_size: int = 200, flush_interval: float = 2.0,
+                 max_queue: int = 50000, probe_rows: int = 3):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.probe_rows = probe_rows
+        self._queue: deque = deque(maxlen=max_queue)
+        self.quarantined: deque = deque(maxlen=100)  # (row, error) of the latest bad rows
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.rows_quarantined = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self):
+        """Start the background flush task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write everything still queued"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def add(self, user_id: int, group_id: int, group_name: str, status: str, error: str = None):
+        """Queue one log row; never blocks"""
+        if self._task is None:
+            self.start()
+
+        if len(self._queue) >= self.max_queue:
+            self.rows_dropped += 1  # the deque drops the oldest row
+
+        # Same format and timezone as SQLite's CURRENT_TIMESTAMP
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self._queue.append((user_id, group_id, group_name, status, error, timestamp))
+
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing forwarding logs: {e}")
+
+    async def flush(self):
+        """Write all queued rows with a single executemany/commit (row by row if that fails)"""
+        async with self._flush_lock:
+            if not self._queue:
+                return
+
+            rows = list(self._queue)
+            self._queue.clear()
+            started = time.perf_counter()
+            try:
+                await self.db.add_forwarding_logs(rows)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.warning(f"Forwarding log batch of {len(rows)} rows failed ({e}); retrying row by row")
+                rows = await self._write_rows(rows, e)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.rows_written += len(rows)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    async def _write_rows(self, rows: List[Tuple], batch_error: Exception) -> List[Tuple]:
+        """Write a failed batch one row at a time; returns the rows written"""
+        written, bad = [], []
+        for index, row in enumerate(rows):
+            try:
+                await self.db.add_forwarding_logs([row])
+                written.append(row)
+            except Exception as e:
+                bad.append((row, e))
+                if not written and len(bad) >= min(self.probe_rows, len(rows)):
+                    # Nothing gets through: the database is unavailable, not the rows.
+                    # The probed rows go last so the next retry probes different ones.
+                    self._requeue(rows[index + 1:] + rows[:index + 1])
+                    raise batch_error
+
+        for row, e in bad:
+            self.rows_quarantined += 1
+            self.quarantined.append((row, repr(e)))
+            logger.error(f"Dropped forwarding log row that cannot be written: {row} ({e})")
+        return written
+
+    def _requeue(self, rows: List[Tuple]):
+        """Put rows back in front of anything queued since, keeping the newest max_queue"""
+        queued = rows + list(self._queue)
+        overflow = max(0, len(queued) - self.max_queue)
+        self.rows_dropped += overflow
+        self._queue = deque(queued[overflow:], maxlen=self.max_queue)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def get_stats(self) -> Dict:
+        return {
+            'queue_depth': self.queue_depth,
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'rows_quarantined': self.rows_quarantined,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_ms': self.last_flush_ms,
+            'avg_flush_ms': (self.total_flush_ms / self.flushes) if self.flushes else 0.0,
+            'max_flush_ms': self.max_flush_ms,
+        }
@@ -6,14 +6,19 @@ Main entry point with all handlers integrated
 
 import os
 import asyncio
-from pyrogram import Client, filters
-from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram import Client, filters, idle
+from pyrogram.handlers import MessageHandler, CallbackQueryHandler
+from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 import logging
 
 from config import *
-from database import Database
+from database import Database, AsyncDatabase
+from db_metrics import DBMetrics
+from db_backends import create_backend
 from user_client import UserClientManager
-from handlers import AdHandler, GroupHandler, AutomationHandler, DelayHandler, UpgradeHandler
+from log_writer import ForwardingLogWriter
+from log_archive import LogArchiver
+from handlers import AdHandler, GroupHandler, AutomationHandler, DelayHandler, MentionHandler, UpgradeHandler
 from admin_handlers import AdminHandler
 from advanced_handlers import AdvancedCommandHandlers
 from utils import check_channel_membership
@@ -38,16 +43,34 @@ bot = Client(
 )
 
 # Initialize database
-db = Database()
+db = AsyncDatabase(
+    Database(backend=create_backend(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        pragmas={"mmap_size": DB_MMAP_SIZE, "cache_size": -DB_CACHE_SIZE_KB}
+    ), user_cache_ttl=USER_CACHE_TTL, metrics=DBMetrics(DB_INSTRUMENT, DB_QUERY_BUDGET)),
+    max_workers=DB_EXECUTOR_WORKERS
+)
+
+# Buffered writer for forwarding logs
+log_writer = ForwardingLogWriter(db, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL)
+log_archiver = LogArchiver(
+    db,
+    archive_dir=LOG_ARCHIVE_DIR,
+    retention_days=LOG_RETENTION_DAYS,
+    interval=LOG_ARCHIVE_INTERVAL,
+    vacuum_pages=DB_VACUUM_PAGES
+)
 
 # Initialize user client manager
-user_manager = UserClientManager(bot, db)
+user_manager = UserClientManager(bot, db, log_writer)
 
 # Initialize handlers
 ad_handler = AdHandler(bot, db, user_manager)
 group_handler = GroupHandler(bot, db, user_manager)
 automation_handler = AutomationHandler(bot, db, user_manager)
 delay_handler = DelayHandler(bot, db)
+mention_handler = MentionHandler(bot, db, user_manager)
 upgrade_handler = UpgradeHandler(bot, db)
 admin_handler = AdminHandler(bot, db, user_manager, OWNER_ID)
 advanced_handlers = AdvancedCommandHandlers(bot, db, user_manager)
@@ -60,7 +83,7 @@ async def start_command(client: Client, message: Message):
     username = message.from_user.username
     
     # Add user to database
-    db.add_user(user_id, username)
+    await db.add_user(user_id, username)
     
     # Check channel membership
     if not await check_channel_membership(client, user_id, FORCE_JOIN_CHANNEL):
@@ -74,7 +97,7 @@ async def start_command(client: Client, message: Message):
         )
         return
     
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
     
     welcome_text = f"""
 🤖 **Welcome to Telegram Ads Forwarding BOT!**
@@ -116,6 +139,7 @@ async def help_command(client: Client, message: Message):
 /logout - Logout from bot
 /status - Check status & statistics
 /checkhealth - Check session health
+/mentions - Mention alerts on/off
 
 **📢 Advertisement:**
 /setad - Set your advertisement
@@ -163,6 +187,7 @@ async def help_command(client: Client, message: Message):
 /ownerads - Save promotional ad
 /broadcast - Broadcast owner ad
 /broadcasttext - Broadcast message
+/dbstats - Database query report
     """
     await message.reply_text(help_text)
 
@@ -174,7 +199,7 @@ async def login_command(client: Client, message: Message):
         await message.reply_text(f"⚠️ Please join {FORCE_JOIN_CHANNEL} first!")
         return
     
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
     if user and user['session_string']:
         await message.reply_text(
             "✅ You're already logged in!\n\n"
@@ -210,23 +235,13 @@ async def logout_command(client: Client, message: Message):
     user_id = message.from_user.id
     
     # Stop automation
-    db.set_user_active(user_id, False)
-    await user_manager.stop_automation(user_id)
+    await db.set_user_active(user_id, False)
     
-    # Disconnect session
-    if user_id in user_manager.active_sessions:
-        try:
-            await user_manager.active_sessions[user_id].stop()
-            del user_manager.active_sessions[user_id]
-        except:
-            pass
+    # Stop automation and disconnect session
+    await user_manager.stop_user_session(user_id)
     
     # Remove from database
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET session_string = NULL, is_active = 0 WHERE user_id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    await db.clear_user_session(user_id)
     
     await message.reply_text(
         "✅ **Logged Out Successfully!**\n\n"
@@ -237,7 +252,7 @@ async def logout_command(client: Client, message: Message):
 @bot.on_message(filters.command("status") & filters.private)
 async def status_command(client: Client, message: Message):
     user_id = message.from_user.id
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
     
     if not user:
         await message.reply_text("❌ User not found. Use /start first.")
@@ -247,8 +262,8 @@ async def status_command(client: Client, message: Message):
         await message.reply_text("❌ Not logged in. Use /login to get started.")
         return
     
-    groups = db.get_user_groups(user_id)
-    ad = db.get_active_ad(user_id)
+    groups = await db.get_user_groups(user_id)
+    ad = await db.get_active_ad(user_id)
     
     from datetime import datetime
     is_premium = user['is_premium'] and user['subscription_expires'] and \
@@ -281,7 +296,7 @@ async def status_command(client: Client, message: Message):
 # Ad commands
 @bot.on_message(filters.command("setad") & filters.private)
 async def setad_command(client: Client, message: Message):
-    user = db.get_user(message.from_user.id)
+    user = await db.get_user(message.from_user.id)
     if not user or not user['session_string']:
         await message.reply_text("❌ Please login first: /login")
         return
@@ -289,7 +304,7 @@ async def setad_command(client: Client, message: Message):
 
 @bot.on_message(filters.command("viewad") & filters.private)
 async def viewad_command(client: Client, message: Message):
-    ad = db.get_active_ad(message.from_user.id)
+    ad = await db.get_active_ad(message.from_user.id)
     if not ad:
         await message.reply_text("❌ No ad set. Use /setad to create one.")
         return
@@ -325,6 +340,10 @@ async def stop_ads_command(client: Client, message: Message):
 async def delay_command(client: Client, message: Message):
     await delay_handler.delay_command(message)
 
+@bot.on_message(filters.command("mentions") & filters.private)
+async def mentions_command(client: Client, message: Message):
+    await mention_handler.mentions_command(message)
+
 @bot.on_message(filters.command("plans") & filters.private)
 async def plans_command(client: Client, message: Message):
     plans_text = """
@@ -367,6 +386,10 @@ async def upgrade_command(client: Client, message: Message):
 async def stats_command(client: Client, message: Message):
     await admin_handler.stats_command(message)
 
+@bot.on_message(filters.command("dbstats") & filters.private & filters.user(OWNER_ID))
+async def dbstats_command(client: Client, message: Message):
+    await admin_handler.dbstats_command(message)
+
 @bot.on_message(filters.command("payments") & filters.private & filters.user(OWNER_ID))
 async def payments_command(client: Client, message: Message):
     await admin_handler.payments_command(message)
@@ -392,9 +415,10 @@ async def broadcast_command(client: Client, message: Message):
     
     try:
         ad_id = int(args[1])
-        await message.reply_text(f"🚀 Broadcasting ad #{ad_id}...")
-        await user_manager.broadcast_owner_ad(ad_id)
-        await message.reply_text("✅ Broadcast completed!")
+        # Runs in the background; progress is edited into this message
+        status = await message.reply_text(f"🚀 Broadcasting ad #{ad_id}...")
+        if not user_manager.start_broadcast(ad_id, status):
+            await status.edit_text(f"⏳ Ad #{ad_id} is already being broadcast.")
     except Exception as e:
         await message.reply_text(f"❌ Error: {str(e)}")
 
@@ -488,6 +512,28 @@ async def callback_handler(client: Client, callback_query):
         await callback_query.message.edit_text(text)
         await callback_query.answer()
 
+# Per-update query scopes for /dbstats. Group -1 runs before and group 1000
+# after the handlers above, on the same dispatcher task, so every query made
+# while handling one update lands in one scope.
+if DB_INSTRUMENT:
+    async def begin_db_scope(client: Client, update):
+        if isinstance(update, CallbackQuery):
+            name = f"callback:{(update.data or '').split('_')[0]}"
+        elif update.text and update.text.startswith("/"):
+            name = f"command:{update.text.split()[0]}"
+        else:
+            name = "message"
+        db.metrics.end_current_scope()
+        db.metrics.begin_scope(name)
+    
+    async def end_db_scope(client: Client, update):
+        db.metrics.end_current_scope()
+    
+    bot.add_handler(MessageHandler(begin_db_scope), group=-1)
+    bot.add_handler(CallbackQueryHandler(begin_db_scope), group=-1)
+    bot.add_handler(MessageHandler(end_db_scope), group=1000)
+    bot.add_handler(CallbackQueryHandler(end_db_scope), group=1000)
+
 # Message handler for flows
 @bot.on_message(filters.private & ~filters.command([]))
 async def message_handler(client: Client, message: Message):
@@ -523,22 +569,36 @@ async def main():
     os.makedirs(SESSIONS_DIR, exist_ok=True)
     logger.info(f"📁 Sessions directory: {SESSIONS_DIR}")
     
+    # Start background writers and chunked schema migrations
+    log_writer.start()
+    log_archiver.start()
+    asyncio.create_task(db.migrations.run_background(db))
+    
     # Start bot
     logger.info("🔄 Starting bot client...")
     await bot.start()
     logger.info(f"✅ Bot started: @{(await bot.get_me()).username}")
     
-    # Start user client manager
-    logger.info("🔄 Loading user sessions...")
-    await user_manager.start()
-    logger.info(f"✅ Loaded {len(user_manager.active_sessions)} active sessions")
+    # Start user sessions in the background; commands are served while they warm up
+    startup = asyncio.create_task(user_manager.start())
     
     logger.info("=" * 50)
     logger.info("🎉 BOT IS READY!")
     logger.info("=" * 50)
     
-    # Keep running
-    await asyncio.Event().wait()
+    # Keep running until SIGINT/SIGTERM
+    await idle()
+    
+    logger.info("🔄 Shutting down...")
+    startup.cancel()
+    await user_manager.stop_broadcasts()
+    await user_manager.scheduler.stop()
+    await user_manager.sessions.stop()
+    await user_manager.mentions.stop()
+    await log_archiver.stop()
+    await log_writer.stop()
+    await bot.stop()
+    db.close()
 
 if __name__ == "__main__":
     try:
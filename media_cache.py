@@ -0,0 +1,105 @@
+"""
+Ad media shared between the bot and user accounts
+
+Ads store the bot's file_id, which a user account cannot send. MediaCache
+downloads the file once through the bot (kept in a small in-memory LRU),
+uploads it once per account and remembers the account's own file_id, so
+every later group and cycle reuses that reference. Each account holds one
+reference per slot ("ad" for its own ad, "owner" for owner broadcasts);
+asking for a different media in the same slot evicts the old one.
+"""
+
+import asyncio
+from collections import OrderedDict
+from io import BytesIO
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """Per-account uploaded-media references keyed by (account, slot)"""
+
+    def __init__(self, bot, max_bytes: int = 200 * 1024 * 1024):
+        self.bot = bot
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()  # bot file_id -> (data, name)
+        self._bytes = 0
+        self._refs: Dict[Tuple[int, str], Tuple[str, str]] = {}  # (account, slot) -> (bot file_id, account file_id)
+        self._locks: Dict[object, asyncio.Lock] = {}
+
+        # Metrics
+        self.downloads = 0
+        self.uploads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def _lock(self, key) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def _download(self, file_id: str) -> Tuple[bytes, str]:
+        async with self._lock(file_id):
+            cached = self._files.get(file_id)
+            if cached is not None:
+                self._files.move_to_end(file_id)
+                return cached
+
+            buffer = await self.bot.download_media(file_id, in_memory=True)
+            cached = (buffer.getvalue(), getattr(buffer, "name", "ad_media"))
+            self.downloads += 1
+
+            self._files[file_id] = cached
+            self._bytes += len(cached[0])
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                _, (data, _) = self._files.popitem(last=False)
+                self._bytes -= len(data)
+        self._locks.pop(file_id, None)
+        return cached
+
+    async def get(self, account: int, file_id: str, upload: Callable[[BytesIO], Awaitable[str]],
+                  slot: str = "ad") -> str:
+        """Account-local file_id for the bot's `file_id`, uploading it with `upload` on first use"""
+        key = (account, slot)
+        ref = self._refs.get(key)
+        if ref is not None and ref[0] == file_id:
+            self.hits += 1
+            return ref[1]
+
+        async with self._lock(key):
+            ref = self._refs.get(key)
+            if ref is not None and ref[0] == file_id:
+                self.hits += 1
+                return ref[1]
+            if ref is not None:
+                self.evictions += 1  # The ad changed
+
+            data, name = await self._download(file_id)
+            buffer = BytesIO(data)
+            buffer.name = name
+            account_file_id = await upload(buffer)
+            self.uploads += 1
+
+            self._refs[key] = (file_id, account_file_id)
+            logger.info(f"📤 Uploaded {slot} media for account {account}")
+            return account_file_id
+
+    def evict(self, account: int, slot: Optional[str] = None):
+        """Forget an account's references (e.g. Telegram rejected one as expired)"""
+        for key in [k for k in self._refs if k[0] == account and slot in (None, k[1])]:
+            del self._refs[key]
+            self.evictions += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'files': len(self._files),
+            'bytes': self._bytes,
+            'references': len(self._refs),
+            'downloads': self.downloads,
+            'uploads': self.uploads,
+            'hits': self.hits,
+            'evictions': self.evictions,
+        }
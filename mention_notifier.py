@@ -0,0 +1,104 @@
+"""
+Coalesced mention alerts
+
+The mention handlers on user clients only queue what they saw; this sends
+it through the bot. The first mention for a user opens a window of
+`window` seconds, and everything that arrives for that user until it
+closes goes out as one bot message listing up to `max_items` mentions.
+A busy group therefore costs one bot message per user per window,
+however many times the account is mentioned.
+"""
+
+import asyncio
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MentionNotifier:
+    """Batches mention alerts per user into one bot message per window"""
+
+    def __init__(self, bot, window: float = 10, max_items: int = 10):
+        self.bot = bot
+        self.window = window
+        self.max_items = max_items
+        self._pending: Dict[int, List[Dict]] = {}
+        self._overflow: Dict[int, int] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+        # Metrics
+        self.received = 0
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def add(self, user_id: int, mention: Dict):
+        """Queue a mention (by, username, group, text, link) for `user_id`; never waits"""
+        self.received += 1
+        pending = self._pending.setdefault(user_id, [])
+        if len(pending) < self.max_items:
+            pending.append(mention)
+        else:
+            self._overflow[user_id] = self._overflow.get(user_id, 0) + 1
+            self.dropped += 1
+
+        if user_id not in self._tasks:
+            self._tasks[user_id] = asyncio.create_task(self._flush_later(user_id))
+
+    async def _flush_later(self, user_id: int):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._tasks.pop(user_id, None)
+        await self._flush(user_id)
+
+    async def _flush(self, user_id: int):
+        mentions = self._pending.pop(user_id, [])
+        overflow = self._overflow.pop(user_id, 0)
+        if not mentions:
+            return
+        try:
+            await self.bot.send_message(user_id, self.format(mentions, overflow), disable_web_page_preview=True)
+            self.sent += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error sending mention alert to user {user_id}: {e}")
+
+    @staticmethod
+    def format(mentions: List[Dict], overflow: int = 0) -> str:
+        if len(mentions) == 1 and not overflow:
+            mention = mentions[0]
+            return (
+                f"🔔 **You were mentioned!**\n\n"
+                f"👤 By: {mention['by']} (@{mention['username'] or 'no_username'})\n"
+                f"👥 Group: {mention['group']}\n"
+                f"💬 Message: {mention['text']}\n\n"
+                f"🔗 [View Message]({mention['link']})"
+            )
+
+        lines = [f"🔔 **You were mentioned {len(mentions) + overflow} times!**\n"]
+        for mention in mentions:
+            lines.append(
+                f"👤 {mention['by']} in 👥 {mention['group']}: {mention['text'][:60]} "
+                f"([view]({mention['link']}))"
+            )
+        if overflow:
+            lines.append(f"\n…and {overflow} more")
+        return "\n".join(lines)
+
+    async def stop(self):
+        """Send whatever is still waiting for its window"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        for user_id in list(self._pending):
+            await self._flush(user_id)
+
+    def get_stats(self) -> Dict:
+        return {
+            'received': self.received,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'waiting': len(self._pending),
+        }
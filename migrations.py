@@ -0,0 +1,585 @@
+"""
+Versioned schema migrations
+
+Blocking steps (MIGRATIONS) run once at startup, in version order, and are
+tracked with the backend's schema version (PRAGMA user_version on SQLite). Expensive steps (BACKGROUND_MIGRATIONS:
+index builds, table rebuilds, backfills) are registered at startup and then
+run in small chunks off the event loop while the bot keeps serving.
+Every step's timing is recorded in the schema_migrations table.
+"""
+
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List
+import logging
+
+import log_partitions
+import rollups
+
+logger = logging.getLogger(__name__)
+
+
+class Migration:
+    """A blocking schema step applied once at startup"""
+
+    def __init__(self, version: int, name: str, statements: List[str] = None,
+                 apply: Callable = None):
+        self.version = version
+        self.name = name
+        self.statements = statements or []
+        self.apply = apply
+
+    def run(self, conn):
+        for statement in self.statements:
+            conn.execute(statement)
+        if self.apply:
+            self.apply(conn)
+
+
+class BackgroundMigration:
+    """An expensive step that runs in chunks after startup
+
+    prepare(conn) runs during the blocking phase and returns the initial
+    checkpoint; step(conn, checkpoint) does one chunk of work in its own
+    transaction and returns the next checkpoint, or None when finished.
+    Checkpoints are JSON-serializable and persisted after every chunk, so an
+    interrupted migration resumes where it stopped.
+    """
+
+    name = None
+
+    def prepare(self, conn):
+        return None
+
+    def step(self, conn, checkpoint):
+        raise NotImplementedError
+
+
+class IndexBuild(BackgroundMigration):
+    """Build one index outside the startup path
+
+    SQLite cannot build an index incrementally, so the build is a single
+    chunk; it runs on the DB executor while the bot serves, and any cleanup
+    statements (e.g. deduplication before a UNIQUE index) run in the same
+    transaction.
+    """
+
+    def __init__(self, name: str, create_sql: str, before: List[str] = None):
+        self.name = name
+        self.create_sql = create_sql
+        self.before = before or []
+
+    def step(self, conn, checkpoint):
+        for statement in self.before:
+            conn.execute(statement)
+        conn.execute(self.create_sql)
+        return None
+
+
+class ChunkedBackfill(BackgroundMigration):
+    """Run a statement over a table in id ranges of chunk_size rows
+
+    The statement receives (low, high) as its two parameters. The upper bound
+    is fixed at prepare time so rows written after startup are left to the
+    live write path.
+    """
+
+    def __init__(self, name: str, table: str, statement: str = None, chunk_size: int = 5000):
+        self.name = name
+        self.table = table
+        self.statement = statement
+        self.chunk_size = chunk_size
+
+    def prepare(self, conn):
+        row = conn.execute(f"SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM {self.table}").fetchone()
+        return {'next': row[0], 'last': row[1]}
+
+    def step(self, conn, checkpoint):
+        low = checkpoint['next']
+        if low > checkpoint['last'] or checkpoint['last'] == 0:
+            return None
+
+        high = min(low + self.chunk_size - 1, checkpoint['last'])
+        self.apply_chunk(conn, low, high)
+        return {'next': high + 1, 'last': checkpoint['last']}
+
+    def apply_chunk(self, conn, low: int, high: int):
+        conn.execute(self.statement, (low, high))
+
+
+class RollupBackfill(ChunkedBackfill):
+    """Fold forwarding_logs written before the rollup tables existed into them
+
+    The high-water mark is the last log id at prepare time; newer rows are
+    counted by Database.add_forwarding_logs as they are written.
+    """
+
+    def __init__(self, chunk_size: int = 5000):
+        super().__init__("backfill_hourly_rollups", "forwarding_logs", chunk_size=chunk_size)
+
+    def apply_chunk(self, conn, low: int, high: int):
+        rows = conn.execute("""
+            SELECT user_id, group_id, group_name, status, timestamp
+            FROM forwarding_logs WHERE id BETWEEN ? AND ?
+        """, (low, high)).fetchall()
+        rollups.apply(conn, [tuple(row) for row in rows])
+
+
+# Log retention must not archive a month while legacy rows are still moving into it
+LEGACY_LOG_MOVE = "move_legacy_forwarding_logs"
+
+
+class LegacyLogMove(ChunkedBackfill):
+    """Move rows from the pre-partitioning forwarding_logs table into monthly partitions
+
+    Waits for the rollup backfill, which reads the same rows, and deletes each
+    chunk from forwarding_logs in the transaction that copies it. Rows of a
+    month whose partition was already archived stay in forwarding_logs:
+    moving them would re-create the archived partition.
+    """
+
+    def __init__(self, chunk_size: int = 5000):
+        super().__init__(LEGACY_LOG_MOVE, "forwarding_logs", chunk_size=chunk_size)
+
+    def apply_chunk(self, conn, low: int, high: int):
+        row = conn.execute(
+            "SELECT status FROM schema_migrations WHERE name = 'backfill_hourly_rollups'"
+        ).fetchone()
+        if not row or row[0] != 'done':
+            raise RuntimeError("waiting for backfill_hourly_rollups")
+
+        archived = {row[0] for row in conn.execute(
+            "SELECT month FROM log_partitions WHERE status = 'archived'"
+        )}
+        rows = conn.execute(f"""
+            SELECT id, {log_partitions.COLUMNS}
+            FROM forwarding_logs WHERE id BETWEEN ? AND ?
+        """, (low, high)).fetchall()
+        moved = [row for row in rows if log_partitions.month_of(row[6]) not in archived]
+        if len(moved) < len(rows):
+            logger.warning(f"⚠️ Kept {len(rows) - len(moved)} legacy log rows of archived months "
+                           f"in forwarding_logs (ids {low}-{high})")
+
+        log_partitions.insert(conn, [tuple(row)[1:] for row in moved])
+        conn.executemany("DELETE FROM forwarding_logs WHERE id = ?", [(row[0],) for row in moved])
+
+
+# ============ SCHEMA ============
+
+# The tables from before the schema was versioned. The runner creates them
+# first on a database at version 0, as Database.init_db always did.
+BASE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        phone_number TEXT,
+        session_string TEXT,
+        is_premium BOOLEAN DEFAULT 0,
+        subscription_expires TIMESTAMP,
+        delay_seconds INTEGER DEFAULT 300,
+        is_active BOOLEAN DEFAULT 0,
+        log_channel_id INTEGER,
+        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_ad_run TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS user_groups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        group_id INTEGER,
+        group_name TEXT,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS ads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        ad_text TEXT,
+        media_type TEXT,
+        media_file_id TEXT,
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS owner_ads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ad_text TEXT,
+        media_type TEXT,
+        media_file_id TEXT,
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS forwarding_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        group_id INTEGER,
+        group_name TEXT,
+        status TEXT,
+        error_message TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        plan_type TEXT,
+        amount INTEGER,
+        payment_proof TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        approved_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )""",
+]
+
+# Each index covers one hot access path so the query never touches the table
+COVERING_INDEXES = [
+    # AnalyticsManager.get_user_analytics: user_id + timestamp range,
+    # aggregated by status, group and day
+    """CREATE INDEX IF NOT EXISTS idx_forwarding_logs_user_ts
+       ON forwarding_logs (user_id, timestamp, status, group_id, group_name)""",
+    # AnalyticsManager.get_group_performance: (user_id, group_id) with MIN/MAX
+    # timestamp; also lets the per-group top list group without a temp b-tree
+    """CREATE INDEX IF NOT EXISTS idx_forwarding_logs_user_group
+       ON forwarding_logs (user_id, group_id, timestamp, status, group_name)""",
+    # Admin stats: successful forwards since midnight
+    """CREATE INDEX IF NOT EXISTS idx_forwarding_logs_status_ts
+       ON forwarding_logs (status, timestamp)""",
+    # add_group relies on INSERT OR IGNORE, so drop historical duplicates
+    # and make (user_id, group_id) unique
+    """DELETE FROM user_groups WHERE id NOT IN (
+           SELECT MIN(id) FROM user_groups GROUP BY user_id, group_id
+       )""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_user_groups_user_group
+       ON user_groups (user_id, group_id)""",
+    # get_active_ad: WHERE user_id AND is_active ORDER BY created_at DESC
+    """CREATE INDEX IF NOT EXISTS idx_ads_user_active_created
+       ON ads (user_id, is_active, created_at)""",
+]
+
+CORE_TABLES = BASE_TABLES + [
+    # add_group relies on ON CONFLICT DO NOTHING, so drop historical duplicates
+    # and make (user_id, group_id) unique
+    """DELETE FROM user_groups WHERE id NOT IN (
+        SELECT MIN(id) FROM user_groups GROUP BY user_id, group_id
+    )""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_user_groups_user_group
+       ON user_groups (user_id, group_id)""",
+    # get_active_ad: WHERE user_id AND is_active ORDER BY created_at DESC
+    """CREATE INDEX IF NOT EXISTS idx_ads_user_active_created
+       ON ads (user_id, is_active, created_at)""",
+]
+
+FEATURE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS scheduled_campaigns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        ad_id INTEGER,
+        scheduled_time TIMESTAMP,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id),
+        FOREIGN KEY (ad_id) REFERENCES ads(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS paused_groups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        group_id INTEGER,
+        paused_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS group_priority (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        group_id INTEGER,
+        priority INTEGER DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS referrals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        referrer_id INTEGER,
+        referred_id INTEGER,
+        reward_granted BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (referrer_id) REFERENCES users(user_id),
+        FOREIGN KEY (referred_id) REFERENCES users(user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS ad_templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        category TEXT,
+        template_text TEXT,
+        is_public BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    # TemplateManager used to re-insert its defaults on every start
+    """DELETE FROM ad_templates WHERE id NOT IN (
+        SELECT MIN(id) FROM ad_templates GROUP BY name
+    )""",
+]
+
+DEFAULT_TEMPLATES = [
+    {
+        'name': 'Product Sale',
+        'category': 'ecommerce',
+        'text': '🔥 SPECIAL OFFER! 🔥\n\n💰 {product_name}\n✅ {discount}% OFF\n⏰ Limited Time!\n\n📱 Order Now: {link}'
+    },
+    {
+        'name': 'Service Promotion',
+        'category': 'service',
+        'text': '⭐ {service_name} ⭐\n\n✨ Professional Service\n💯 100% Satisfaction\n📞 Contact: {contact}\n\n🎁 First-time discount available!'
+    },
+    {
+        'name': 'Event Announcement',
+        'category': 'event',
+        'text': '📢 UPCOMING EVENT!\n\n🎉 {event_name}\n📅 Date: {date}\n📍 Venue: {venue}\n\n🎟️ Register: {link}'
+    },
+    {
+        'name': 'Job Opening',
+        'category': 'job',
+        'text': '💼 JOB OPENING\n\n🏢 Position: {position}\n📍 Location: {location}\n💰 Salary: {salary}\n\n📩 Apply: {contact}'
+    }
+]
+
+
+def seed_default_templates(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM ad_templates").fetchall()}
+    conn.executemany("""
+        INSERT INTO ad_templates (name, category, template_text)
+        VALUES (?, ?, ?)
+    """, [
+        (template['name'], template['category'], template['text'])
+        for template in DEFAULT_TEMPLATES
+        if template['name'] not in existing
+    ])
+
+
+# pause_group and set_group_priority are upserts on (user_id, group_id), which
+# needs a unique index up front (previously built in the background)
+GROUP_SETTINGS_UNIQUE = [
+    """DELETE FROM paused_groups WHERE id NOT IN (
+        SELECT MIN(id) FROM paused_groups GROUP BY user_id, group_id
+    )""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_paused_groups_user_group
+       ON paused_groups (user_id, group_id)""",
+    """DELETE FROM group_priority WHERE id NOT IN (
+        SELECT MAX(id) FROM group_priority GROUP BY user_id, group_id
+    )""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_group_priority_user_group
+       ON group_priority (user_id, group_id)""",
+]
+
+
+# Hourly counters maintained by Database.add_forwarding_logs (see rollups.py)
+HOURLY_ROLLUPS = [
+    """CREATE TABLE IF NOT EXISTS user_hourly_stats (
+        user_id INTEGER,
+        hour TEXT,
+        successful INTEGER DEFAULT 0,
+        failed INTEGER DEFAULT 0,
+        PRIMARY KEY (user_id, hour)
+    )""",
+    """CREATE TABLE IF NOT EXISTS group_hourly_stats (
+        user_id INTEGER,
+        group_id INTEGER,
+        hour TEXT,
+        group_name TEXT,
+        successful INTEGER DEFAULT 0,
+        failed INTEGER DEFAULT 0,
+        first_at TEXT,
+        last_at TEXT,
+        PRIMARY KEY (user_id, group_id, hour)
+    )""",
+    # Per-user and per-group reads use the primary keys; admin stats sum
+    # every user's counters since midnight
+    """CREATE INDEX IF NOT EXISTS idx_user_hourly_stats_hour
+       ON user_hourly_stats (hour, successful)""",
+]
+
+
+# New log rows go to forwarding_logs_YYYYMM tables (see log_partitions.py);
+# the old table is drained in the background, so its indexes only slow that down
+LOG_PARTITIONS = [
+    """CREATE TABLE IF NOT EXISTS log_partitions (
+        name TEXT PRIMARY KEY,
+        month TEXT,
+        status TEXT DEFAULT 'active',
+        row_count INTEGER DEFAULT 0,
+        archive_path TEXT,
+        archived_at TIMESTAMP
+    )""",
+    "DROP INDEX IF EXISTS idx_forwarding_logs_user_ts",
+    "DROP INDEX IF EXISTS idx_forwarding_logs_user_group",
+    "DROP INDEX IF EXISTS idx_forwarding_logs_status_ts",
+]
+
+# Accounts with mention alerts off run send-only clients (no update handling)
+MENTION_ALERTS = [
+    "ALTER TABLE users ADD COLUMN mention_alerts BOOLEAN DEFAULT 1",
+]
+
+
+# Versions are append-only: once a version has shipped, never edit its
+# statements or reuse its number. Change the schema in a new version instead.
+MIGRATIONS = [
+    Migration(1, "covering indexes", COVERING_INDEXES),
+    Migration(2, "feature tables", FEATURE_TABLES, apply=seed_default_templates),
+    Migration(3, "group settings unique", GROUP_SETTINGS_UNIQUE),
+    Migration(4, "hourly rollups", HOURLY_ROLLUPS),
+    Migration(5, "log partitions", LOG_PARTITIONS),
+    Migration(6, "mention alerts", MENTION_ALERTS),
+    Migration(7, "core tables", CORE_TABLES),
+]
+
+BACKGROUND_MIGRATIONS = [
+    # ScheduledCampaignManager.get_pending_campaigns: status + time range over a
+    # table that keeps every completed campaign
+    IndexBuild(
+        "idx_scheduled_campaigns_status_time",
+        """CREATE INDEX IF NOT EXISTS idx_scheduled_campaigns_status_time
+           ON scheduled_campaigns (status, scheduled_time)""",
+    ),
+    # ReferralSystem.get_referral_count / get_pending_rewards
+    IndexBuild(
+        "idx_referrals_referrer",
+        """CREATE INDEX IF NOT EXISTS idx_referrals_referrer
+           ON referrals (referrer_id, reward_granted)""",
+    ),
+    # Run in order: the move deletes the rows the rollup backfill reads
+    RollupBackfill(),
+    LegacyLogMove(),
+]
+
+
+# ============ RUNNER ============
+
+class MigrationRunner:
+    """Apply MIGRATIONS at startup and drive BACKGROUND_MIGRATIONS afterwards"""
+
+    def __init__(self, db, migrations: List[Migration] = None,
+                 background: List[BackgroundMigration] = None):
+        self.db = db
+        self.migrations = MIGRATIONS if migrations is None else migrations
+        self.background = BACKGROUND_MIGRATIONS if background is None else background
+        self.timings: List[Dict] = []
+
+    def _ensure_table(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                version INTEGER,
+                kind TEXT,
+                status TEXT,
+                checkpoint TEXT,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP,
+                duration_ms REAL DEFAULT 0
+            )
+        """)
+        conn.commit()
+
+    def run(self):
+        """Apply pending blocking migrations and register background ones"""
+        backend = self.db.backend
+        with self.db.lock, self.db.connection() as conn:
+            self._ensure_table(conn)
+            version = backend.get_schema_version(conn)
+            if version == 0:
+                for statement in BASE_TABLES:
+                    conn.execute(statement)
+
+            for migration in sorted(self.migrations, key=lambda m: m.version):
+                if migration.version <= version:
+                    continue
+
+                started = time.perf_counter()
+                try:
+                    migration.run(conn)
+                    backend.set_schema_version(conn, migration.version)
+                    duration_ms = (time.perf_counter() - started) * 1000
+                    conn.execute("""
+                        INSERT INTO schema_migrations
+                            (name, version, kind, status, finished_at, duration_ms)
+                        VALUES (?, ?, 'blocking', 'done', CURRENT_TIMESTAMP, ?)
+                        ON CONFLICT (name) DO UPDATE SET
+                            version = excluded.version, status = excluded.status,
+                            finished_at = excluded.finished_at, duration_ms = excluded.duration_ms
+                    """, (migration.name, migration.version, duration_ms))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    logger.error(f"Migration {migration.version} ({migration.name}) failed")
+                    raise
+
+                version = migration.version
+                self.timings.append({'name': migration.name, 'duration_ms': duration_ms})
+                logger.info(f"🗄️ Applied migration {migration.version} ({migration.name}) in {duration_ms:.1f}ms")
+
+            known = {row[0] for row in conn.execute("SELECT name FROM schema_migrations")}
+            for background in self.background:
+                if background.name in known:
+                    continue
+                checkpoint = background.prepare(conn)
+                conn.execute("""
+                    INSERT INTO schema_migrations (name, kind, status, checkpoint)
+                    VALUES (?, 'background', 'pending', ?)
+                """, (background.name, json.dumps(checkpoint)))
+            conn.commit()
+
+            backend.optimize(conn)
+
+    def pending_background(self) -> List[BackgroundMigration]:
+        with self.db.connection() as conn:
+            done = {row[0] for row in conn.execute(
+                "SELECT name FROM schema_migrations WHERE kind = 'background' AND status = 'done'"
+            )}
+        return [m for m in self.background if m.name not in done]
+
+    def run_background_step(self, migration: BackgroundMigration) -> bool:
+        """Run one chunk of a background migration; returns True once it is finished"""
+        with self.db.lock, self.db.connection() as conn:
+            row = conn.execute(
+                "SELECT checkpoint FROM schema_migrations WHERE name = ?", (migration.name,)
+            ).fetchone()
+            checkpoint = json.loads(row[0]) if row and row[0] else None
+
+            started = time.perf_counter()
+            try:
+                checkpoint = migration.step(conn, checkpoint)
+            except Exception:
+                conn.rollback()
+                raise
+            duration_ms = (time.perf_counter() - started) * 1000
+
+            done = checkpoint is None
+            conn.execute("""
+                UPDATE schema_migrations
+                SET status = ?, checkpoint = ?, duration_ms = duration_ms + ?,
+                    finished_at = CASE WHEN ? = 1 THEN CURRENT_TIMESTAMP ELSE NULL END
+                WHERE name = ?
+            """, ('done' if done else 'running', json.dumps(checkpoint), duration_ms, int(done), migration.name))
+            conn.commit()
+            return done
+
+    def run_all_background(self):
+        """Run every pending background migration to completion (blocking)"""
+        for migration in self.pending_background():
+            while not self.run_background_step(migration):
+                pass
+
+    async def run_background(self, adb, pause: float = 0.05):
+        """Drive pending background migrations chunk by chunk on the DB executor"""
+        for migration in self.pending_background():
+            logger.info(f"🗄️ Background migration {migration.name} started")
+            try:
+                while not await adb.run(self.run_background_step, migration):
+                    await asyncio.sleep(pause)
+            except Exception as e:
+                logger.error(f"Background migration {migration.name} failed: {e}")
+                continue
+            logger.info(f"🗄️ Background migration {migration.name} finished")
+
+    def get_status(self) -> List[Dict]:
+        with self.db.connection() as conn:
+            rows = conn.execute("SELECT * FROM schema_migrations ORDER BY started_at, version").fetchall()
+            return [dict(row) for row in rows]
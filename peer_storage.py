@@ -0,0 +1,89 @@
+"""
+Per-account peer storage that survives restarts
+
+User clients log in from the session string saved in the database, which
+pyrogram keeps in MemoryStorage: the peers it resolves (chat ids with
+their access hashes) are lost on every restart, and the first send to a
+group afterwards may need extra calls to resolve it again. PeerStorage
+keeps peers in SESSIONS_DIR/user_<id>.session instead, while the
+credentials still come from the session string and never touch the disk
+(the file only records whose peers it holds).
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, List
+
+from pyrogram.storage import FileStorage, MemoryStorage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PeerStorage(FileStorage):
+    """FileStorage for peers, with credentials held in memory from the session string"""
+
+    def __init__(self, name: str, workdir: str, session_string: str):
+        super().__init__(name, Path(workdir))
+        self.credentials = MemoryStorage(name, session_string)
+
+    async def open(self):
+        await self.credentials.open()
+        await super().open()
+
+        # A different Telegram account logged in: its access hashes would be invalid
+        owner = self.conn.execute("SELECT user_id FROM sessions").fetchone()[0]
+        account = await self.credentials.user_id()
+        if owner != account:
+            with self.conn:
+                if owner is not None:
+                    self.conn.execute("DELETE FROM peers")
+                    logger.info(f"🗑️ Cleared peers of another account in {self.database}")
+                self.conn.execute("UPDATE sessions SET user_id = ?", (account,))
+
+    async def close(self):
+        await super().close()
+        await self.credentials.close()
+
+    async def missing_peers(self, peer_ids: Iterable[int]) -> List[int]:
+        """Ids among `peer_ids` that are not stored yet"""
+        peer_ids = list(peer_ids)
+        known = set()
+        for i in range(0, len(peer_ids), 500):
+            chunk = peer_ids[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT id FROM peers WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            known.update(row[0] for row in rows)
+        return [peer_id for peer_id in peer_ids if peer_id not in known]
+
+    # Credentials: from the session string, never written to the file
+    async def dc_id(self, value: int = object):
+        return await self.credentials.dc_id(value)
+
+    async def api_id(self, value: int = object):
+        return await self.credentials.api_id(value)
+
+    async def test_mode(self, value: bool = object):
+        return await self.credentials.test_mode(value)
+
+    async def auth_key(self, value: bytes = object):
+        return await self.credentials.auth_key(value)
+
+    async def date(self, value: int = object):
+        return await self.credentials.date(value)
+
+    async def user_id(self, value: int = object):
+        return await self.credentials.user_id(value)
+
+    async def is_bot(self, value: bool = object):
+        return await self.credentials.is_bot(value)
+
+    @staticmethod
+    def remove(workdir: str, name: str):
+        """Delete an account's peer file (logout)"""
+        path = os.path.join(workdir, name + FileStorage.FILE_EXTENSION)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,242 @@
+"""
+Token-bucket rate limiting for user-client API calls
+
+Every send from a user account takes one token from up to three buckets:
+the account as a whole, the account's API method (send_message,
+create_channel, ...) and the destination chat for that account. A call
+waits until all of its buckets have a token, so accounts stay under
+Telegram's limits instead of running into FloodWait.
+
+When Telegram answers with FloodWait anyway, the observed wait becomes a
+"not before" deadline on the destination chat's bucket, so the rest of
+the account's groups keep going. If a second chat floods while the first
+is still waiting, the limit is evidently account-wide: the account's
+bucket for that method (or the account bucket, for methods without a limit
+of their own) is blocked as well. Penalized buckets run at half rate and
+creep back to the configured rate with each success. A slow mode wait
+only ever holds back its chat.
+
+Callers that would rather skip a destination than sleep through its
+deadline pass `max_wait` and get Throttled instead.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, Hashable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Throttled(Exception):
+    """The call would have to wait longer than the caller allows"""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"throttled for {seconds:.0f}s")
+        self.seconds = seconds
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`"""
+
+    __slots__ = ("base_rate", "rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token can be taken"""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def penalize(self, seconds: float, now: float, min_rate: float):
+        """Block for `seconds` and halve the rate (FloodWait feedback)"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.rate = max(min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+
+    def recover(self, step: float = 0.05):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * step)
+
+    def idle(self, now: float) -> bool:
+        """Full, unblocked and at the base rate: same as a fresh bucket"""
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until and self.rate >= self.base_rate
+
+
+class RateLimiter:
+    """Per-account, per-(account, method) and per-(account, chat) token buckets
+
+    Limits are (rate per second, burst) pairs. Methods missing from
+    `method_limits` are only limited by the account and chat buckets.
+    """
+
+    def __init__(self, account_limit: Tuple[float, float] = (1.0, 10),
+                 chat_limit: Tuple[float, float] = (1.0, 3),
+                 method_limits: Dict[str, Tuple[float, float]] = None,
+                 min_rate_factor: float = 0.05, prune_every: int = 10000):
+        self.account_limit = account_limit
+        self.chat_limit = chat_limit
+        self.method_limits = method_limits or {}
+        self.min_rate_factor = min_rate_factor
+        self.prune_every = prune_every
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._since_prune = 0
+
+        # Metrics
+        self.acquired = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+        self.skipped = 0
+        # Per account: what FloodWait cost in deadlines, waiting and skipped sends
+        self.account_costs: Dict[int, Dict] = defaultdict(
+            lambda: {'flood_waits': 0, 'flood_wait_seconds': 0.0, 'waited_seconds': 0.0, 'skipped': 0}
+        )
+        self._flooded_chats: Dict[int, Dict[int, float]] = {}
+
+    def _bucket(self, key: Hashable, limit: Tuple[float, float], now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(limit[0], limit[1], now)
+        return bucket
+
+    def _buckets_for(self, account: int, method: str, chat_id: Optional[int], now: float):
+        buckets = [self._bucket(("account", account), self.account_limit, now)]
+        limit = self.method_limits.get(method)
+        if limit:
+            buckets.append(self._bucket(("method", account, method), limit, now))
+        if chat_id is not None:
+            buckets.append(self._bucket(("chat", account, chat_id), self.chat_limit, now))
+        return buckets
+
+    async def acquire(self, account: int, method: str, chat_id: Optional[int] = None,
+                      max_wait: Optional[float] = None):
+        """Wait until `account` may call `method` (on `chat_id`), then take the tokens
+
+        Raises Throttled instead of waiting longer than `max_wait` seconds.
+        """
+        started = time.monotonic()
+        waited = False
+        while True:
+            now = time.monotonic()
+            buckets = self._buckets_for(account, method, chat_id, now)
+            wait = max(bucket.delay(now) for bucket in buckets)
+            if wait <= 0:
+                break
+            if max_wait is not None and wait > max_wait:
+                self.skipped += 1
+                self.account_costs[account]['skipped'] += 1
+                raise Throttled(wait)
+            waited = True
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.account_costs[account]['waited_seconds'] += time.monotonic() - now
+
+        for bucket in buckets:
+            bucket.take(now)
+
+        self.acquired += 1
+        if waited:
+            self.throttled += 1
+            self.throttled_seconds += now - started
+
+        self._since_prune += 1
+        if self._since_prune >= self.prune_every:
+            self._prune(now)
+
+    def succeeded(self, account: int, method: str):
+        """A call went through; let penalized buckets recover"""
+        for key in (("account", account), ("method", account, method)):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.recover()
+
+    def penalize(self, account: int, method: str, seconds: float, chat_id: Optional[int] = None,
+                 chat_only: bool = False):
+        """Feed back a FloodWait on a call to `chat_id` (None: not chat-specific)
+
+        `chat_only` is for slow mode waits, which never escalate to the account.
+        """
+        now = time.monotonic()
+        self.flood_waits += 1
+        self.flood_wait_seconds += seconds
+        costs = self.account_costs[account]
+        costs['flood_waits'] += 1
+        costs['flood_wait_seconds'] += seconds
+
+        account_wide = chat_id is None
+        if chat_id is not None:
+            self._bucket(("chat", account, chat_id), self.chat_limit, now).penalize(
+                seconds, now, self.chat_limit[0] * self.min_rate_factor
+            )
+            if not chat_only:
+                flooded = self._flooded_chats.setdefault(account, {})
+                for other in [c for c, until in flooded.items() if until <= now]:
+                    del flooded[other]
+                account_wide = any(c != chat_id for c in flooded)
+                flooded[chat_id] = now + seconds
+
+        if account_wide:
+            limit = self.method_limits.get(method)
+            key = ("method", account, method) if limit else ("account", account)
+            limit = limit or self.account_limit
+            self._bucket(key, limit, now).penalize(seconds, now, limit[0] * self.min_rate_factor)
+
+        scope = "account" if account_wide else f"chat {chat_id}"
+        logger.warning(f"🐢 Account {account} {method}: {scope} held back for {seconds}s")
+
+    def blocked_for(self, account: int, method: str, chat_id: Optional[int] = None) -> float:
+        """Seconds before `account` could call `method` (on `chat_id`) without waiting"""
+        now = time.monotonic()
+        return max(bucket.delay(now) for bucket in self._buckets_for(account, method, chat_id, now))
+
+    def not_before(self, account: int, method: str = None, chat_id: Optional[int] = None) -> float:
+        """Seconds left on FloodWait deadlines for this call (0 if none)"""
+        now = time.monotonic()
+        keys = [("account", account), ("method", account, method), ("chat", account, chat_id)]
+        deadlines = [self._buckets[key].blocked_until for key in keys if key in self._buckets]
+        return max([0.0] + [deadline - now for deadline in deadlines])
+
+    def _prune(self, now: float):
+        self._since_prune = 0
+        for key in [key for key, bucket in self._buckets.items() if bucket.idle(now)]:
+            del self._buckets[key]
+        for account in [a for a, chats in self._flooded_chats.items() if max(chats.values(), default=0) <= now]:
+            del self._flooded_chats[account]
+
+    def top_costs(self, limit: int = 5):
+        """Accounts that lost the most send time to FloodWait"""
+        return sorted(self.account_costs.items(), key=lambda item: item[1]['flood_wait_seconds'], reverse=True)[:limit]
+
+    def get_stats(self) -> Dict:
+        return {
+            'buckets': len(self._buckets),
+            'acquired': self.acquired,
+            'throttled': self.throttled,
+            'throttled_seconds': self.throttled_seconds,
+            'flood_waits': self.flood_waits,
+            'flood_wait_seconds': self.flood_wait_seconds,
+            'skipped': self.skipped,
+        }
@@ -0,0 +1,84 @@
+"""
+Hourly rollups of forwarding_logs
+
+Every forwarding log row also bumps two counters, in the same transaction:
+user_hourly_stats (per user per hour) and group_hourly_stats (per user,
+group and hour). Analytics, reports and admin stats read these tables, so
+their cost depends on the number of active hours, not on log volume.
+Buckets are UTC 'YYYY-MM-DD HH:00:00' strings, the same format as log
+timestamps.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Tuple
+
+STATUS_COLUMNS = {"success": "successful", "failed": "failed"}
+
+
+def hour_bucket(timestamp) -> str:
+    """'2024-05-01 13:45:12' -> '2024-05-01 13:00:00'"""
+    return f"{str(timestamp)[:13]}:00:00"
+
+
+def hours_ago(hours: float) -> str:
+    """Bucket of the hour `hours` hours before now (UTC)"""
+    return hour_bucket((datetime.now(timezone.utc) - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def aggregate(rows: Iterable[Tuple]) -> Tuple[Dict, Dict]:
+    """Fold (user_id, group_id, group_name, status, timestamp) rows into per-hour counters"""
+    users = defaultdict(lambda: [0, 0])
+    groups = {}
+
+    for user_id, group_id, group_name, status, timestamp in rows:
+        column = STATUS_COLUMNS.get(status)
+        if column is None:
+            continue
+        idx = 0 if column == "successful" else 1
+        hour = hour_bucket(timestamp)
+        ts = str(timestamp)
+
+        users[(user_id, hour)][idx] += 1
+
+        entry = groups.get((user_id, group_id, hour))
+        if entry is None:
+            entry = groups[(user_id, group_id, hour)] = [group_name, 0, 0, ts, ts]
+        entry[0] = group_name or entry[0]
+        entry[1 + idx] += 1
+        entry[3] = min(entry[3], ts)
+        entry[4] = max(entry[4], ts)
+
+    return users, groups
+
+
+def apply(conn, rows: Iterable[Tuple]):
+    """Add rows to the rollup tables; runs inside the caller's transaction"""
+    users, groups = aggregate(rows)
+
+    if users:
+        conn.executemany("""
+            INSERT INTO user_hourly_stats (user_id, hour, successful, failed)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, hour) DO UPDATE SET
+                successful = user_hourly_stats.successful + excluded.successful,
+                failed = user_hourly_stats.failed + excluded.failed
+        """, [(user_id, hour, s, f) for (user_id, hour), (s, f) in users.items()])
+
+    if groups:
+        conn.executemany("""
+            INSERT INTO group_hourly_stats
+                (user_id, group_id, hour, group_name, successful, failed, first_at, last_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, group_id, hour) DO UPDATE SET
+                group_name = COALESCE(excluded.group_name, group_hourly_stats.group_name),
+                successful = group_hourly_stats.successful + excluded.successful,
+                failed = group_hourly_stats.failed + excluded.failed,
+                first_at = CASE WHEN excluded.first_at < group_hourly_stats.first_at
+                                THEN excluded.first_at ELSE group_hourly_stats.first_at END,
+                last_at = CASE WHEN excluded.last_at > group_hourly_stats.last_at
+                               THEN excluded.last_at ELSE group_hourly_stats.last_at END
+        """, [
+            (user_id, group_id, hour, name, s, f, first_at, last_at)
+            for (user_id, group_id, hour), (name, s, f, first_at, last_at) in groups.items()
+        ])
@@ -0,0 +1,214 @@
+"""
+Central scheduler for automation cycles
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SendScheduler:
+    """One task and one min-heap for every account's send cycle
+
+    Each key (an account, or account + campaign) has a due time in the heap.
+    When it comes due the scheduler runs `job(key)` as its own task; the job
+    returns the interval in seconds until its next cycle, or None to stop.
+    Deadlines are fixed-rate: the next cycle is due `interval` after the
+    previous due time, not after the cycle finished, so sending time does
+    not accumulate as drift. A cycle that runs past its next deadline is an
+    overrun; the missed slots are skipped and counted. defer() sets a "not
+    before" deadline for a key (an account under FloodWait), which pushes
+    its next cycle back without touching anyone else's.
+
+    add() and remove() are O(log n) / O(1): removal marks the heap entry dead
+    and it is discarded when it reaches the top.
+    """
+
+    def __init__(self, job: Callable[[Hashable], Awaitable[Optional[float]]],
+                 retry_delay: float = 60.0, min_interval: float = 1.0):
+        self.job = job
+        self.retry_delay = retry_delay
+        self.min_interval = min_interval
+        self._heap = []
+        self._entries: Dict[Hashable, list] = {}
+        self._running: Dict[Hashable, asyncio.Task] = {}
+        self._not_before: Dict[Hashable, float] = {}
+        self._seq = itertools.count()
+        self._dead = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.cycles = 0
+        self.errors = 0
+        self.overruns = 0
+        self.deferrals = 0
+        self.skipped_slots = 0
+        self.max_overrun = 0.0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.total_cycle_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._running)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries or key in self._running
+
+    def start(self):
+        """Start the dispatch task"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Stop dispatching and cancel running cycles"""
+        tasks = list(self._running.values())
+        if self._task:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._running.clear()
+
+    def add(self, key, delay: float = 0.0) -> bool:
+        """Schedule `key` to run after `delay` seconds; False if already scheduled"""
+        if key in self:
+            return False
+        self.start()
+        self._push(key, asyncio.get_running_loop().time() + delay)
+        return True
+
+    def remove(self, key) -> bool:
+        """Unschedule `key`, cancelling its cycle if one is running"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[3] = False
+            self._dead += 1
+            if self._dead > 64 and self._dead > len(self._heap) // 2:
+                self._compact()
+
+        self._not_before.pop(key, None)
+        task = self._running.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+        return entry is not None or task is not None
+
+    def defer(self, key, delay: float):
+        """Don't run `key` again for at least `delay` seconds"""
+        until = asyncio.get_running_loop().time() + delay
+        self.deferrals += 1
+        if key in self._running:
+            self._not_before[key] = max(until, self._not_before.get(key, 0.0))
+            return
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < until:
+            self.remove(key)
+            self._push(key, until)
+
+    def next_due_in(self, key) -> Optional[float]:
+        """Seconds until `key` is due (0 while it is running)"""
+        if key in self._running:
+            return 0.0
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return max(0.0, entry[0] - asyncio.get_running_loop().time())
+
+    def _push(self, key, due: float):
+        entry = [due, next(self._seq), key, True]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if entry[3]]
+        heapq.heapify(self._heap)
+        self._dead = 0
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+
+            while self._heap and (not self._heap[0][3] or self._heap[0][0] <= now):
+                due, _, key, alive = heapq.heappop(self._heap)
+                if not alive:
+                    self._dead -= 1
+                    continue
+                del self._entries[key]
+                lag = now - due
+                self.total_lag += lag
+                self.max_lag = max(self.max_lag, lag)
+                self._running[key] = asyncio.create_task(self._run(key, due))
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, key, due: float):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            interval = await self.job(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in scheduled cycle for {key}: {e}")
+            self.errors += 1
+            interval = None
+            next_due = loop.time() + self.retry_delay
+        else:
+            next_due = None
+
+        if self._running.get(key) is not asyncio.current_task():
+            return  # removed while running
+        del self._running[key]
+
+        now = loop.time()
+        self.cycles += 1
+        self.total_cycle_time += now - started
+
+        if next_due is None:
+            if interval is None:
+                self._not_before.pop(key, None)
+                return  # job asked to stop
+            interval = max(interval, self.min_interval)
+            next_due = due + interval
+            if next_due <= now:
+                overrun = now - next_due
+                missed = math.floor(overrun / interval) + 1
+                self.overruns += 1
+                self.skipped_slots += missed
+                self.max_overrun = max(self.max_overrun, overrun)
+                next_due += missed * interval
+                logger.warning(f"⏱️ Cycle for {key} overran its {interval:.0f}s interval by {overrun:.1f}s")
+
+        self._push(key, max(next_due, self._not_before.pop(key, 0.0)))
+
+    def get_stats(self) -> Dict:
+        return {
+            'scheduled': len(self._entries),
+            'running': len(self._running),
+            'cycles': self.cycles,
+            'errors': self.errors,
+            'overruns': self.overruns,
+            'deferrals': self.deferrals,
+            'skipped_slots': self.skipped_slots,
+            'max_overrun_s': self.max_overrun,
+            'avg_lag_ms': (self.total_lag / self.cycles * 1000) if self.cycles else 0.0,
+            'max_lag_ms': self.max_lag * 1000,
+            'avg_cycle_s': (self.total_cycle_time / self.cycles) if self.cycles else 0.0,
+        }
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SQLite and PostgreSQL backends under concurrent load
+
+Simulates many accounts hitting Database from the AsyncDatabase executor:
+user lookups, group reads and batched forwarding-log writes from several
+threads at once. SQLite always runs on a scratch file; PostgreSQL runs when
+BENCH_DATABASE_URL points at a disposable server, which makes this a smoke
+test for the PostgreSQL backend as well. Every app table there is DROPPED
+first, so the script refuses to run against the bot's own DATABASE_URL.
+
+Usage: BENCH_DATABASE_URL=postgresql://... python3 scripts/bench_backends.py [users] [threads]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import Database
+from db_backends import SQLiteBackend, create_backend
+
+GROUPS_PER_USER = 5
+LOG_BATCH = 200
+
+TABLES = [
+    "forwarding_logs", "user_hourly_stats", "group_hourly_stats", "log_partitions",
+    "payments", "ads", "owner_ads", "user_groups", "scheduled_campaigns",
+    "paused_groups", "group_priority", "referrals", "ad_templates", "users",
+    "schema_migrations",
+]
+
+
+def populate(db: Database, users: int):
+    started = time.perf_counter()
+    for user_id in range(1, users + 1):
+        db.add_user(user_id, f"user{user_id}")
+        for g in range(GROUPS_PER_USER):
+            db.add_group(user_id, -1000 - g, f"Group {g}")
+    return time.perf_counter() - started
+
+
+def account_cycle(db: Database, user_id: int):
+    """What one automation cycle does against the database"""
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    db.get_user(user_id)
+    db.get_active_ad(user_id)
+    groups = db.get_user_groups(user_id)
+    return [(user_id, g['group_id'], g['group_name'], "success", None, timestamp) for g in groups]
+
+
+def run(db: Database, users: int, threads: int) -> dict:
+    results = {"populate_s": populate(db, users)}
+
+    started = time.perf_counter()
+    pending = []
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for rows in executor.map(lambda u: account_cycle(db, u), range(1, users + 1)):
+            pending.extend(rows)
+            if len(pending) >= LOG_BATCH:
+                batch, pending = pending, []
+                executor.submit(db.add_forwarding_logs, batch)
+        if pending:
+            db.add_forwarding_logs(pending)
+    results["cycles_per_s"] = users / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    db.get_bot_stats()
+    results["bot_stats_ms"] = (time.perf_counter() - started) * 1000
+    return results
+
+
+def reset_postgres(db: Database):
+    partitions = [p['name'] for p in db.get_log_partitions()]
+    with db.connection() as conn:
+        for table in partitions + TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+        conn.commit()
+
+
+def bot_database_urls() -> set:
+    """The database(s) the bot itself is configured to use (env and .env)"""
+    urls = {os.getenv("DATABASE_URL", "")}
+    try:
+        from config import DATABASE_URL
+        urls.add(DATABASE_URL)
+    except Exception:
+        pass
+    return {url.rstrip("/") for url in urls if url}
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(backend=SQLiteBackend(os.path.join(tmp, "bench.db"), pool_size=threads))
+        results["sqlite"] = run(db, users, threads)
+        db.close()
+
+    url = os.getenv("BENCH_DATABASE_URL", "")
+    if url.rstrip("/") in bot_database_urls():
+        sys.exit("BENCH_DATABASE_URL is the bot's DATABASE_URL; this benchmark drops every table. "
+                 "Point it at a scratch database.")
+    if url.startswith(("postgres://", "postgresql://")):
+        db = Database(backend=create_backend(url, pool_size=threads))
+        reset_postgres(db)
+        db.close()
+        db = Database(backend=create_backend(url, pool_size=threads))
+        results["postgresql"] = run(db, users, threads)
+        db.close()
+    else:
+        print("BENCH_DATABASE_URL is not a PostgreSQL URL; running SQLite only\n")
+
+    print(f"{'backend':<12}{'populate':>12}{'cycles/s':>12}{'bot stats':>12}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['populate_s']:>11.1f}s{r['cycles_per_s']:>12,.0f}{r['bot_stats_ms']:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
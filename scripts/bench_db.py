@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: pooled Database connections vs. the old connect-per-call path
+
+Usage: python3 scripts/bench_db.py [operations]
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import Database
+
+
+class ConnectPerCallDatabase(Database):
+    """Database that opens and closes a fresh connection for every call"""
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def run(db: Database, operations: int) -> dict:
+    for user_id in range(1, 101):
+        db.add_user(user_id, f"user{user_id}")
+
+    results = {}
+
+    start = time.perf_counter()
+    for i in range(operations):
+        db.get_user(i % 100 + 1)
+    results["get_user"] = operations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(operations):
+        db.add_forwarding_log(i % 100 + 1, -1000 - i % 50, "Group", "success")
+    results["add_forwarding_log"] = operations / (time.perf_counter() - start)
+
+    return results
+
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = ConnectPerCallDatabase(os.path.join(tmp, "legacy.db"))
+        legacy.backend.close()
+        legacy_results = run(legacy, operations)
+
+        pooled = Database(os.path.join(tmp, "pooled.db"))
+        pooled_results = run(pooled, operations)
+        pooled.close()
+
+    print(f"{'operation':<22}{'connect/call':>16}{'pooled':>16}{'speedup':>10}")
+    for name in legacy_results:
+        before, after = legacy_results[name], pooled_results[name]
+        print(f"{name:<22}{before:>12,.0f} op/s{after:>12,.0f} op/s{after / before:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
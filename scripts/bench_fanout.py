@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark one automation cycle's fan-out against group count
+
+Sends go to a fake client that only sleeps for a simulated API latency, so
+no Telegram account is needed. Like UserClientManager.send, every send first
+takes a token from the account's RateLimiter (ACCOUNT_SEND_RATE/BURST, default
+1/s with a burst of 10), which caps a cycle at roughly burst + rate * seconds
+sends however many workers run; --no-limiter shows fan_out on its own.
+Each run also checks that no chat ever has two sends in flight and that at
+most `concurrency` sends overlap.
+
+Real runs would take minutes, so latency and spacing are scaled down by
+--scale and the measured time is scaled back up for the table.
+
+Usage: python3 scripts/bench_fanout.py [--latency 0.3] [--spacing 2] [--scale 0.01]
+                                       [--account-rate 1] [--account-burst 10] [--no-limiter]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import ACCOUNT_RATE_LIMIT, CHAT_RATE_LIMIT
+from fanout import fan_out
+from rate_limiter import RateLimiter
+
+GROUP_COUNTS = (10, 50, 100, 200, 400)
+CONCURRENCY = (1, 2, 4, 8)
+
+
+class FakeClient:
+    """Stands in for a pyrogram Client: send_message just waits"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.busy_chats = set()
+        self.sent = []
+
+    async def send_message(self, chat_id: int, text: str):
+        assert chat_id not in self.busy_chats, f"two sends in flight to {chat_id}"
+        self.busy_chats.add(chat_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            self.sent.append(chat_id)
+        finally:
+            self.in_flight -= 1
+            self.busy_chats.discard(chat_id)
+
+
+async def cycle(groups: int, concurrency: int, latency: float, spacing: float,
+                limiter: RateLimiter = None) -> float:
+    client = FakeClient(latency)
+    items = [{'group_id': -1000 - g} for g in range(groups)]
+
+    async def send(group):
+        if limiter:
+            await limiter.acquire(1, "send_message", group['group_id'])
+        await client.send_message(group['group_id'], "ad")
+
+    started = time.perf_counter()
+    results = await fan_out(
+        items,
+        send,
+        concurrency=concurrency,
+        spacing=spacing,
+        key=lambda group: group['group_id']
+    )
+    elapsed = time.perf_counter() - started
+
+    assert not any(isinstance(r, Exception) for r in results)
+    assert sorted(client.sent) == sorted(g['group_id'] for g in items)
+    assert client.max_in_flight <= concurrency
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated seconds per send")
+    parser.add_argument("--spacing", type=float, default=2.0, help="GROUP_SEND_INTERVAL")
+    parser.add_argument("--scale", type=float, default=0.01, help="time compression factor")
+    parser.add_argument("--account-rate", type=float, default=ACCOUNT_RATE_LIMIT[0], help="ACCOUNT_SEND_RATE")
+    parser.add_argument("--account-burst", type=int, default=ACCOUNT_RATE_LIMIT[1], help="ACCOUNT_SEND_BURST")
+    parser.add_argument("--no-limiter", action="store_true", help="leave out the account token bucket")
+    args = parser.parse_args()
+
+    limits = ("no account limit" if args.no_limiter
+              else f"account limit {args.account_rate:g}/s, burst {args.account_burst}")
+    print(f"latency {args.latency}s, spacing {args.spacing}s, {limits}; projected seconds per cycle\n")
+    print(f"{'groups':>8}" + "".join(f"{f'x{c}':>10}" for c in CONCURRENCY))
+    for groups in GROUP_COUNTS:
+        row = f"{groups:>8}"
+        for concurrency in CONCURRENCY:
+            # A fresh, compressed-time bucket per cycle: each cycle starts with a full burst
+            limiter = None if args.no_limiter else RateLimiter(
+                account_limit=(args.account_rate / args.scale, args.account_burst),
+                chat_limit=(CHAT_RATE_LIMIT[0] / args.scale, CHAT_RATE_LIMIT[1]),
+            )
+            elapsed = await cycle(groups, concurrency, args.latency * args.scale, args.spacing * args.scale, limiter)
+            row += f"{elapsed / args.scale:>9.0f}s"
+        print(row)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
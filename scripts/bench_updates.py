@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark what update handling costs per account: listening vs send-only
+
+A listening client (mention alerts on) runs pyrogram's dispatcher: one
+handler task per worker, and every incoming update is parsed into a
+Message and offered to the catch-all mention handler. A send-only client
+(mention alerts off, no_updates=True) tells Telegram not to push updates
+at all, so none of that exists.
+
+No Telegram account is needed: clients are built but never connected and
+synthetic group messages are pushed straight into each dispatcher's queue,
+the same way pyrogram feeds it after reading them from the network.
+The mention handler only yields instead of calling get_me(), so the CPU
+figures are a lower bound for the handler in user_client.py.
+
+Usage: python3 scripts/bench_updates.py [--accounts 200] [--updates 50]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pyrogram import Client, raw
+from pyrogram.handlers import MessageHandler
+
+from session_lifecycle import rss_mb
+
+
+def fake_update(account: int, n: int):
+    """A new text message in a group from another user, as read off the wire"""
+    sender, chat = 5000000 + n, 1000000 + n % 20
+    message = raw.types.Message(
+        id=n + 1,
+        peer_id=raw.types.PeerChannel(channel_id=chat),
+        from_id=raw.types.PeerUser(user_id=sender),
+        date=int(time.time()),
+        message=f"message {n} in group {chat}, not mentioning account {account}",
+        entities=[],
+    )
+    users = {sender: raw.types.User(id=sender, first_name="Someone", access_hash=1,
+                                   restriction_reason=[])}
+    chats = {chat: raw.types.Channel(
+        id=chat, title=f"Group {chat}", photo=raw.types.ChatPhotoEmpty(), date=0,
+        access_hash=1, megagroup=True, restriction_reason=[],
+    )}
+    return raw.types.UpdateNewMessage(message=message, pts=n + 1, pts_count=1), users, chats
+
+
+async def mention_handler(client, message):
+    await asyncio.sleep(0)  # stands in for the get_me() call
+
+
+async def run(accounts: int, updates: int, listening: bool) -> dict:
+    gc.collect()
+    rss_before = rss_mb()
+
+    # Heap held by the clients themselves (dispatcher, handler tasks, locks)
+    tracemalloc.start()
+    clients = []
+    for account in range(accounts):
+        client = Client(
+            name=f"bench_{account}", api_id=1, api_hash="0" * 32,
+            in_memory=True, no_updates=not listening,
+        )
+        if listening:
+            client.add_handler(MessageHandler(mention_handler))
+        await client.dispatcher.start()
+        clients.append(client)
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tasks = len(asyncio.all_tasks()) - 1
+
+    # CPU spent on incoming updates; a send-only client never receives any
+    cpu_started = time.process_time()
+    if listening:
+        for client in clients:
+            for n in range(updates):
+                client.dispatcher.updates_queue.put_nowait(fake_update(0, n))
+        while any(not c.dispatcher.updates_queue.empty() for c in clients):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)  # let the workers finish the last updates
+    cpu = time.process_time() - cpu_started
+    rss_after = rss_mb()
+
+    for client in clients:
+        await client.dispatcher.stop()
+    return {
+        'tasks': tasks,
+        'heap_mb': heap / 1024 / 1024,
+        'rss_mb': (rss_after - rss_before) if rss_before is not None else None,
+        'cpu_s': cpu,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--accounts", type=int, default=200, help="clients per run")
+    parser.add_argument("--updates", type=int, default=50, help="incoming group messages per listening account")
+    args = parser.parse_args()
+
+    scale = 1000 / args.accounts
+    print(f"{args.accounts} accounts, {args.updates} incoming messages each; figures per 1000 accounts\n")
+    print(f"{'mode':<12}{'tasks':>8}{'heap MB':>10}{'RSS MB':>10}{'CPU s':>10}{'CPU ms/update':>16}")
+
+    results = {}
+    # Send-only first, so the listening run cannot inflate its RSS baseline
+    for listening in (False, True):
+        mode = "listening" if listening else "send-only"
+        r = results[mode] = asyncio.run(run(args.accounts, args.updates, listening))
+        per_update = r['cpu_s'] * 1000 / (args.accounts * args.updates) if listening else 0.0
+        rss = f"{r['rss_mb'] * scale:.1f}" if r['rss_mb'] is not None else "n/a"
+        print(f"{mode:<12}{r['tasks'] * scale:>8.0f}{r['heap_mb'] * scale:>10.1f}{rss:>10}"
+              f"{r['cpu_s'] * scale:>10.2f}{per_update:>16.3f}")
+
+    listening, send_only = results["listening"], results["send-only"]
+    rss_saved = (f"{(listening['rss_mb'] - send_only['rss_mb']) * scale:.1f}"
+                 if listening['rss_mb'] is not None else "n/a")
+    print(f"\nSend-only saves per 1000 accounts: "
+          f"{(listening['tasks'] - send_only['tasks']) * scale:.0f} handler tasks, "
+          f"{(listening['heap_mb'] - send_only['heap_mb']) * scale:.1f} MB of client heap, "
+          f"{rss_saved} MB RSS and "
+          f"{listening['cpu_s'] * scale:.2f}s CPU per {args.updates} incoming messages per account")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Verify that the hot queries are answered from the indexes in migrations.py
+and log_partitions.py
+
+Builds a scratch database, fills forwarding_logs with synthetic rows (the
+hourly rollups are filled by the rollup backfill), and checks EXPLAIN QUERY
+PLAN for every hot access path. Exits non-zero if a
+query falls back to a table scan or stops using its index.
+
+Usage: python3 scripts/check_query_plans.py [log_rows]
+(tests/test_query_plans.py runs the same checks under pytest)
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import log_partitions
+from database import Database
+
+WEEK_AGO = (datetime.now(timezone.utc) - timedelta(days=7)).strftime("%Y-%m-%d %H:00:00")
+TODAY = datetime.now(timezone.utc).strftime("%Y-%m-%d 00:00:00")
+PARTITION = log_partitions.table_for(log_partitions.month_of(TODAY))
+
+# (name, query, params, acceptable index(es) for the plan, must be covering)
+HOT_QUERIES = [
+    (
+        "analytics totals",
+        """SELECT COALESCE(SUM(successful), 0) as successful,
+                  COALESCE(SUM(failed), 0) as failed
+           FROM user_hourly_stats
+           WHERE user_id = ? AND hour >= ?""",
+        (1, WEEK_AGO), "sqlite_autoindex_user_hourly_stats_1", False,
+    ),
+    (
+        "analytics top groups",
+        """SELECT MAX(group_name) as group_name,
+                  SUM(successful + failed) as forwards,
+                  SUM(successful) as successful
+           FROM group_hourly_stats
+           WHERE user_id = ? AND hour >= ?
+           GROUP BY group_id
+           ORDER BY successful DESC
+           LIMIT 5""",
+        (1, WEEK_AGO), "sqlite_autoindex_group_hourly_stats_1", False,
+    ),
+    (
+        "analytics daily breakdown",
+        """SELECT SUBSTR(hour, 1, 10) as date,
+                  SUM(successful + failed) as total,
+                  SUM(successful) as successful
+           FROM user_hourly_stats
+           WHERE user_id = ? AND hour >= ?
+           GROUP BY SUBSTR(hour, 1, 10)
+           ORDER BY date DESC""",
+        (1, WEEK_AGO), "sqlite_autoindex_user_hourly_stats_1", False,
+    ),
+    (
+        "group performance",
+        """SELECT SUM(successful + failed) as total_forwards,
+                  SUM(successful) as successful,
+                  SUM(failed) as failed,
+                  MIN(first_at) as first_forward,
+                  MAX(last_at) as last_forward
+           FROM group_hourly_stats
+           WHERE user_id = ? AND group_id = ?""",
+        (1, -1001), "sqlite_autoindex_group_hourly_stats_1", False,
+    ),
+    (
+        "admin stats today",
+        "SELECT COALESCE(SUM(successful), 0) FROM user_hourly_stats WHERE hour >= ?",
+        (TODAY,), "idx_user_hourly_stats_hour", True,
+    ),
+    (
+        "user group lookup",
+        "SELECT id FROM user_groups WHERE user_id = ? AND group_id = ?",
+        (1, -1001), "idx_user_groups_user_group", True,
+    ),
+    (
+        "active ad",
+        """SELECT * FROM ads
+           WHERE user_id = ? AND is_active = 1
+           ORDER BY created_at DESC
+           LIMIT 1""",
+        (1,), "idx_ads_user_active_created", False,
+    ),
+    (
+        "pending campaigns",
+        """SELECT * FROM scheduled_campaigns
+           WHERE status = 'pending' AND scheduled_time <= ?""",
+        (TODAY,), "idx_scheduled_campaigns_status_time", False,
+    ),
+    (
+        "referral rewards",
+        """SELECT COUNT(*) FROM referrals
+           WHERE referrer_id = ? AND reward_granted = 0""",
+        (1,), "idx_referrals_referrer", True,
+    ),
+    (
+        "user logs (this month)",
+        f"""SELECT * FROM {PARTITION}
+            WHERE user_id = ? AND timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp DESC
+            LIMIT ?""",
+        (1, WEEK_AGO, "9999-12-31", 100), f"idx_{PARTITION}_user_ts", False,
+    ),
+]
+
+
+def populate(db: Database, log_rows: int):
+    with db.connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, username) VALUES (?, ?)",
+            [(user_id, f"user{user_id}") for user_id in range(1, 101)]
+        )
+        conn.executemany(
+            "INSERT INTO user_groups (user_id, group_id, group_name) VALUES (?, ?, ?)",
+            [(user_id, -1000 - g, f"Group {g}") for user_id in range(1, 101) for g in range(50)]
+        )
+        conn.executemany(
+            "INSERT INTO ads (user_id, ad_text) VALUES (?, ?)",
+            [(user_id, "ad") for user_id in range(1, 101) for _ in range(5)]
+        )
+        conn.executemany(
+            "INSERT INTO scheduled_campaigns (user_id, ad_id, scheduled_time, status) VALUES (?, ?, ?, ?)",
+            [(user_id, 1, TODAY, "completed" if n else "pending") for user_id in range(1, 101) for n in range(20)]
+        )
+        conn.executemany(
+            "INSERT INTO referrals (referrer_id, referred_id, reward_granted) VALUES (?, ?, ?)",
+            [(user_id, 1000 + n, n % 2) for user_id in range(1, 101) for n in range(5)]
+        )
+        conn.commit()
+
+    # Through the live write path, so the hourly rollups are filled as well
+    now = datetime.now(timezone.utc)
+    db.add_forwarding_logs([
+        (i % 100 + 1, -1000 - i % 50, f"Group {i % 50}", "success" if i % 7 else "failed", None,
+         (now - timedelta(minutes=i % (60 * 24 * 60))).strftime("%Y-%m-%d %H:%M:%S"))
+        for i in range(log_rows)
+    ])
+
+    with db.connection() as conn:
+        conn.execute("ANALYZE")
+
+
+def main():
+    log_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "plans.db"))
+        populate(db, log_rows)
+        db.migrations.run_all_background()
+
+        for name, query, params, indexes, covering in HOT_QUERIES:
+            if isinstance(indexes, str):
+                indexes = (indexes,)
+            plan = db.explain(query, params)
+            expected = [f"{'COVERING INDEX' if covering else 'INDEX'} {index}" for index in indexes]
+            ok = any(e in line for e in expected for line in plan)
+
+            with db.connection() as conn:
+                started = time.perf_counter()
+                conn.execute(query, params).fetchall()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+
+            print(f"{'OK  ' if ok else 'FAIL'} {name:<28}{elapsed_ms:>8.2f} ms  {' | '.join(plan)}")
+            failures += not ok
+
+        db.close()
+
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} queries use their index ({log_rows:,} log rows)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Connect user clients when they are needed and disconnect idle ones
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB (None where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, not current
+    except (ImportError, AttributeError):
+        return None
+
+
+class SessionLifecycle:
+    """Keeps at most `max_connected` user clients connected
+
+    Logged-in accounts are registered here; `connect(user_id)` builds and
+    starts a client and `disconnect(client)` stops it. A client is connected
+    by use() on demand, or up to `prewarm` seconds before the account's next
+    scheduled cycle (`next_due_in`), and disconnected after `idle_timeout`
+    seconds without use. At the cap, the least recently used idle client is
+    disconnected to make room; if none is idle within `cap_wait` seconds,
+    get() raises. Clients in use and pinned accounts (that must keep
+    receiving updates) are never evicted, so at most half the cap can be
+    pinned: accounts asking for a pin past that are registered unpinned
+    (and pinned later, when a pin frees up).
+    """
+
+    def __init__(self, connect: Callable[[int], Awaitable], disconnect: Callable[[object], Awaitable],
+                 next_due_in: Callable[[int], Optional[float]] = None, idle_timeout: float = 900,
+                 max_connected: int = 0, prewarm: float = 30, check_interval: float = 15,
+                 cap_wait: float = 60):
+        self._connect = connect
+        self._disconnect = disconnect
+        self.next_due_in = next_due_in
+        self.idle_timeout = idle_timeout
+        self.max_connected = max_connected
+        self.prewarm = prewarm
+        self.check_interval = check_interval
+        self.cap_wait = cap_wait
+        self.max_pinned = max_connected // 2 if max_connected else None
+
+        self.registered: Set[int] = set()
+        self.pinned: Set[int] = set()
+        self.pin_wanted: Set[int] = set()  # asked for a pin past max_pinned
+        self.clients: "OrderedDict[int, object]" = OrderedDict()  # least recently used first
+        self._last_used: Dict[int, float] = {}
+        self._in_use: Dict[int, int] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._connected_before: Set[int] = set()
+        self._stale: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.connects = 0
+        self.reconnects = 0
+        self.evictions = 0
+        self.connect_time = 0.0
+        self.reconnect_time = 0.0
+        self.max_connect_time = 0.0
+        self.cap_waits = 0
+        self.pins_refused = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.registered
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for user_id in list(self.clients):
+            await self._drop(user_id)
+
+    def register(self, user_id: int, pinned: bool = False) -> bool:
+        """Register an account; returns whether it is pinned"""
+        self.registered.add(user_id)
+        if not pinned:
+            self._unpin(user_id)
+        elif user_id not in self.pinned:
+            if self.max_pinned is not None and len(self.pinned) >= self.max_pinned:
+                if user_id not in self.pin_wanted:
+                    self.pin_wanted.add(user_id)
+                    self.pins_refused += 1
+                    logger.warning(
+                        f"⚠️ {len(self.pinned)} sessions already pinned (half of the cap); user {user_id} "
+                        f"stays connected only while in use and misses updates in between"
+                    )
+            else:
+                self.pinned.add(user_id)
+        return user_id in self.pinned
+
+    def _unpin(self, user_id: int):
+        self.pin_wanted.discard(user_id)
+        if user_id in self.pinned:
+            self.pinned.discard(user_id)
+            if self.pin_wanted:
+                promoted = self.pin_wanted.pop()
+                self.pinned.add(promoted)
+                logger.info(f"📌 Pinned session for user {promoted}")
+
+    async def unregister(self, user_id: int):
+        """Forget an account (logout) and disconnect it"""
+        self.registered.discard(user_id)
+        self._unpin(user_id)
+        self._connected_before.discard(user_id)
+        await self._drop(user_id)
+
+    async def reset(self, user_id: int):
+        """Disconnect an account's client so the next get() connects a fresh one
+
+        A client in use is disconnected when its last use() block exits.
+        """
+        if user_id in self._in_use:
+            self._stale.add(user_id)
+        else:
+            await self._drop(user_id)
+
+    def _lock(self, user_id: int) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def get(self, user_id: int):
+        """Connected client for a registered account (connecting it if needed); None if unknown"""
+        if user_id not in self.registered:
+            return None
+
+        client = self.clients.get(user_id)
+        if client is None:
+            async with self._lock(user_id):
+                client = self.clients.get(user_id)
+                if client is None:
+                    await self._make_room()
+                    started = time.perf_counter()
+                    client = await self._connect(user_id)
+                    elapsed = time.perf_counter() - started
+                    if client is None:
+                        return None
+                    if user_id in self._connected_before:
+                        self.reconnects += 1
+                        self.reconnect_time += elapsed
+                    self._connected_before.add(user_id)
+                    self.connects += 1
+                    self.connect_time += elapsed
+                    self.max_connect_time = max(self.max_connect_time, elapsed)
+                    self.clients[user_id] = client
+
+        self.clients.move_to_end(user_id)
+        self._last_used[user_id] = time.monotonic()
+        return client
+
+    @asynccontextmanager
+    async def use(self, user_id: int):
+        """Hold a connected client; it is not evicted until the block exits"""
+        self._in_use[user_id] = self._in_use.get(user_id, 0) + 1
+        try:
+            yield await self.get(user_id)
+        finally:
+            self._in_use[user_id] -= 1
+            self._last_used[user_id] = time.monotonic()
+            if not self._in_use[user_id]:
+                del self._in_use[user_id]
+                if user_id in self._stale:
+                    await self._drop(user_id)
+
+    def _evictable(self, user_id: int) -> bool:
+        return user_id not in self._in_use and user_id not in self.pinned
+
+    async def _make_room(self):
+        if not self.max_connected:
+            return
+        deadline = time.monotonic() + self.cap_wait
+        while len(self.clients) >= self.max_connected:
+            victim = next((u for u in self.clients if self._evictable(u)), None)
+            if victim is None:
+                # Everything connected is busy or pinned; wait for a cycle to finish
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(
+                        f"All {self.max_connected} connected sessions stayed busy for {self.cap_wait:.0f}s"
+                    )
+                self.cap_waits += 1
+                await asyncio.sleep(1)
+                continue
+            self.evictions += 1
+            await self._drop(victim)
+
+    async def _drop(self, user_id: int):
+        self._stale.discard(user_id)
+        client = self.clients.pop(user_id, None)
+        self._last_used.pop(user_id, None)
+        if client is not None:
+            try:
+                await self._disconnect(client)
+            except Exception as e:
+                logger.warning(f"Error disconnecting session for user {user_id}: {e}")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Error in session lifecycle check: {e}")
+
+    async def check(self):
+        """Disconnect idle clients; connect pinned ones and the ones whose cycle is coming up"""
+        now = time.monotonic()
+        for user_id in list(self.clients):
+            if self._evictable(user_id) and now - self._last_used.get(user_id, now) > self.idle_timeout:
+                due = self.next_due_in(user_id) if self.next_due_in else None
+                if due is not None and due <= self.prewarm:
+                    continue
+                self.evictions += 1
+                await self._drop(user_id)
+
+        for user_id in self.registered - set(self.clients):
+            if self.max_connected and len(self.clients) >= self.max_connected:
+                break
+            due = self.next_due_in(user_id) if self.next_due_in else None
+            if user_id in self.pinned or (due is not None and due <= self.prewarm):
+                try:
+                    await self.get(user_id)
+                except Exception as e:
+                    logger.warning(f"Could not pre-connect session for user {user_id}: {e}")
+
+    def get_stats(self) -> Dict:
+        return {
+            'registered': len(self.registered),
+            'connected': len(self.clients),
+            'pinned': len(self.pinned),
+            'pins_refused': self.pins_refused,
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'evictions': self.evictions,
+            'avg_connect_ms': (self.connect_time / self.connects * 1000) if self.connects else 0.0,
+            'avg_reconnect_ms': (self.reconnect_time / self.reconnects * 1000) if self.reconnects else 0.0,
+            'max_connect_ms': self.max_connect_time * 1000,
+            'cap_waits': self.cap_waits,
+            'rss_mb': rss_mb(),
+        }
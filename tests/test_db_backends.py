@@ -0,0 +1,45 @@
+"""PostgreSQL dialect translation (no server needed)"""
+
+from db_backends import _adapt_params, _translate
+
+
+def test_placeholders_are_rewritten_outside_string_literals():
+    sql = "SELECT * FROM ads WHERE user_id = ? AND ad_text = '?' AND media_type = ?"
+    assert _translate(sql) == "SELECT * FROM ads WHERE user_id = %s AND ad_text = '?' AND media_type = %s"
+
+
+def test_escaped_quotes_stay_inside_the_literal():
+    sql = "SELECT * FROM ads WHERE ad_text = 'it''s ?' AND id = ?"
+    assert _translate(sql) == "SELECT * FROM ads WHERE ad_text = 'it''s ?' AND id = %s"
+
+
+def test_percent_signs_are_escaped_for_psycopg():
+    sql = "SELECT * FROM ads WHERE ad_text LIKE '%sale%' AND user_id = ?"
+    assert _translate(sql) == "SELECT * FROM ads WHERE ad_text LIKE '%%sale%%' AND user_id = %s"
+
+
+def test_ddl_types_are_rewritten():
+    sql = """CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        is_active BOOLEAN DEFAULT 0,
+        duration_ms REAL DEFAULT 0
+    )"""
+    translated = _translate(sql)
+    assert "id BIGSERIAL PRIMARY KEY," in translated
+    assert "user_id BIGINT," in translated
+    assert "is_active SMALLINT DEFAULT 0" in translated
+    assert "duration_ms DOUBLE PRECISION" in translated
+
+    assert _translate("ALTER TABLE users ADD COLUMN mention_alerts BOOLEAN DEFAULT 1") == \
+        "ALTER TABLE users ADD COLUMN mention_alerts SMALLINT DEFAULT 1"
+
+
+def test_queries_keep_their_types():
+    sql = "SELECT CAST(amount AS INTEGER) FROM payments WHERE id = ?"
+    assert _translate(sql) == "SELECT CAST(amount AS INTEGER) FROM payments WHERE id = %s"
+
+
+def test_params_are_a_tuple_with_booleans_as_integers():
+    assert _adapt_params(None) == ()
+    assert _adapt_params([1, True, False, "x", None]) == (1, 1, 0, "x", None)
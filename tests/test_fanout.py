@@ -0,0 +1,75 @@
+"""fan_out: bounded concurrency, per-chat lanes and error capture"""
+
+import asyncio
+
+from fanout import fan_out
+
+
+def test_concurrency_is_bounded_and_results_keep_order():
+    async def main():
+        in_flight, peak = 0, 0
+
+        async def send(item):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return item * 2
+
+        results = await fan_out(list(range(20)), send, concurrency=4)
+        assert results == [item * 2 for item in range(20)]
+        assert peak == 4
+
+    asyncio.run(main())
+
+
+def test_a_lane_is_sent_in_order_by_one_worker():
+    async def main():
+        active, order, overlaps = set(), [], 0
+        items = [("a", 1), ("b", 1), ("a", 2), ("c", 1), ("a", 3), ("b", 2)]
+
+        async def send(item):
+            nonlocal overlaps
+            chat = item[0]
+            overlaps += chat in active
+            active.add(chat)
+            await asyncio.sleep(0.01)
+            active.discard(chat)
+            order.append(item)
+
+        await fan_out(items, send, concurrency=3, key=lambda item: item[0])
+        assert overlaps == 0
+        assert [n for chat, n in order if chat == "a"] == [1, 2, 3]
+        assert [n for chat, n in order if chat == "b"] == [1, 2]
+
+    asyncio.run(main())
+
+
+def test_exceptions_are_returned_not_raised():
+    async def main():
+        async def send(item):
+            if item == 2:
+                raise ValueError("bad group")
+            return item
+
+        results = await fan_out([1, 2, 3], send, concurrency=2)
+        assert results[0] == 1 and results[2] == 3
+        assert isinstance(results[1], ValueError)
+
+    asyncio.run(main())
+
+
+def test_spacing_paces_each_worker():
+    async def main():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        async def send(item):
+            return None
+
+        await fan_out(list(range(4)), send, concurrency=2, spacing=0.05)
+        # Two sends per worker: one spacing wait each
+        assert 0.05 <= loop.time() - started < 0.1
+
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""Monthly log partitions: routing, archival and the legacy log move"""
+
+import asyncio
+import gzip
+import os
+import sqlite3
+
+import pytest
+
+from database import AsyncDatabase, Database
+from log_archive import LogArchiver
+from migrations import CORE_TABLES, LegacyLogMove, RollupBackfill
+
+
+def legacy_database(path, rows):
+    """A database from before partitioning, with `rows` logs from January 2024"""
+    conn = sqlite3.connect(path)
+    for statement in CORE_TABLES:
+        if statement.lstrip().startswith("CREATE TABLE"):
+            conn.execute(statement)
+    conn.executemany(
+        "INSERT INTO forwarding_logs (user_id, group_id, group_name, status, timestamp) VALUES (?, ?, ?, ?, ?)",
+        [(1, -100, "Group", "success", f"2024-01-{i % 28 + 1:02d} 12:00:00") for i in range(rows)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def archived_rows(directory):
+    count = 0
+    for name in os.listdir(directory):
+        with gzip.open(os.path.join(directory, name), "rt") as archive:
+            count += sum(1 for _ in archive)
+    return count
+
+
+def finish(db, migration):
+    while not db.migrations.run_background_step(migration):
+        pass
+
+
+def count(db, query):
+    with db.connection() as conn:
+        return conn.execute(query).fetchone()[0]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "bot.db"))
+    yield db
+    db.close()
+
+
+def test_rows_are_routed_to_their_month(db):
+    db.add_forwarding_logs([
+        (1, -100, "Group", "success", None, "2024-01-31 23:59:59"),
+        (1, -100, "Group", "failed", "boom", "2024-02-01 00:00:00"),
+    ])
+
+    assert [p['name'] for p in db.get_log_partitions()] == ["forwarding_logs_202401", "forwarding_logs_202402"]
+    assert count(db, "SELECT COUNT(*) FROM forwarding_logs_202401") == 1
+    logs = db.get_forwarding_logs(1, "2024-01-15 00:00:00", "2024-02-15 00:00:00")
+    assert [log['status'] for log in logs] == ["failed", "success"]
+
+
+def test_rearchiving_a_month_keeps_the_earlier_archive(db, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    db.add_forwarding_logs([(1, -100, "Group", "success", None, "2024-01-10 12:00:00")] * 3)
+    first = db.archive_log_partition("forwarding_logs_202401", archive_dir)
+
+    # A late row re-creates the archived month
+    db.add_forwarding_logs([(1, -100, "Group", "success", None, "2024-01-11 12:00:00")])
+    second = db.archive_log_partition("forwarding_logs_202401", archive_dir)
+
+    assert first['path'] != second['path']
+    assert archived_rows(archive_dir) == 4
+    partition = db.get_log_partitions()[0]
+    assert partition['status'] == "archived"
+    assert partition['row_count'] == 4
+
+
+def test_legacy_move_keeps_rows_of_archived_months(tmp_path):
+    path, archive_dir = str(tmp_path / "bot.db"), str(tmp_path / "archive")
+    legacy_database(path, 12000)
+    db = Database(path)
+    finish(db, RollupBackfill())
+
+    move = LegacyLogMove()
+    db.migrations.run_background_step(move)
+    db.archive_log_partition("forwarding_logs_202401", archive_dir)
+    finish(db, move)
+
+    # Nothing is lost: 5,000 rows archived, the rest still in the legacy table
+    assert archived_rows(archive_dir) == 5000
+    assert count(db, "SELECT COUNT(*) FROM forwarding_logs") == 7000
+    assert db.get_log_partitions()[0]['status'] == "archived"
+    db.close()
+
+
+def test_archiver_waits_for_the_legacy_move(tmp_path):
+    path, archive_dir = str(tmp_path / "bot.db"), str(tmp_path / "archive")
+    legacy_database(path, 12000)
+    db = Database(path)
+    adb = AsyncDatabase(db)
+    archiver = LogArchiver(adb, archive_dir=archive_dir, retention_days=30)
+
+    finish(db, RollupBackfill())
+    db.migrations.run_background_step(LegacyLogMove())
+    asyncio.run(archiver.run_once())
+    assert archiver.partitions_archived == 0
+
+    db.migrations.run_all_background()
+    asyncio.run(archiver.run_once())
+    assert archiver.partitions_archived == 1
+    assert archived_rows(archive_dir) == 12000
+    assert count(db, "SELECT COUNT(*) FROM forwarding_logs") == 0
+    adb.close()
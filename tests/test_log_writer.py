@@ -0,0 +1,107 @@
+"""ForwardingLogWriter: batching, bad rows and outages"""
+
+import asyncio
+
+import pytest
+
+from log_writer import ForwardingLogWriter
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.batches = []
+        self.down = False
+
+    async def add_forwarding_logs(self, rows):
+        if self.down:
+            raise RuntimeError("database is locked")
+        if any(row[3] == "bad" for row in rows):
+            raise ValueError("bad row")
+        self.batches.append(list(rows))
+
+    @property
+    def rows(self):
+        return [row for batch in self.batches for row in batch]
+
+
+def run(test):
+    async def main():
+        db = FakeDatabase()
+        writer = ForwardingLogWriter(db, batch_size=1000, flush_interval=60, max_queue=10)
+        try:
+            await test(db, writer)
+        finally:
+            db.down = False
+            await writer.stop()
+    asyncio.run(main())
+
+
+def test_rows_are_written_in_one_batch():
+    async def test(db, writer):
+        for group_id in range(5):
+            writer.add(1, group_id, "Group", "success")
+        await writer.flush()
+        assert len(db.batches) == 1
+        assert [row[1] for row in db.rows] == [0, 1, 2, 3, 4]
+        assert writer.rows_written == 5
+
+    run(test)
+
+
+def test_a_bad_row_is_quarantined_and_the_rest_written():
+    async def test(db, writer):
+        writer.add(1, 1, "Group", "success")
+        writer.add(1, 2, "Group", "bad")
+        writer.add(1, 3, "Group", "success")
+        await writer.flush()
+        assert [row[1] for row in db.rows] == [1, 3]
+        assert writer.rows_quarantined == 1
+        assert writer.quarantined[0][0][1] == 2
+        assert writer.queue_depth == 0
+
+        # The next flush is not blocked by it
+        writer.add(1, 4, "Group", "success")
+        await writer.flush()
+        assert db.rows[-1][1] == 4
+
+    run(test)
+
+
+def test_an_outage_keeps_the_rows_queued():
+    async def test(db, writer):
+        for group_id in range(5):
+            writer.add(1, group_id, "Group", "success")
+        db.down = True
+        with pytest.raises(RuntimeError):
+            await writer.flush()
+        assert writer.queue_depth == 5
+        assert writer.rows_quarantined == 0
+
+        db.down = False
+        await writer.flush()
+        assert sorted(row[1] for row in db.rows) == [0, 1, 2, 3, 4]
+
+    run(test)
+
+
+def test_the_queue_is_bounded():
+    async def test(db, writer):
+        for group_id in range(15):
+            writer.add(1, group_id, "Group", "success")
+        assert writer.queue_depth == 10
+        assert writer.rows_dropped == 5
+
+        # Rows queued during an outage count against the same bound
+        db.down = True
+        with pytest.raises(RuntimeError):
+            await writer.flush()
+        for group_id in range(15, 20):
+            writer.add(1, group_id, "Group", "success")
+        assert writer.queue_depth == 10
+
+        db.down = False
+        await writer.flush()
+        assert len(db.rows) == 10
+        assert max(row[1] for row in db.rows) == 19
+
+    run(test)
@@ -0,0 +1,74 @@
+"""MentionNotifier: one bot message per user per window"""
+
+import asyncio
+
+from mention_notifier import MentionNotifier
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def mention(n):
+    return {'by': f"User {n}", 'username': None, 'group': "Group", 'text': f"hi {n}", 'link': f"https://t.me/c/1/{n}"}
+
+
+def test_mentions_in_one_window_are_sent_together():
+    async def main():
+        bot = FakeBot()
+        notifier = MentionNotifier(bot, window=0.05, max_items=10)
+        for n in range(3):
+            notifier.add(1, mention(n))
+        notifier.add(2, mention(9))
+        await asyncio.sleep(0.1)
+
+        assert sorted(chat for chat, _ in bot.sent) == [1, 2]
+        text = dict(bot.sent)[1]
+        assert "mentioned 3 times" in text and "hi 0" in text and "hi 2" in text
+        assert "You were mentioned!" in dict(bot.sent)[2]
+
+    asyncio.run(main())
+
+
+def test_mentions_past_max_items_are_counted():
+    async def main():
+        bot = FakeBot()
+        notifier = MentionNotifier(bot, window=0.05, max_items=2)
+        for n in range(5):
+            notifier.add(1, mention(n))
+        await asyncio.sleep(0.1)
+
+        assert len(bot.sent) == 1
+        assert "mentioned 5 times" in bot.sent[0][1] and "3 more" in bot.sent[0][1]
+        assert notifier.get_stats()['dropped'] == 3
+
+    asyncio.run(main())
+
+
+def test_a_new_window_opens_after_a_flush():
+    async def main():
+        bot = FakeBot()
+        notifier = MentionNotifier(bot, window=0.03)
+        notifier.add(1, mention(1))
+        await asyncio.sleep(0.06)
+        notifier.add(1, mention(2))
+        await asyncio.sleep(0.06)
+        assert len(bot.sent) == 2
+
+    asyncio.run(main())
+
+
+def test_stop_sends_what_is_waiting():
+    async def main():
+        bot = FakeBot()
+        notifier = MentionNotifier(bot, window=60)
+        notifier.add(1, mention(1))
+        await notifier.stop()
+        assert len(bot.sent) == 1
+        assert notifier.get_stats()['waiting'] == 0
+
+    asyncio.run(main())
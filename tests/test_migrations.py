@@ -0,0 +1,83 @@
+"""Schema migrations bring databases of every age to the same schema"""
+
+import sqlite3
+
+from database import Database
+from migrations import BASE_TABLES, COVERING_INDEXES, MIGRATIONS
+
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        objects = {
+            (row[0], row[1]) for row in conn.execute(
+                "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"
+            )
+        }
+        columns = {
+            name: [row[1] for row in conn.execute(f"PRAGMA table_info({name})")]
+            for kind, name in objects if kind == "table"
+        }
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        return objects, columns, version
+    finally:
+        conn.close()
+
+
+def test_versions_are_unique_and_ascending():
+    versions = [m.version for m in MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_fresh_database_is_at_latest_version(tmp_path):
+    path = str(tmp_path / "fresh.db")
+    Database(path).close()
+    objects, _, version = schema(path)
+    assert version == MIGRATIONS[-1].version
+    # Version 5 replaced the version 1 log indexes with per-partition ones
+    assert ("index", "idx_forwarding_logs_user_ts") not in objects
+    assert ("index", "idx_user_groups_user_group") in objects
+
+
+def test_unversioned_database_keeps_its_rows(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    for statement in BASE_TABLES:
+        conn.execute(statement)
+    conn.executemany("INSERT INTO user_groups (user_id, group_id) VALUES (?, ?)", [(1, -100), (1, -100), (1, -200)])
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    assert sorted(g['group_id'] for g in db.get_user_groups(1)) == [-200, -100]
+    db.close()
+
+
+def test_version_1_database_matches_fresh_schema(tmp_path):
+    old = str(tmp_path / "old.db")
+    conn = sqlite3.connect(old)
+    for statement in BASE_TABLES + COVERING_INDEXES:
+        conn.execute(statement)
+    conn.execute("INSERT INTO users (user_id, username) VALUES (1, 'old')")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    db = Database(old)
+    assert db.get_user(1)['username'] == 'old'
+    db.close()
+
+    fresh = str(tmp_path / "fresh.db")
+    Database(fresh).close()
+    assert schema(old) == schema(fresh)
+
+
+def test_index_builds_run_in_the_background(tmp_path):
+    path = str(tmp_path / "fresh.db")
+    db = Database(path)
+    assert ("index", "idx_referrals_referrer") not in schema(path)[0]
+
+    db.migrations.run_all_background()
+    assert ("index", "idx_referrals_referrer") in schema(path)[0]
+    assert not db.migrations.pending_background()
+    db.close()
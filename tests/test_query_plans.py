@@ -0,0 +1,28 @@
+"""Every hot query is answered from its index (see scripts/check_query_plans.py)"""
+
+import pytest
+
+from check_query_plans import HOT_QUERIES, populate
+from database import Database
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    db = Database(str(tmp_path_factory.mktemp("plans") / "plans.db"))
+    populate(db, 20000)
+    db.migrations.run_all_background()
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize(
+    "query, params, indexes, covering",
+    [entry[1:] for entry in HOT_QUERIES],
+    ids=[entry[0] for entry in HOT_QUERIES],
+)
+def test_query_uses_index(db, query, params, indexes, covering):
+    if isinstance(indexes, str):
+        indexes = (indexes,)
+    plan = db.explain(query, params)
+    expected = [f"{'COVERING INDEX' if covering else 'INDEX'} {index}" for index in indexes]
+    assert any(e in line for e in expected for line in plan), plan
@@ -0,0 +1,123 @@
+"""RateLimiter: token buckets per account, method and chat"""
+
+import asyncio
+
+import pytest
+from pyrogram.errors import FloodWait
+
+from rate_limiter import RateLimiter, Throttled, TokenBucket
+from user_client import UserClientManager
+
+
+def test_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=2, capacity=3, now=0)
+    for _ in range(3):
+        assert bucket.delay(0) == 0
+        bucket.take(0)
+    assert bucket.delay(0) == pytest.approx(0.5)
+    assert bucket.delay(0.5) == 0
+
+
+def acquire_all(limiter, calls):
+    async def main():
+        for call in calls:
+            await limiter.acquire(*call, max_wait=0)
+    asyncio.run(main())
+
+
+def test_account_bucket_covers_all_chats():
+    limiter = RateLimiter(account_limit=(1, 3), chat_limit=(100, 100))
+    acquire_all(limiter, [(1, "send_message", chat) for chat in range(3)])
+    with pytest.raises(Throttled):
+        acquire_all(limiter, [(1, "send_message", 99)])
+    # Other accounts have their own bucket
+    acquire_all(limiter, [(2, "send_message", 99)])
+
+
+def test_chat_bucket_limits_one_chat_only():
+    limiter = RateLimiter(account_limit=(100, 100), chat_limit=(1, 2))
+    acquire_all(limiter, [(1, "send_message", -100)] * 2)
+    with pytest.raises(Throttled):
+        acquire_all(limiter, [(1, "send_message", -100)])
+    acquire_all(limiter, [(1, "send_message", -200)])
+    assert limiter.skipped == 1
+
+
+def test_method_bucket_limits_one_method_only():
+    limiter = RateLimiter(account_limit=(100, 100), method_limits={"create_channel": (0.01, 1)})
+    acquire_all(limiter, [(1, "create_channel")])
+    with pytest.raises(Throttled):
+        acquire_all(limiter, [(1, "create_channel")])
+    acquire_all(limiter, [(1, "send_message")])
+
+
+def test_acquire_waits_within_max_wait():
+    async def main():
+        limiter = RateLimiter(account_limit=(20, 1))
+        await limiter.acquire(1, "send_message")
+        await limiter.acquire(1, "send_message", max_wait=1)
+        assert limiter.throttled == 1
+
+    asyncio.run(main())
+
+
+def test_idle_buckets_are_pruned():
+    limiter = RateLimiter(account_limit=(1000, 1), chat_limit=(1000, 1), prune_every=1)
+    acquire_all(limiter, [(1, "send_message", -100)])
+    asyncio.run(asyncio.sleep(0.01))
+    acquire_all(limiter, [(1, "send_message", -200)])
+    # The refilled -100 bucket is dropped; the account and -200 buckets were just used
+    assert ("chat", 1, -100) not in limiter._buckets
+    assert limiter.get_stats()['buckets'] == 2
+
+
+# FloodWait feedback
+
+def test_flood_wait_holds_back_only_its_chat():
+    limiter = RateLimiter()
+    limiter.penalize(1, "send_message", 60, chat_id=-100)
+    assert limiter.not_before(1, "send_message", -100) > 59
+    assert limiter.not_before(1, "send_message", -200) == 0
+    assert limiter.account_costs[1]['flood_wait_seconds'] == 60
+
+
+def test_a_second_flooded_chat_holds_back_the_account():
+    limiter = RateLimiter()
+    limiter.penalize(1, "send_message", 60, chat_id=-100)
+    limiter.penalize(1, "send_message", 30, chat_id=-200)
+    assert limiter.not_before(1, "send_message", -300) > 29
+    assert limiter.not_before(2, "send_message", -300) == 0
+
+
+def test_slow_mode_never_escalates():
+    limiter = RateLimiter()
+    limiter.penalize(1, "send_message", 60, chat_id=-100, chat_only=True)
+    limiter.penalize(1, "send_message", 60, chat_id=-200, chat_only=True)
+    assert limiter.not_before(1, "send_message", -300) == 0
+
+
+def test_penalized_rate_recovers_with_successes():
+    limiter = RateLimiter(account_limit=(1, 10))
+    limiter.penalize(1, "send_message", 0)
+    bucket = limiter._buckets[("account", 1)]
+    assert bucket.rate == 0.5
+    for _ in range(10):
+        limiter.succeeded(1, "send_message")
+    assert bucket.rate == 1
+
+
+def test_send_turns_flood_wait_into_a_deadline_and_skips():
+    class FloodedClient:
+        async def send_message(self, chat_id, text):
+            raise FloodWait(value=120)
+
+    async def main():
+        manager = UserClientManager.__new__(UserClientManager)
+        manager.rate_limiter = RateLimiter()
+        with pytest.raises(FloodWait):
+            await manager.send(1, FloodedClient(), "send_message", -100, "ad")
+        # The next send to that chat is skipped instead of sleeping for two minutes
+        with pytest.raises(Throttled):
+            await manager.send(1, FloodedClient(), "send_message", -100, "ad", max_wait=30)
+
+    asyncio.run(main())
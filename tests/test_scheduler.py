@@ -0,0 +1,114 @@
+"""SendScheduler: fixed-rate deadlines, overruns, removal and errors"""
+
+import asyncio
+
+from scheduler import SendScheduler
+
+
+def test_deadlines_do_not_drift_with_cycle_time():
+    async def main():
+        loop = asyncio.get_running_loop()
+        started = []
+
+        async def job(key):
+            started.append(loop.time())
+            await asyncio.sleep(0.03)  # sending takes time...
+            return 0.1                 # ...but the next cycle is still due 0.1s after this one
+
+        scheduler = SendScheduler(job, min_interval=0.01)
+        scheduler.add("a")
+        await asyncio.sleep(0.55)
+        await scheduler.stop()
+
+        assert len(started) == 6
+        assert abs((started[-1] - started[0]) - 0.5) < 0.05
+        assert scheduler.overruns == 0
+
+    asyncio.run(main())
+
+
+def test_overruns_skip_missed_slots():
+    async def main():
+        calls = []
+
+        async def job(key):
+            calls.append(key)
+            if len(calls) == 1:
+                await asyncio.sleep(0.25)  # runs past two and a half intervals
+            return 0.1
+
+        scheduler = SendScheduler(job, min_interval=0.01)
+        scheduler.add("a")
+        await asyncio.sleep(0.35)  # next slot after the overrun is due at 0.3
+        await scheduler.stop()
+
+        assert scheduler.overruns == 1
+        assert scheduler.skipped_slots == 2
+        assert len(calls) == 2
+
+    asyncio.run(main())
+
+
+def test_remove_and_stop_on_none():
+    async def main():
+        calls = []
+
+        async def job(key):
+            calls.append(key)
+            return None if key == "once" else 0.05
+
+        scheduler = SendScheduler(job, min_interval=0.01)
+        scheduler.add("once")
+        scheduler.add("removed", 0.02)
+        assert not scheduler.add("once")
+        assert scheduler.remove("removed")
+        await asyncio.sleep(0.1)
+
+        assert calls == ["once"]
+        assert "once" not in scheduler and len(scheduler) == 0
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_failing_cycle_is_retried_after_retry_delay():
+    async def main():
+        calls = []
+
+        async def job(key):
+            calls.append(key)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return None
+
+        scheduler = SendScheduler(job, retry_delay=0.05, min_interval=0.01)
+        scheduler.add("a")
+        await asyncio.sleep(0.02)
+        assert scheduler.errors == 1 and "a" in scheduler
+        await asyncio.sleep(0.08)
+        assert len(calls) == 2
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_defer_pushes_back_only_that_key():
+    async def main():
+        calls = []
+
+        async def job(key):
+            calls.append(key)
+            return None
+
+        scheduler = SendScheduler(job, min_interval=0.01)
+        scheduler.add("flooded", 0.02)
+        scheduler.add("other", 0.02)
+        scheduler.defer("flooded", 0.2)
+        assert scheduler.next_due_in("flooded") > 0.15
+        await asyncio.sleep(0.05)
+        assert calls == ["other"]
+        await asyncio.sleep(0.2)
+        assert calls == ["other", "flooded"]
+        await scheduler.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""SessionLifecycle: connection cap, eviction and pinning"""
+
+import asyncio
+
+import pytest
+
+from session_lifecycle import SessionLifecycle
+
+
+class FakeClient:
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+
+def lifecycle(**kwargs):
+    disconnected = []
+
+    async def connect(user_id):
+        return FakeClient(user_id)
+
+    async def disconnect(client):
+        disconnected.append(client.user_id)
+
+    sessions = SessionLifecycle(connect, disconnect, **kwargs)
+    return sessions, disconnected
+
+
+def test_cap_evicts_least_recently_used_idle_client():
+    async def main():
+        sessions, disconnected = lifecycle(max_connected=2)
+        for user_id in (1, 2, 3):
+            sessions.register(user_id)
+        await sessions.get(1)
+        await sessions.get(2)
+        await sessions.get(1)
+        await sessions.get(3)
+        assert list(sessions.clients) == [1, 3]
+        assert disconnected == [2]
+
+    asyncio.run(main())
+
+
+def test_clients_in_use_are_not_evicted_and_the_wait_is_bounded():
+    async def main():
+        sessions, disconnected = lifecycle(max_connected=1, cap_wait=0)
+        sessions.register(1)
+        sessions.register(2)
+        async with sessions.use(1):
+            with pytest.raises(RuntimeError):
+                await sessions.get(2)
+        assert disconnected == []
+        assert await sessions.get(2) is not None
+        assert disconnected == [1]
+
+    asyncio.run(main())
+
+
+def test_pins_are_limited_to_half_the_cap():
+    async def main():
+        sessions, _ = lifecycle(max_connected=4)
+        assert sessions.register(1, pinned=True)
+        assert sessions.register(2, pinned=True)
+        assert not sessions.register(3, pinned=True)
+        assert sessions.pins_refused == 1
+
+        # A freed pin goes to the account that wanted one
+        await sessions.unregister(1)
+        assert sessions.pinned == {2, 3}
+
+    asyncio.run(main())
+
+
+def test_pins_are_unlimited_without_a_cap():
+    sessions, _ = lifecycle()
+    assert all(sessions.register(user_id, pinned=True) for user_id in range(100))
+
+
+def test_check_drops_idle_clients_but_keeps_pinned_ones():
+    async def main():
+        sessions, disconnected = lifecycle(idle_timeout=0)
+        sessions.register(1, pinned=True)
+        sessions.register(2)
+        await sessions.get(1)
+        await sessions.get(2)
+        await asyncio.sleep(0.01)
+        await sessions.check()
+        assert list(sessions.clients) == [1]
+        assert disconnected == [2]
+
+    asyncio.run(main())
+
+
+def test_check_connects_pinned_accounts():
+    async def main():
+        sessions, _ = lifecycle()
+        sessions.register(1, pinned=True)
+        sessions.register(2)
+        await sessions.check()
+        assert list(sessions.clients) == [1]
+
+    asyncio.run(main())
+
+
+def test_reset_waits_for_the_client_to_be_released():
+    async def main():
+        sessions, disconnected = lifecycle()
+        sessions.register(1)
+        async with sessions.use(1):
+            await sessions.reset(1)
+            assert disconnected == []
+        assert disconnected == [1]
+        assert 1 not in sessions.clients
+
+    asyncio.run(main())
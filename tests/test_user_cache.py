@@ -0,0 +1,44 @@
+"""UserCache: TTL, invalidation and the version guard against stale reads"""
+
+import time
+
+from database import Database, UserCache
+
+
+def test_put_and_get_return_copies():
+    cache = UserCache(ttl=60)
+    user = {'user_id': 1, 'delay_seconds': 300}
+    cache.put(1, user, cache.version(1))
+    user['delay_seconds'] = 10
+
+    cached = cache.get(1)
+    assert cached['delay_seconds'] == 300
+    cached['delay_seconds'] = 20
+    assert cache.get(1)['delay_seconds'] == 300
+
+
+def test_entries_expire():
+    cache = UserCache(ttl=0.01)
+    cache.put(1, {'user_id': 1}, cache.version(1))
+    time.sleep(0.02)
+    assert cache.get(1) is None
+
+
+def test_a_read_older_than_the_last_write_is_not_cached():
+    cache = UserCache(ttl=60)
+    version = cache.version(1)  # a reader starts loading the row...
+    cache.invalidate(1)         # ...a writer updates it meanwhile...
+    cache.put(1, {'user_id': 1, 'delay_seconds': 300}, version)
+    assert cache.get(1) is None  # ...so the old row is dropped
+
+
+def test_database_writes_invalidate_the_cached_user(tmp_path):
+    db = Database(str(tmp_path / "bot.db"))
+    db.add_user(1, "someone")
+    assert db.get_user(1)['delay_seconds'] == 300
+    assert db.get_user(1) is not None
+    assert db.user_cache.hits >= 1
+
+    db.update_user_delay(1, 600)
+    assert db.get_user(1)['delay_seconds'] == 600
+    db.close()
@@ -1,94 +1,347 @@
 import asyncio
 import os
-from pyrogram import Client
-from pyrogram.errors import SessionPasswordNeeded, PhoneCodeInvalid, PhoneCodeExpired, FloodWait
-from pyrogram.types import Message
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pyrogram import Client, filters
+from pyrogram.errors import (
+    SessionPasswordNeeded, PhoneCodeInvalid, PhoneCodeExpired, FloodWait, SlowmodeWait,
+    FileReferenceExpired, FileReferenceInvalid, FileIdInvalid, MediaEmpty, MessageIdInvalid
+)
+from pyrogram.types import Message, User
+from io import BytesIO
 from typing import Dict, Optional
 import logging
 
 from config import *
-from database import Database
+from database import AsyncDatabase, UserCache
+from advanced_features import GroupManagementFeatures
+from log_writer import ForwardingLogWriter
+from scheduler import SendScheduler
+from fanout import fan_out
+from rate_limiter import RateLimiter, Throttled
+from media_cache import MediaCache
+from session_lifecycle import SessionLifecycle
+from mention_notifier import MentionNotifier
+from peer_storage import PeerStorage
 
 logger = logging.getLogger(__name__)
 
+
+async def _is_mention(flt, client, message: Message) -> bool:
+    # A coroutine (pyrogram would run a plain function in its thread pool) that never awaits
+    sender = message.from_user
+    return bool(message.mentioned) and sender is not None and not sender.is_bot and sender.id != flt.me_id
+
+
+def mention_filter(me_id: int):
+    """Messages mentioning (or replying to) the account, from other people"""
+    return filters.create(_is_mention, "MentionFilter", me_id=me_id)
+
+
 class UserClientManager:
-    def __init__(self, bot: Client, db: Database):
+    def __init__(self, bot: Client, db: AsyncDatabase, log_writer: ForwardingLogWriter = None):
         self.bot = bot
         self.db = db
-        self.active_sessions: Dict[int, Client] = {}
+        self.log_writer = log_writer or ForwardingLogWriter(db)
         self.login_states: Dict[int, str] = {}
         self.login_data: Dict[int, Dict] = {}
-        self.automation_tasks: Dict[int, asyncio.Task] = {}
+        self.scheduler = SendScheduler(self.run_cycle)
+        # Logged-in accounts; clients connect on demand and disconnect when idle
+        self.sessions = SessionLifecycle(
+            self.connect_client,
+            lambda client: client.stop(),
+            self.scheduler.next_due_in,
+            idle_timeout=SESSION_IDLE_TIMEOUT,
+            max_connected=MAX_CONNECTED_SESSIONS,
+            prewarm=SESSION_PREWARM
+        )
+        self.rate_limiter = RateLimiter(ACCOUNT_RATE_LIMIT, CHAT_RATE_LIMIT, METHOD_RATE_LIMITS)
+        self.group_mgmt = GroupManagementFeatures(db.sync)
+        # Per-user campaign snapshots, dropped whenever the user's settings, groups or ads change
+        self.campaigns = UserCache(CAMPAIGN_CACHE_TTL)
+        db.sync.add_change_listener(self.campaigns.invalidate)
+        self.media_cache = MediaCache(bot, MEDIA_CACHE_MB * 1024 * 1024)
+        # Account identities (user_id -> pyrogram User), fetched once per connect
+        self.identities: Dict[int, User] = {}
+        # Groups that were not among an account's dialogs; not looked up again until restart
+        self.unresolved_peers: Dict[int, set] = {}
+        # Accounts that got their log channel and profile lock since the bot started
+        self.set_up: set = set()
+        # Owner ad broadcasts running in the background: ad id -> task
+        self.broadcast_tasks: Dict[int, asyncio.Task] = {}
+        self.mentions = MentionNotifier(bot, MENTION_ALERT_WINDOW, MENTION_ALERT_MAX)
+        # AD_SEND_MODE=copy: user_id -> ((ad id, text, media), chat, message id) of the staged ad
+        self.staged_ads: Dict[int, tuple] = {}
+        self._staging_locks: Dict[int, asyncio.Lock] = {}
+        # Startup: phase -> [count, total seconds, max seconds], plus overall progress
+        self.startup_phases: Dict[str, list] = {}
+        self.startup_progress: Dict = {'total': 0, 'started': 0, 'failed': 0, 'done': False, 'elapsed': 0.0}
         
+    async def send(self, user_id: int, user_client: Client, method: str, chat_id=None, *args,
+                   max_wait: float = None, **kwargs):
+        """Call a user-client send method (send_message, create_channel, ...) through the rate limiter
+
+        Raises Throttled if the call would wait more than `max_wait` seconds.
+        """
+        await self.rate_limiter.acquire(user_id, method, chat_id, max_wait)
+        if chat_id is not None:
+            args = (chat_id,) + args
+        
+        try:
+            result = await getattr(user_client, method)(*args, **kwargs)
+        except SlowmodeWait as e:
+            self.rate_limiter.penalize(user_id, method, e.value, chat_id, chat_only=True)
+            raise
+        except FloodWait as e:
+            self.rate_limiter.penalize(user_id, method, e.value, chat_id)
+            raise
+        
+        self.rate_limiter.succeeded(user_id, method)
+        return result
+    
     async def start(self):
-        """Start all saved user sessions"""
+        """Start all saved user sessions
+        
+        Only pinned accounts connect at startup, STARTUP_CONCURRENCY at a time and
+        at most STARTUP_RATE per second. The others make no Telegram call here:
+        they are registered and scheduled right away and connect before their
+        first cycle. Meant to run as a background task so the bot answers
+        commands while sessions warm up.
+        """
         logger.info("🔄 Loading saved user sessions...")
-        users = self.db.get_active_users()
+        users = await self.db.get_active_users()
+        progress = self.startup_progress
+        progress.update(total=len(users), started=0, failed=0, done=False, elapsed=0.0)
+        started_at = time.perf_counter()
         
-        for user in users:
+        semaphore = asyncio.Semaphore(STARTUP_CONCURRENCY)
+        interval = 1 / STARTUP_RATE if STARTUP_RATE > 0 else 0
+        
+        async def start_one(user: Dict, connects: bool):
             try:
-                await self.start_user_session(user['user_id'])
+                ok = await self.start_user_session(user['user_id'], user)
             except Exception as e:
                 logger.error(f"Failed to start session for user {user['user_id']}: {e}")
+                ok = False
+            finally:
+                if connects:
+                    semaphore.release()
+            progress['started' if ok else 'failed'] += 1
         
-        logger.info(f"✅ Loaded {len(self.active_sessions)} user sessions")
-    
-    async def start_user_session(self, user_id: int):
-        """Start a user session from database"""
-        user = self.db.get_user(user_id)
-        if not user or not user['session_string']:
-            return False
+        async def report():
+            while True:
+                await asyncio.sleep(STARTUP_PROGRESS_INTERVAL)
+                logger.info(
+                    f"🔄 Sessions: {progress['started']}/{progress['total']} started, "
+                    f"{progress['failed']} failed ({time.perf_counter() - started_at:.0f}s)"
+                )
         
+        reporter = asyncio.create_task(report())
+        tasks = []
         try:
-            user_client = Client(
-                name=f"user_{user_id}",
-                api_id=API_ID,
-                api_hash=API_HASH,
-                session_string=user['session_string'],
-                in_memory=True
-            )
+            # Accounts that are not pinned are only registered and scheduled
+            connecting = []
+            for user in users:
+                if self.sessions.register(user['user_id'], pinned=bool(user['mention_alerts'])):
+                    connecting.append(user)
+                else:
+                    await start_one(user, False)
             
+            for user in connecting:
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(start_one(user, True)))
+                if interval:
+                    await asyncio.sleep(interval)
+            await asyncio.gather(*tasks)
+        finally:
+            reporter.cancel()
+        
+        progress['done'] = True
+        progress['elapsed'] = time.perf_counter() - started_at
+        logger.info(
+            f"✅ Loaded {progress['started']} user sessions in {progress['elapsed']:.1f}s "
+            f"({progress['failed']} failed)"
+        )
+        for phase, (count, total, longest) in self.startup_phases.items():
+            logger.info(f"   {phase}: {count}x, avg {total / count * 1000:.0f}ms, max {longest * 1000:.0f}ms")
+    
+    @contextmanager
+    def _phase(self, name: str):
+        """Time one step of starting a session (see start())"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stat = self.startup_phases.setdefault(name, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] = max(stat[2], elapsed)
+    
+    @property
+    def active_sessions(self) -> Dict[int, Client]:
+        """Clients connected right now (see get_client for any logged-in user)"""
+        return self.sessions.clients
+    
+    async def get_client(self, user_id: int) -> Optional[Client]:
+        """Connected client of a logged-in user, connecting it if it was idle; None if that fails"""
+        try:
+            return await self.sessions.get(user_id)
+        except Exception as e:
+            logger.error(f"Error connecting session for user {user_id}: {e}")
+            return None
+    
+    async def connect_client(self, user_id: int) -> Optional[Client]:
+        """Build and start a user's client from the saved session (called by self.sessions)"""
+        user = await self.db.get_user(user_id)
+        if not user or not user['session_string']:
+            return None
+        
+        user_client = Client(
+            name=f"user_{user_id}",
+            api_id=API_ID,
+            api_hash=API_HASH,
+            session_string=user['session_string'],
+            in_memory=True,
+            # Without mention alerts the account only sends: no update handling at all
+            no_updates=not user['mention_alerts']
+        )
+        # Keep resolved peers in SESSIONS_DIR across restarts
+        user_client.storage = PeerStorage(user_client.name, SESSIONS_DIR, user['session_string'])
+        
+        with self._phase("connect"):
             await user_client.start()
-            self.active_sessions[user_id] = user_client
+        # start() already fetched the account's identity
+        self.identities[user_id] = user_client.me
+        
+        with self._phase("peers"):
+            await self.warm_peers(user_id, user_client)
+        
+        # Setup mention handler
+        if user['mention_alerts']:
+            with self._phase("mention_handler"):
+                await self.setup_mention_handler(user_id, user_client)
+        
+        # One-time setup on the first connect since the bot started
+        if user_id not in self.set_up:
+            self.set_up.add(user_id)
             
             # Create log channel if not exists
             if not user['log_channel_id']:
-                await self.create_log_channel(user_id, user_client)
-            
-            # Start automation if active
-            if user['is_active']:
-                await self.start_automation(user_id)
-            
-            # Setup mention handler
-            await self.setup_mention_handler(user_id, user_client)
+                with self._phase("log_channel"):
+                    await self.create_log_channel(user_id, user_client)
             
             # Setup bio/name lock for free users
             if not user['is_premium']:
-                await self.apply_bio_name_lock(user_id, user_client)
+                with self._phase("profile_lock"):
+                    await self.apply_bio_name_lock(user_id, user_client)
+        return user_client
+    
+    async def stop_user_session(self, user_id: int):
+        """Stop automation and disconnect a user's client (logout)"""
+        await self.stop_automation(user_id)
+        await self.sessions.unregister(user_id)
+        self.identities.pop(user_id, None)
+        self.unresolved_peers.pop(user_id, None)
+        self.set_up.discard(user_id)
+        PeerStorage.remove(SESSIONS_DIR, f"user_{user_id}")
+    
+    async def warm_peers(self, user_id: int, user_client: Client):
+        """Make sure every group in user_groups is in the account's peer storage
+        
+        Stored peers make this a local lookup. Groups that are missing (first
+        start, new groups) are resolved with one pass over the account's
+        dialogs instead of failing or costing a call each on the first send.
+        """
+        try:
+            groups = await self.db.get_user_groups(user_id)
+            tried = self.unresolved_peers.get(user_id, set())
+            missing = set(await user_client.storage.missing_peers(g['group_id'] for g in groups)) - tried
+            if not missing:
+                return
+            
+            await self.rate_limiter.acquire(user_id, "get_dialogs")
+            async for _ in user_client.get_dialogs():
+                pass
+            await user_client.storage.save()
+            
+            unresolved = set(await user_client.storage.missing_peers(missing))
+            self.unresolved_peers[user_id] = tried | unresolved
+            logger.info(
+                f"📇 Stored {len(missing) - len(unresolved)} group peers for user {user_id}"
+                + (f" ({len(unresolved)} not in dialogs)" if unresolved else "")
+            )
+        except Exception as e:
+            logger.warning(f"Could not warm peers for user {user_id}: {e}")
+    
+    async def start_user_session(self, user_id: int, user: Dict = None):
+        """Start a user session from database (or from its already loaded `user` row)
+        
+        Only pinned accounts (mention alerts on, within the pin limit) connect
+        right away, since they must receive updates; the rest connect on
+        demand, shortly before their first cycle.
+        """
+        if user is None:
+            with self._phase("load"):
+                user = await self.db.get_user(user_id)
+        if not user or not user['session_string']:
+            return False
+        
+        try:
+            self.sessions.start()
+            # Listening clients stay connected to receive mentions
+            if self.sessions.register(user_id, pinned=bool(user['mention_alerts'])):
+                if not await self.sessions.get(user_id):
+                    await self.sessions.unregister(user_id)
+                    return False
+            
+            # Start automation if active
+            if user['is_active']:
+                await self.start_automation(user_id, self.first_cycle_delay(user))
             
             logger.info(f"✅ Started session for user {user_id}")
             return True
             
         except Exception as e:
             logger.error(f"Error starting session for user {user_id}: {e}")
+            await self.sessions.unregister(user_id)
             return False
     
+    async def set_mention_alerts(self, user_id: int, enabled: bool):
+        """Turn mention alerts on or off, switching the client between listening and send-only"""
+        await self.db.set_mention_alerts(user_id, enabled)
+        if user_id not in self.sessions:
+            return
+        
+        # The update mode is fixed when a client starts, so reconnect in the new one
+        pinned = self.sessions.register(user_id, pinned=enabled)
+        await self.sessions.reset(user_id)
+        if pinned:
+            await self.get_client(user_id)
+    
     async def create_log_channel(self, user_id: int, user_client: Client):
         """Create a private log channel for user"""
         try:
-            me = await user_client.get_me()
+            me = self.identities.get(user_id) or await user_client.get_me()
             channel_title = f"📊 Ads Log - {me.first_name}"
             channel_description = f"Automatic forwarding logs for @{BOT_USERNAME}"
             
-            channel = await user_client.create_channel(
+            channel = await self.send(
+                user_id,
+                user_client,
+                "create_channel",
                 title=channel_title,
                 description=channel_description
             )
             
-            self.db.set_log_channel(user_id, channel.id)
+            await self.db.set_log_channel(user_id, channel.id)
             
             # Send welcome message to channel
-            await user_client.send_message(
+            await self.send(
+                user_id,
+                user_client,
+                "send_message",
                 channel.id,
                 f"📊 **Forwarding Log Channel**\n\n"
                 f"This channel will receive all forwarding reports.\n"
@@ -112,12 +365,12 @@ class UserClientManager:
             # Lock bio
             if BOT_USERNAME not in current_bio:
                 new_bio = f"{current_bio}\n\n🤖 Using @{BOT_USERNAME} for ads"
-                await user_client.update_profile(bio=new_bio[:70])
+                await self.send(user_id, user_client, "update_profile", bio=new_bio[:70])
             
             # Lock name (add bot mention if not present)
             if BOT_USERNAME not in current_name:
                 new_name = f"{current_name} | @{BOT_USERNAME}"
-                await user_client.update_profile(first_name=new_name[:64])
+                await self.send(user_id, user_client, "update_profile", first_name=new_name[:64])
             
             logger.info(f"✅ Applied bio/name lock for user {user_id}")
             
@@ -125,208 +378,494 @@ class UserClientManager:
             logger.error(f"Error applying bio/name lock for user {user_id}: {e}")
     
     async def setup_mention_handler(self, user_id: int, user_client: Client):
-        """Setup handler to detect mentions in groups"""
+        """Setup handler to detect mentions in groups
+        
+        The filter and handler only read attributes of the parsed message: no API
+        calls per message, and alerts are queued for self.mentions to coalesce.
+        """
+        me = self.identities[user_id]
         
-        @user_client.on_message()
+        @user_client.on_message(mention_filter(me.id))
         async def mention_handler(client, message: Message):
             try:
-                # Check if user is mentioned
-                me = await client.get_me()
-                if message.mentioned and message.from_user and not message.from_user.is_bot:
-                    # Notify user via main bot
-                    notification_text = f"""
-🔔 **You were mentioned!**
-
-👤 By: {message.from_user.first_name} (@{message.from_user.username or 'no_username'})
-👥 Group: {message.chat.title if message.chat else 'Unknown'}
-💬 Message: {message.text[:100] if message.text else '[Media]'}
-
-🔗 [View Message]({message.link})
-                    """
-                    
-                    await self.bot.send_message(user_id, notification_text)
-                    
+                self.mentions.add(user_id, {
+                    'by': message.from_user.first_name,
+                    'username': message.from_user.username,
+                    'group': message.chat.title if message.chat else 'Unknown',
+                    'text': message.text[:100] if message.text else '[Media]',
+                    'link': message.link,
+                })
             except Exception as e:
                 logger.error(f"Error in mention handler for user {user_id}: {e}")
     
-    async def start_automation(self, user_id: int):
-        """Start automated ad forwarding for user"""
-        if user_id in self.automation_tasks:
-            return
+    async def start_automation(self, user_id: int, delay: float = 0):
+        """Start automated ad forwarding for user, first cycle after `delay` seconds"""
+        if self.scheduler.add(user_id, delay):
+            logger.info(f"🚀 Started automation for user {user_id} (first cycle in {delay:.0f}s)")
+    
+    @staticmethod
+    def first_cycle_delay(user: Dict) -> float:
+        """Stagger first cycles after a restart across each user's delay window (STARTUP_PACING)
+        
+        "last_run" keeps the rhythm from before the restart when the next run is still ahead,
+        otherwise (and with "hash") the user gets a fixed offset derived from their id.
+        """
+        window = max(user['delay_seconds'] or 0, 0)
+        if STARTUP_PACING == "off" or not window:
+            return 0
         
-        task = asyncio.create_task(self.automation_loop(user_id))
-        self.automation_tasks[user_id] = task
-        logger.info(f"🚀 Started automation for user {user_id}")
+        if STARTUP_PACING == "last_run" and user['last_ad_run']:
+            try:
+                last_run = datetime.fromisoformat(str(user['last_ad_run'])[:19]).replace(tzinfo=timezone.utc)
+                remaining = window - (datetime.now(timezone.utc) - last_run).total_seconds()
+                if 0 < remaining <= window:
+                    return remaining
+            except ValueError:
+                pass
+        
+        # Knuth multiplicative hash spreads consecutive ids over the window
+        return (user['user_id'] * 2654435761 % 2 ** 32) / 2 ** 32 * window
     
     async def stop_automation(self, user_id: int):
         """Stop automated ad forwarding for user"""
-        if user_id in self.automation_tasks:
-            self.automation_tasks[user_id].cancel()
-            del self.automation_tasks[user_id]
+        if self.scheduler.remove(user_id):
             logger.info(f"🛑 Stopped automation for user {user_id}")
     
-    async def automation_loop(self, user_id: int):
-        """Main automation loop for forwarding ads"""
-        while True:
-            try:
-                user = self.db.get_user(user_id)
-                if not user or not user['is_active']:
-                    break
-                
-                user_client = self.active_sessions.get(user_id)
+    def load_campaign(self, user_id: int) -> Optional[Dict]:
+        """Build a user's campaign snapshot: settings, active ad with footer, ordered groups (blocking)"""
+        version = self.campaigns.version(user_id)
+        user = self.db.sync.get_user(user_id)
+        if not user:
+            return None
+        
+        ad = self.db.sync.get_active_ad(user_id)
+        if ad and not user['is_premium']:
+            ad['ad_text'] += FREE_TIER['forced_footer']
+        
+        campaign = {
+            'is_active': bool(user['is_active']),
+            'is_premium': bool(user['is_premium']),
+            'delay_seconds': user['delay_seconds'],
+            'log_channel_id': user['log_channel_id'],
+            'ad': ad,
+            # Paused groups left out, highest priority first
+            'groups': self.group_mgmt.get_active_groups_sorted(user_id) if ad else [],
+        }
+        self.campaigns.put(user_id, campaign, version)
+        return campaign
+    
+    async def get_campaign(self, user_id: int) -> Optional[Dict]:
+        campaign = self.campaigns.get(user_id)
+        if campaign is not None:
+            return campaign
+        return await self.db.run(self.load_campaign, user_id)
+    
+    async def run_cycle(self, user_id: int) -> Optional[float]:
+        """One forwarding round for user; returns seconds until the next round, None to stop"""
+        # Queries of one cycle are checked against the N+1 budget (see db_metrics.py)
+        with self.db.metrics.scope(f"cycle:{user_id}"):
+            campaign = await self.get_campaign(user_id)
+            if not campaign or not campaign['is_active']:
+                return None
+
+            if user_id not in self.sessions:
+                return None  # Logged out
+
+            # Check again in 5 minutes if there is no ad or no group yet
+            ad = campaign['ad']
+            groups = campaign['groups']
+            if not ad or not groups:
+                return 300
+
+            delay = campaign['delay_seconds']
+
+            # Whole account under FloodWait: push the cycle back instead of sleeping through it
+            wait = self.rate_limiter.not_before(user_id, self.ad_send_method(ad))
+            if wait > SEND_MAX_WAIT:
+                self.scheduler.defer(user_id, wait)
+                return delay
+
+            # Connects the client again if it was disconnected while idle (see session_lifecycle.py)
+            async with self.sessions.use(user_id) as user_client:
                 if not user_client:
-                    break
-                
-                # Get user's ad
-                ad = self.db.get_active_ad(user_id)
-                if not ad:
-                    await asyncio.sleep(300)  # Wait 5 minutes if no ad
-                    continue
-                
-                # Get user's groups
-                groups = self.db.get_user_groups(user_id)
-                if not groups:
-                    await asyncio.sleep(300)
-                    continue
-                
-                # Check if premium or free
-                is_premium = user['is_premium']
-                delay = user['delay_seconds']
-                
-                # Forward ad to all groups
-                for group in groups:
-                    try:
-                        await self.forward_ad_to_group(
-                            user_id, 
-                            user_client, 
-                            group, 
-                            ad, 
-                            is_premium
-                        )
-                        await asyncio.sleep(2)  # Small delay between groups
-                        
-                    except Exception as e:
-                        logger.error(f"Error forwarding to group {group['group_id']}: {e}")
-                        self.db.add_forwarding_log(
-                            user_id, 
-                            group['group_id'], 
-                            group['group_name'], 
-                            "failed", 
-                            str(e)
+                    return None
+
+                # Forward ad to all groups, a few at a time; each group stays on one worker
+                results = await fan_out(
+                    groups,
+                    lambda group: self.forward_ad_to_group(user_id, user_client, group, campaign),
+                    concurrency=SEND_CONCURRENCY,
+                    spacing=GROUP_SEND_INTERVAL,
+                    key=lambda group: group['group_id']
+                )
+
+                skipped = 0
+                for group, result in zip(groups, results):
+                    if isinstance(result, Throttled):
+                        skipped += 1  # Chat (or account) is under FloodWait; retried next cycle
+                    elif isinstance(result, Exception):
+                        logger.error(f"Error forwarding to group {group['group_id']}: {result}")
+                        self.log_writer.add(
+                            user_id,
+                            group['group_id'],
+                            group['group_name'],
+                            "failed",
+                            str(result)
                         )
-                
+
+                if skipped:
+                    logger.info(f"⏭️ Skipped {skipped} throttled groups for user {user_id}")
+
+                await self.send_cycle_report(user_id, user_client, campaign, results)
+
+                wait = self.rate_limiter.not_before(user_id, self.ad_send_method(ad))
+                if wait > 0:
+                    self.scheduler.defer(user_id, wait)
+
                 # Update last ad run
-                self.db.update_last_ad_run(user_id)
-                
-                # Wait for next round
-                await asyncio.sleep(delay)
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Error in automation loop for user {user_id}: {e}")
-                await asyncio.sleep(60)
+                await self.db.update_last_ad_run(user_id)
+
+        # Next round is due `delay` after this one was due (see scheduler.py)
+        return delay
+    
+    async def send_cycle_report(self, user_id: int, user_client: Client, campaign: Dict, results: list):
+        """One digest of a cycle's outcomes to the user's log channel, per LOG_CHANNEL_VERBOSITY"""
+        if LOG_CHANNEL_VERBOSITY not in ("digest", "failures") or not campaign['log_channel_id']:
+            return
+        
+        sent, failed, skipped = [], [], []
+        for group, result in zip(campaign['groups'], results):
+            if isinstance(result, Throttled):
+                skipped.append(group)
+            elif isinstance(result, Exception):
+                failed.append((group, result))
+            else:
+                sent.append(group)
+        
+        if LOG_CHANNEL_VERBOSITY == "failures" and not failed:
+            return
+        
+        lines = [
+            f"📊 **Cycle Report** ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})\n",
+            f"✅ Sent: {len(sent)}  ❌ Failed: {len(failed)}  ⏭️ Skipped: {len(skipped)}",
+        ]
+        if failed:
+            lines.append("\n**Failed:**")
+            for group, error in failed[:20]:
+                lines.append(f"❌ {group['group_name']}: {str(error)[:80]}")
+            if len(failed) > 20:
+                lines.append(f"… and {len(failed) - 20} more")
+        if skipped:
+            lines.append(f"\n⏭️ Rate limited, retried next cycle: {', '.join(g['group_name'] for g in skipped[:10])}"
+                         + (" …" if len(skipped) > 10 else ""))
+        if sent and LOG_CHANNEL_VERBOSITY == "digest":
+            lines.append(f"\n✅ {', '.join(g['group_name'] for g in sent[:30])}" + (" …" if len(sent) > 30 else ""))
+        
+        try:
+            await self.send(
+                user_id, user_client, "send_message", campaign['log_channel_id'], "\n".join(lines)[:4096],
+                max_wait=SEND_MAX_WAIT
+            )
+        except Exception as e:
+            logger.warning(f"Could not send cycle report for user {user_id}: {e}")
+    
+    async def upload_media(self, user_id: int, user_client: Client, media_type: str, data: BytesIO) -> str:
+        """Upload media through the account's Saved Messages; returns the account's own file_id
+        
+        The carrier message is deleted once the file_id is captured; the file_id stays valid.
+        """
+        message = await self.send(user_id, user_client, f"send_{media_type}", "me", data)
+        file_id = getattr(message, media_type).file_id
+        try:
+            await self.send(user_id, user_client, "delete_messages", "me", message.id)
+        except Exception as e:
+            logger.warning(f"Could not delete uploaded media from Saved Messages of user {user_id}: {e}")
+        return file_id
+    
+    async def account_media(self, user_id: int, user_client: Client, ad: Dict, slot: str = "ad") -> str:
+        """File id of the ad's media that this account can send (uploaded once, then cached)"""
+        return await self.media_cache.get(
+            user_id,
+            ad['media_file_id'],
+            lambda data: self.upload_media(user_id, user_client, ad['media_type'], data),
+            slot
+        )
+    
+    async def staged_ad(self, user_id: int, user_client: Client, campaign: Dict) -> tuple:
+        """(chat, message id) of the account's staged copy of its ad, posted again when the ad changes"""
+        ad = campaign['ad']
+        version = (ad['id'], ad['ad_text'], ad['media_file_id'])
+        staged = self.staged_ads.get(user_id)
+        if staged and staged[0] == version:
+            return staged[1], staged[2]
+        
+        lock = self._staging_locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            staged = self.staged_ads.get(user_id)
+            if staged and staged[0] == version:
+                return staged[1], staged[2]
+            
+            chat_id = "me"
+            if AD_STAGING_CHAT == "log_channel" and campaign['log_channel_id']:
+                chat_id = campaign['log_channel_id']
+            
+            if ad['media_type'] in ('photo', 'video') and ad['media_file_id']:
+                media = await self.account_media(user_id, user_client, ad)
+                message = await self.send(
+                    user_id, user_client, f"send_{ad['media_type']}", chat_id, media, caption=ad['ad_text']
+                )
+            else:
+                message = await self.send(user_id, user_client, "send_message", chat_id, ad['ad_text'])
+            
+            if staged:
+                try:
+                    await self.send(user_id, user_client, "delete_messages", staged[1], staged[2])
+                except Exception as e:
+                    logger.debug(f"Could not delete old staged ad for user {user_id}: {e}")
+            
+            self.staged_ads[user_id] = (version, chat_id, message.id)
+            logger.info(f"📌 Staged ad for user {user_id} in {chat_id}")
+            return chat_id, message.id
+    
+    @staticmethod
+    def ad_send_method(ad: Dict) -> str:
+        """Client method used to post this ad"""
+        if AD_SEND_MODE == "copy":
+            return "copy_message"
+        if ad['media_type'] and ad['media_file_id'] and ad['media_type'] in ('photo', 'video'):
+            return f"send_{ad['media_type']}"
+        return "send_message"
     
     async def forward_ad_to_group(
         self, 
         user_id: int, 
         user_client: Client, 
         group: Dict, 
-        ad: Dict, 
-        is_premium: bool
+        campaign: Dict
     ):
-        """Forward ad to a specific group"""
+        """Forward the campaign's ad to a specific group
+        
+        Errors are raised to run_cycle, which logs and records them once.
+        FloodWait is turned into a not-before deadline by self.send.
+        """
         try:
-            # Prepare ad text
+            # Footer for free users is already part of the snapshot's ad text
+            ad = campaign['ad']
             ad_text = ad['ad_text']
             
-            # Add footer for free users
-            if not is_premium:
-                ad_text += FREE_TIER['forced_footer']
-            
+            if AD_SEND_MODE == "copy":
+                # Server-side copy of the ad staged once in the account's own chat
+                from_chat_id, message_id = await self.staged_ad(user_id, user_client, campaign)
+                await self.send(
+                    user_id,
+                    user_client,
+                    "copy_message",
+                    group['group_id'],
+                    from_chat_id,
+                    message_id,
+                    max_wait=SEND_MAX_WAIT
+                )
             # Send message based on media type
-            if ad['media_type'] and ad['media_file_id']:
+            elif ad['media_type'] and ad['media_file_id']:
+                media = await self.account_media(user_id, user_client, ad)
                 if ad['media_type'] == 'photo':
-                    await user_client.send_photo(
+                    await self.send(
+                        user_id,
+                        user_client,
+                        "send_photo",
                         group['group_id'],
-                        ad['media_file_id'],
-                        caption=ad_text
+                        media,
+                        caption=ad_text,
+                        max_wait=SEND_MAX_WAIT
                     )
                 elif ad['media_type'] == 'video':
-                    await user_client.send_video(
+                    await self.send(
+                        user_id,
+                        user_client,
+                        "send_video",
                         group['group_id'],
-                        ad['media_file_id'],
-                        caption=ad_text
+                        media,
+                        caption=ad_text,
+                        max_wait=SEND_MAX_WAIT
                     )
             else:
-                await user_client.send_message(group['group_id'], ad_text)
+                await self.send(
+                    user_id, user_client, "send_message", group['group_id'], ad_text, max_wait=SEND_MAX_WAIT
+                )
             
             # Log success
-            self.db.add_forwarding_log(
+            self.log_writer.add(
                 user_id, 
                 group['group_id'], 
                 group['group_name'], 
                 "success"
             )
             
-            # Send log to user's channel
-            user = self.db.get_user(user_id)
-            if user['log_channel_id']:
-                await user_client.send_message(
-                    user['log_channel_id'],
-                    f"✅ **Forwarded Successfully**\n\n"
-                    f"📢 Group: {group['group_name']}\n"
-                    f"⏰ Time: {asyncio.get_event_loop().time()}\n"
-                    f"📊 Status: Success"
-                )
+            # Per-send report to user's channel (otherwise see send_cycle_report)
+            if LOG_CHANNEL_VERBOSITY == "per_send" and campaign['log_channel_id']:
+                try:
+                    await self.send(
+                        user_id,
+                        user_client,
+                        "send_message",
+                        campaign['log_channel_id'],
+                        f"✅ **Forwarded Successfully**\n\n"
+                        f"📢 Group: {group['group_name']}\n"
+                        f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                        f"📊 Status: Success",
+                        max_wait=SEND_MAX_WAIT
+                    )
+                except Throttled:
+                    pass  # Not worth holding up the cycle for a log message
             
-        except FloodWait as e:
-            logger.warning(f"FloodWait for {e.value} seconds")
-            await asyncio.sleep(e.value)
+        except (FileReferenceExpired, FileReferenceInvalid, FileIdInvalid, MediaEmpty):
+            # Upload (and stage) again on the next attempt
+            self.media_cache.evict(user_id, "ad")
+            self.staged_ads.pop(user_id, None)
             raise
-        except Exception as e:
-            logger.error(f"Error forwarding to group {group['group_id']}: {e}")
+        except MessageIdInvalid:
+            # Staged ad was deleted from the account's chat; post it again next time
+            self.staged_ads.pop(user_id, None)
             raise
     
-    async def broadcast_owner_ad(self, ad_id: int):
-        """Broadcast owner ad through free user accounts"""
-        owner_ads = self.db.get_active_owner_ads()
+    def start_broadcast(self, ad_id: int, status_message: Message = None) -> bool:
+        """Broadcast an owner ad in the background; False if it is already being broadcast"""
+        task = self.broadcast_tasks.get(ad_id)
+        if task and not task.done():
+            return False
+        self.broadcast_tasks[ad_id] = asyncio.create_task(self.broadcast_owner_ad(ad_id, status_message))
+        return True
+    
+    async def stop_broadcasts(self):
+        for task in self.broadcast_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.broadcast_tasks.values(), return_exceptions=True)
+        self.broadcast_tasks.clear()
+    
+    async def broadcast_owner_ad(self, ad_id: int, status_message: Message = None) -> Optional[Dict]:
+        """Broadcast owner ad through free user accounts
+        
+        Up to BROADCAST_CONCURRENCY accounts send at once; each account sends to its
+        groups one at a time through the rate limiter. Progress and ETA are edited into
+        `status_message` every BROADCAST_PROGRESS_INTERVAL seconds.
+        """
+        owner_ads = await self.db.get_active_owner_ads()
         owner_ad = next((ad for ad in owner_ads if ad['id'] == ad_id), None)
         
         if not owner_ad:
             logger.error(f"Owner ad {ad_id} not found")
-            return
-        
-        free_users = self.db.get_free_users()
+            await self._edit_status(status_message, f"❌ Owner ad #{ad_id} not found")
+            return None
         
+        free_users = await self.db.get_free_users()
+        accounts = []
         for user in free_users:
-            user_id = user['user_id']
-            user_client = self.active_sessions.get(user_id)
-            
-            if not user_client:
-                continue
-            
-            groups = self.db.get_user_groups(user_id)
-            
-            for group in groups:
-                try:
-                    # Send owner ad
-                    ad_text = owner_ad['ad_text'] + FREE_TIER['forced_footer']
-                    
-                    if owner_ad['media_type'] and owner_ad['media_file_id']:
-                        if owner_ad['media_type'] == 'photo':
-                            await user_client.send_photo(
-                                group['group_id'],
-                                owner_ad['media_file_id'],
-                                caption=ad_text
-                            )
-                    else:
-                        await user_client.send_message(group['group_id'], ad_text)
-                    
-                    await asyncio.sleep(3)
-                    
-                except Exception as e:
-                    logger.error(f"Error broadcasting owner ad to group {group['group_id']}: {e}")
+            if user['user_id'] in self.sessions:
+                accounts.append((user['user_id'], await self.db.get_user_groups(user['user_id'])))
+        
+        progress = {
+            'accounts': len(accounts), 'accounts_done': 0,
+            'groups': sum(len(groups) for _, groups in accounts),
+            'sent': 0, 'failed': 0, 'skipped': 0, 'started': time.monotonic(),
+        }
+        logger.info(f"📢 Broadcasting owner ad {ad_id} to {progress['groups']} groups via {len(accounts)} accounts")
+        
+        async def report():
+            while True:
+                await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+                await self._edit_status(status_message, self.broadcast_progress_text(ad_id, progress))
+        
+        reporter = asyncio.create_task(report())
+        try:
+            await fan_out(
+                accounts,
+                lambda account: self._broadcast_account(account[0], account[1], owner_ad, progress),
+                concurrency=BROADCAST_CONCURRENCY
+            )
+        finally:
+            reporter.cancel()
+        
+        await self._edit_status(status_message, self.broadcast_progress_text(ad_id, progress))
+        logger.info(
+            f"📢 Broadcast of owner ad {ad_id} finished: {progress['sent']} sent, "
+            f"{progress['failed']} failed, {progress['skipped']} skipped"
+        )
+        return progress
+    
+    async def _broadcast_account(self, user_id: int, groups: list, owner_ad: Dict, progress: Dict):
+        """Send the owner ad to one account's groups, one at a time"""
+        ad_text = owner_ad['ad_text'] + FREE_TIER['forced_footer']
+        
+        async def send_to(group):
+            try:
+                # Send owner ad
+                if owner_ad['media_type'] and owner_ad['media_file_id']:
+                    if owner_ad['media_type'] not in ('photo', 'video'):
+                        raise ValueError(f"unsupported owner ad media: {owner_ad['media_type']}")
+                    await self.send(
+                        user_id,
+                        user_client,
+                        f"send_{owner_ad['media_type']}",
+                        group['group_id'],
+                        await self.account_media(user_id, user_client, owner_ad, "owner"),
+                        caption=ad_text,
+                        max_wait=SEND_MAX_WAIT
+                    )
+                else:
+                    await self.send(user_id, user_client, "send_message", group['group_id'], ad_text,
+                                    max_wait=SEND_MAX_WAIT)
+                progress['sent'] += 1
+            except Throttled:
+                progress['skipped'] += 1
+            except Exception as e:
+                progress['failed'] += 1
+                logger.error(f"Error broadcasting owner ad to group {group['group_id']}: {e}")
+        
+        try:
+            # Held connected for the whole account's broadcast (see session_lifecycle.py)
+            async with self.sessions.use(user_id) as user_client:
+                if not user_client:
+                    progress['failed'] += len(groups)
+                    return
+                
+                await fan_out(
+                    groups, send_to, concurrency=1, spacing=GROUP_SEND_INTERVAL,
+                    key=lambda group: group['group_id']
+                )
+        except Exception as e:
+            logger.error(f"Error broadcasting owner ad through user {user_id}: {e}")
+        finally:
+            progress['accounts_done'] += 1
+    
+    @staticmethod
+    def broadcast_progress_text(ad_id: int, progress: Dict) -> str:
+        elapsed = time.monotonic() - progress['started']
+        done = progress['sent'] + progress['failed'] + progress['skipped']
+        finished = progress['accounts_done'] >= progress['accounts']
+        
+        if finished:
+            header = f"✅ **Broadcast of ad #{ad_id} finished** in {elapsed / 60:.0f} min"
+        elif done:
+            eta = elapsed / done * (progress['groups'] - done)
+            header = f"📢 **Broadcasting ad #{ad_id}**: {elapsed / 60:.0f} min, about {eta / 60:.0f} min left"
+        else:
+            header = f"📢 **Broadcasting ad #{ad_id}**: {elapsed / 60:.0f} min"
+        return (
+            f"{header}\n\n"
+            f"👥 Accounts: {progress['accounts_done']}/{progress['accounts']}\n"
+            f"📨 Groups: {done}/{progress['groups']}\n"
+            f"✅ Sent: {progress['sent']}\n"
+            f"❌ Failed: {progress['failed']}\n"
+            f"⏭️ Skipped (FloodWait): {progress['skipped']}"
+        )
+    
+    async def _edit_status(self, status_message: Optional[Message], text: str):
+        if status_message is None:
+            return
+        try:
+            await status_message.edit_text(text)
+        except Exception as e:
+            logger.warning(f"Could not update broadcast status: {e}")
     
     async def handle_login_flow(self, message: Message):
         """Handle the login flow states"""
@@ -403,7 +942,7 @@ class UserClientManager:
                 session_string = await temp_client.export_session_string()
                 
                 # Save to database
-                self.db.update_user_session(user_id, session_string, login_data['phone'])
+                await self.db.update_user_session(user_id, session_string, login_data['phone'])
                 
                 await temp_client.disconnect()
                 
@@ -465,7 +1004,7 @@ class UserClientManager:
                 session_string = await temp_client.export_session_string()
                 
                 # Save to database
-                self.db.update_user_session(user_id, session_string, login_data['phone'])
+                await self.db.update_user_session(user_id, session_string, login_data['phone'])
                 
                 await temp_client.disconnect()
                 